@@ -1,10 +1,10 @@
 import streamlit as st
-from supabase import create_client
+
+from db import SERVICE, get_client
+from user_directory import find_auth_user_by_email
 
 # Initialize Supabase client with service role key
-SUPABASE_URL = st.secrets["SUPABASE_URL"]
-SUPABASE_SERVICE_ROLE_KEY = st.secrets["SUPABASE_SERVICE_ROLE_KEY"]
-supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+supabase = get_client(SERVICE)
 
 # Page UI
 st.title("🔑 Supabase Admin - Update User Password")
@@ -18,20 +18,8 @@ if st.button("Update Password"):
         st.warning("⚠️ Please enter both email and new password.")
     else:
         try:
-            # 1. List all users and find the one with this email
-            response = supabase.auth.admin.list_users()
-            
-            # The response might be structured differently depending on the version
-            # Try accessing users as an attribute or key
-            if hasattr(response, 'users'):
-                users_list = response.users
-            elif isinstance(response, dict) and 'users' in response:
-                users_list = response['users']
-            else:
-                users_list = response
-            
-            # Find the target user
-            target_user = next((u for u in users_list if u.email == email or (isinstance(u, dict) and u.get("email") == email)), None)
+            # 1. Page through the users and stop at the one with this email
+            target_user = find_auth_user_by_email(supabase, email)
             
             if target_user:
                 # Get user ID (handle both object and dict formats)
@@ -46,7 +34,7 @@ if st.button("Update Password"):
                 st.json(updated if isinstance(updated, dict) else updated.__dict__)
             else:
                 st.error("❌ User not found")
-                st.info(f"Debug: Found {len(users_list)} total users")
+                st.info(f"Debug: No match for {email} across all user pages")
         except Exception as e:
             st.error(f"Error: {e}")
             st.info("Try checking the Supabase client version and API response structure")
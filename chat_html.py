@@ -0,0 +1,39 @@
+"""
+HTML for chat bubbles rendered through ``st.markdown``.
+
+Markdown still applies around raw HTML. A blank line inside a message ends
+the HTML block, and every following line indented by four or more spaces
+becomes a code block that shows the markup as text. So every line of markup
+built here starts at column 0, and message text is inserted as is.
+"""
+
+import textwrap
+from typing import Dict, Iterable
+
+
+def bubble_html(css_class: str, label: str, content: str) -> str:
+    """One message bubble; ``label`` is the bold speaker name shown before the text."""
+    return "\n".join([
+        f'<div class="{css_class}">',
+        f"<strong>{label}</strong> {content}",
+        "</div>",
+    ])
+
+
+def meta_html(metadata: Dict) -> str:
+    """Cost, token and model details shown under an assistant message."""
+    spans = [
+        f"<span>💰 ${metadata.get('cost', 0):.4f}</span>",
+        "<span>♻️ Cached</span>" if metadata.get("cache_hit") else "",
+        f"<span>🔢 {metadata.get('total_tokens', 0)} tokens</span>",
+        f"<span>🤖 {metadata.get('model', 'N/A')}</span>",
+        f"<span>{'🎮 Demo' if metadata.get('demo_mode') else '✅ Real'}</span>",
+        f"<span>⚡ {metadata['first_token_ms']} ms to first token</span>" if metadata.get("first_token_ms") else "",
+        f"<span>✂️ {metadata['context_tokens_saved']} tokens trimmed</span>" if metadata.get("context_tokens_saved") else "",
+    ]
+    return '<div class="message-meta">' + "".join(spans) + "</div>"
+
+
+def join_html(fragments: Iterable[str]) -> str:
+    """Join fragments into one ``st.markdown`` body, each left-aligned on its own lines."""
+    return "\n".join(textwrap.dedent(fragment).strip() for fragment in fragments if fragment)
@@ -24,13 +24,27 @@ UI_CONFIG = {
     "show_cost_estimate": True
 }
 
-# Rate Limiting (optional - for production use)
+# Rate Limiting - per user
 RATE_LIMITS = {
     "requests_per_minute": 60,
     "tokens_per_hour": 100000,
     "images_per_hour": 20
 }
 
+# Rate Limiting - one bucket shared by every signed-out session
+ANONYMOUS_RATE_LIMITS = {
+    "requests_per_minute": 20,
+    "tokens_per_hour": 30000,
+    "images_per_hour": 5
+}
+
+# Rate Limiting - whole process, shared by all users (match your OpenAI tier)
+GLOBAL_RATE_LIMITS = {
+    "requests_per_minute": 500,
+    "tokens_per_hour": 2000000,
+    "images_per_hour": 100
+}
+
 # Feature Flags
 FEATURES = {
     "image_generation": True,
@@ -0,0 +1,151 @@
+"""
+Append-only SQLite store for assistant conversations.
+
+Messages are written as they are added to a chat, so a conversation
+survives reconnects while the session only keeps its newest turns. The
+database runs in WAL mode, letting sessions read history while others
+append. Older messages are read back a page at a time, and exports stream
+one NDJSON line per message straight from the cursor.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+from typing import Dict, Iterator, List, Optional
+
+DEFAULT_DB_PATH = "conversations.db"
+
+# Messages returned per history page
+PAGE_SIZE = 50
+
+_SCHEMA = """
+create table if not exists conversations (
+    id text primary key,
+    user_id text not null,
+    created_at real not null,
+    updated_at real not null
+);
+create index if not exists conversations_user on conversations (user_id, updated_at);
+create table if not exists messages (
+    id integer primary key autoincrement,
+    conversation_id text not null references conversations (id),
+    user_id text not null,
+    bot text not null,
+    role text not null,
+    content text not null,
+    image_url text,
+    metadata text,
+    created_at real not null
+);
+create index if not exists messages_conversation on messages (conversation_id, id);
+create index if not exists messages_user_bot on messages (user_id, bot, created_at);
+"""
+
+
+def _row_to_message(row: sqlite3.Row) -> Dict:
+    message = {"id": row["id"], "role": row["role"], "content": row["content"], "bot": row["bot"]}
+    if row["image_url"]:
+        message["image_url"] = row["image_url"]
+    if row["metadata"]:
+        message["metadata"] = json.loads(row["metadata"])
+    return message
+
+
+class ConversationStore:
+    """Conversations and their messages, keyed by user, bot and time"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        with closing(self._connect()) as conn, conn:
+            conn.execute("pragma journal_mode=wal")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute("pragma synchronous=normal")
+        return conn
+
+    def start_conversation(self, user_id: str) -> str:
+        """Create an empty conversation and return its id."""
+        conversation_id = str(uuid.uuid4())
+        now = time.time()
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute(
+                "insert into conversations (id, user_id, created_at, updated_at) values (?, ?, ?, ?)",
+                (conversation_id, user_id, now, now),
+            )
+        return conversation_id
+
+    def owns(self, user_id: str, conversation_id: str) -> bool:
+        """Whether ``conversation_id`` exists and belongs to ``user_id``."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "select 1 from conversations where id = ? and user_id = ?", (conversation_id, user_id)
+            ).fetchone()
+        return row is not None
+
+    def latest_conversation(self, user_id: str) -> Optional[str]:
+        """The conversation ``user_id`` wrote to most recently."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "select id from conversations where user_id = ? order by updated_at desc limit 1", (user_id,)
+            ).fetchone()
+        return row["id"] if row else None
+
+    def append(self, conversation_id: str, user_id: str, bot: str, message: Dict) -> int:
+        """Write one message and return its id."""
+        now = time.time()
+        metadata = message.get("metadata")
+        with self._lock, closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                "insert into messages (conversation_id, user_id, bot, role, content, image_url, metadata, created_at) "
+                "values (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    conversation_id,
+                    user_id,
+                    bot,
+                    message["role"],
+                    message["content"],
+                    message.get("image_url"),
+                    json.dumps(metadata, default=str) if metadata else None,
+                    now,
+                ),
+            )
+            conn.execute("update conversations set updated_at = ? where id = ?", (now, conversation_id))
+            return cursor.lastrowid
+
+    def load_page(self, conversation_id: str, before_id: Optional[int] = None, limit: int = PAGE_SIZE) -> List[Dict]:
+        """Up to ``limit`` messages older than ``before_id`` (newest if ``None``), oldest first."""
+        query = "select * from messages where conversation_id = ?"
+        params: list = [conversation_id]
+        if before_id is not None:
+            query += " and id < ?"
+            params.append(before_id)
+        query += " order by id desc limit ?"
+        params.append(limit)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [_row_to_message(row) for row in reversed(rows)]
+
+    def count_before(self, conversation_id: str, before_id: int) -> int:
+        """Number of messages older than ``before_id``."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "select count(*) from messages where conversation_id = ? and id < ?", (conversation_id, before_id)
+            ).fetchone()
+        return row[0]
+
+    def export_ndjson(self, conversation_id: str) -> Iterator[str]:
+        """Yield the conversation as NDJSON lines, oldest message first."""
+        with closing(self._connect()) as conn:
+            for row in conn.execute(
+                "select * from messages where conversation_id = ? order by id", (conversation_id,)
+            ):
+                message = _row_to_message(row)
+                message["created_at"] = row["created_at"]
+                yield json.dumps(message, default=str) + "\n"
@@ -0,0 +1,60 @@
+"""
+Shared Supabase clients for the app and its pages.
+
+``get_client`` returns one cached client per key role, so pages reuse its
+warm connections instead of paying new TLS handshakes. ``new_client`` is
+for flows that keep per-user auth state on the client and must not share it.
+
+Each client keeps its own connection pool. The Supabase sub-clients write
+their ``apikey``, ``Authorization`` and base URL onto the httpx client they
+are given, so a pool shared between clients would mix up one client's
+credentials with another's (the service key, or another session's JWT).
+``get_http_client`` is only for plain REST calls that send their own headers.
+"""
+
+from typing import Optional, Tuple
+
+import httpx
+import streamlit as st
+from supabase import Client, create_client
+
+ANON = "anon"
+SERVICE = "service"
+
+# Connection pool for plain REST calls; never handed to a Supabase client
+POOL_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=120)
+TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+
+def get_supabase_credentials() -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """Return (url, anon key, service role key) from either secrets layout."""
+    if "supabase" in st.secrets:
+        section = st.secrets["supabase"]
+        return section.get("url"), section.get("key"), section.get("service_role_key")
+    return (
+        st.secrets.get("SUPABASE_URL"),
+        st.secrets.get("SUPABASE_ANON_KEY"),
+        st.secrets.get("SUPABASE_SERVICE_KEY") or st.secrets.get("SUPABASE_SERVICE_ROLE_KEY"),
+    )
+
+
+@st.cache_resource
+def get_http_client() -> httpx.Client:
+    """Keep-alive pool for requests that set their own headers on every call."""
+    return httpx.Client(limits=POOL_LIMITS, timeout=TIMEOUT, follow_redirects=True, http2=True)
+
+
+def new_client(role: str = ANON) -> Client:
+    """Create an uncached client for ``role`` with its own connection pool."""
+    url, anon_key, service_key = get_supabase_credentials()
+    key = service_key if role == SERVICE else anon_key
+    if not url or not key:
+        st.error(f"❌ Supabase credentials for the {role} role are missing. Check your secrets.toml.")
+        st.stop()
+    return create_client(url, key)
+
+
+@st.cache_resource
+def get_client(role: str = ANON) -> Client:
+    """Process-wide client for ``role`` ("anon" or "service")."""
+    return new_client(role)
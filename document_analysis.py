@@ -0,0 +1,217 @@
+"""
+Map-reduce document analysis on a local Ollama server.
+
+Documents are split into chunks that fit the model's context, measured in
+tokens. Each chunk is summarized (map) with a bounded number of requests
+in flight. The summaries are then merged (reduce), collapsing them level
+by level until they fit in one final prompt. Map results are yielded as
+they finish so callers can report progress per chunk.
+
+Every request sets ``num_ctx`` large enough for a chunk-sized prompt and
+its reply. Ollama's default context is often 2048 tokens and it silently
+drops the start of a longer prompt.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import tiktoken
+
+from ollama_client import OllamaClient, OllamaStream
+
+# Tokens per chunk; with the prompt and reply this needs a 4k num_ctx (see context_size)
+CHUNK_TOKENS = 2000
+
+# Summaries requested at once; match OLLAMA_NUM_PARALLEL on the server
+MAX_CONCURRENCY = 2
+
+# Output tokens for each chunk summary
+SUMMARY_TOKENS = 300
+
+# Output tokens for the final analysis when options don't set num_predict
+ANALYSIS_TOKENS = 1000
+
+# Instructions and chat template tokens around the text of a prompt
+PROMPT_OVERHEAD_TOKENS = 100
+
+# Model tokenizers can count more tokens than cl100k for the same text
+TOKENIZER_MARGIN = 1.25
+
+# Rough characters per token, used when tiktoken's encoding is unavailable
+CHARS_PER_TOKEN = 4
+
+MAP_PROMPT = """Summarize part {index} of {total} of a document. Keep the key facts, figures, names and conclusions.
+
+{chunk}"""
+
+COMBINE_PROMPT = """Merge these summaries of consecutive parts of one document into a single summary. Keep the key facts, figures, names and conclusions.
+
+{summaries}"""
+
+REDUCE_PROMPT = """The following are summaries of consecutive parts of one document. Analyze the whole document: give an overall summary, the key points and any notable insights.
+
+{summaries}"""
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    # Ollama models use their own tokenizers; cl100k is a close enough measure for sizing chunks.
+    # It is downloaded on first use, so fall back to estimating when offline.
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def context_size(prompt_tokens: int, reply_tokens: int) -> int:
+    """``num_ctx`` for a prompt of ``prompt_tokens`` (as counted here) and its reply.
+
+    Rounded up to a multiple of 1024 so the requests of one analysis share
+    a value; Ollama reloads the model whenever ``num_ctx`` changes.
+    """
+    needed = int(prompt_tokens * TOKENIZER_MARGIN) + PROMPT_OVERHEAD_TOKENS + reply_tokens
+    return -(-needed // 1024) * 1024
+
+
+def _request_options(options: Optional[Dict], prompt_tokens: int, num_predict: int) -> Dict:
+    """``options`` with ``num_predict`` set and a ``num_ctx`` that fits the prompt and any reply of the analysis."""
+    options = options or {}
+    reply_tokens = max(SUMMARY_TOKENS, options.get("num_predict") or ANALYSIS_TOKENS)
+    num_ctx = max(options.get("num_ctx") or 0, context_size(prompt_tokens, reply_tokens))
+    return {**options, "num_ctx": num_ctx, "num_predict": num_predict}
+
+
+def _windows(text: str, chunk_tokens: int) -> List[str]:
+    """Cut ``text`` into consecutive pieces of ``chunk_tokens`` tokens."""
+    encoding = _encoding()
+    if encoding is None:
+        size = chunk_tokens * CHARS_PER_TOKEN
+        return [text[start:start + size] for start in range(0, len(text), size)]
+    tokens = encoding.encode(text, disallowed_special=())
+    return [encoding.decode(tokens[start:start + chunk_tokens]) for start in range(0, len(tokens), chunk_tokens)]
+
+
+def split_text(text: str, chunk_tokens: int = CHUNK_TOKENS) -> List[str]:
+    """Split ``text`` into chunks of at most ``chunk_tokens`` tokens.
+
+    Paragraphs are kept whole where possible; a paragraph longer than a
+    chunk is cut into token windows.
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+
+    for paragraph in text.split("\n\n"):
+        if not paragraph.strip():
+            continue
+        tokens = count_tokens(paragraph)
+        if tokens > chunk_tokens:
+            if current:
+                chunks.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            chunks.extend(_windows(paragraph, chunk_tokens))
+            continue
+        if current_tokens + tokens > chunk_tokens:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(paragraph)
+        current_tokens += tokens
+
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _summarize(client: OllamaClient, prompt: str, model: str, options: Dict) -> str:
+    text, _ = client.complete(prompt, model, options=options)
+    return text.strip()
+
+
+def map_chunks(
+    client: OllamaClient,
+    chunks: List[str],
+    model: str,
+    options: Optional[Dict] = None,
+    concurrency: int = MAX_CONCURRENCY,
+    chunk_tokens: int = CHUNK_TOKENS,
+) -> Iterator[Tuple[int, str]]:
+    """Summarize every chunk, yielding ``(index, summary)`` in completion order.
+
+    ``chunk_tokens`` is the size ``chunks`` were split to; it sets ``num_ctx``.
+    """
+    options = _request_options(options, chunk_tokens, SUMMARY_TOKENS)
+    pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="map")
+    try:
+        futures = {
+            pool.submit(
+                _summarize, client, MAP_PROMPT.format(index=i + 1, total=len(chunks), chunk=chunk), model, options
+            ): i
+            for i, chunk in enumerate(chunks)
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        # On a failed chunk or an abandoned generator, drop the chunks not started yet
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _collapse(
+    client: OllamaClient,
+    summaries: List[str],
+    model: str,
+    options: Optional[Dict],
+    chunk_tokens: int,
+    concurrency: int,
+) -> List[str]:
+    """Merge groups of summaries until all of them fit in one prompt."""
+    while len(summaries) > 1 and count_tokens("\n\n".join(summaries)) > chunk_tokens:
+        groups = split_text("\n\n".join(summaries), chunk_tokens)
+        if len(groups) >= len(summaries):
+            # Summaries are individually too long to pair up; stop rather than loop
+            break
+        merged = [""] * len(groups)
+        pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="collapse")
+        try:
+            futures = {
+                pool.submit(
+                    _summarize,
+                    client,
+                    COMBINE_PROMPT.format(summaries=group),
+                    model,
+                    _request_options(options, chunk_tokens, SUMMARY_TOKENS),
+                ): i
+                for i, group in enumerate(groups)
+            }
+            for future in as_completed(futures):
+                merged[futures[future]] = future.result()
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        summaries = merged
+    return summaries
+
+
+def reduce_summaries(
+    client: OllamaClient,
+    summaries: List[str],
+    model: str,
+    options: Optional[Dict] = None,
+    chunk_tokens: int = CHUNK_TOKENS,
+    concurrency: int = MAX_CONCURRENCY,
+) -> OllamaStream:
+    """Stream the final analysis built from chunk summaries in document order."""
+    summaries = _collapse(client, summaries, model, options, chunk_tokens, concurrency)
+    prompt = REDUCE_PROMPT.format(
+        summaries="\n\n".join(f"Part {i + 1}: {summary}" for i, summary in enumerate(summaries))
+    )
+    # Summaries too long to collapse further can make this prompt larger than a chunk
+    prompt_tokens = max(chunk_tokens, count_tokens("\n\n".join(summaries)))
+    reply_tokens = (options or {}).get("num_predict") or ANALYSIS_TOKENS
+    return client.generate(prompt, model, options=_request_options(options, prompt_tokens, reply_tokens))
@@ -0,0 +1,121 @@
+"""
+Local cache for generated images.
+
+Images are downloaded once and stored under the SHA-256 of their bytes,
+next to a small WebP thumbnail for the chat view. Full images are only read
+when asked for. When the files grow past ``max_bytes`` the least recently
+used images are evicted, thumbnails and all.
+"""
+
+import hashlib
+import io
+import os
+import threading
+from typing import Optional
+
+import requests
+from PIL import Image
+
+DEFAULT_ROOT = "image_cache"
+
+# Total size of cached files before the least recently used are evicted
+MAX_BYTES = 200 * 1024 * 1024
+
+# Bounding box and quality of the chat thumbnails
+THUMBNAIL_SIZE = (384, 384)
+THUMBNAIL_QUALITY = 80
+
+DOWNLOAD_TIMEOUT = (5, 60)
+
+# Formats kept as downloaded, named by Pillow's format name
+IMAGE_EXTENSIONS = ("png", "webp", "jpeg", "gif")
+
+
+class ImageCache:
+    """Content-addressed images with WebP thumbnails, evicted by total size"""
+
+    def __init__(self, root: str = DEFAULT_ROOT, max_bytes: int = MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.full_dir = os.path.join(root, "full")
+        self.thumb_dir = os.path.join(root, "thumbs")
+        self._lock = threading.Lock()
+        os.makedirs(self.full_dir, exist_ok=True)
+        os.makedirs(self.thumb_dir, exist_ok=True)
+
+    def _full_path(self, image_id: str) -> Optional[str]:
+        for extension in IMAGE_EXTENSIONS:
+            path = os.path.join(self.full_dir, f"{image_id}.{extension}")
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _thumb_path(self, image_id: str) -> str:
+        return os.path.join(self.thumb_dir, image_id + ".webp")
+
+    def store(self, data: bytes) -> str:
+        """Add image bytes to the cache and return their id."""
+        image_id = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if self._full_path(image_id) is None:
+                image = Image.open(io.BytesIO(data))
+                extension = (image.format or "").lower()
+                if extension not in IMAGE_EXTENSIONS:
+                    raise ValueError(f"Unsupported image format: {image.format}")
+                with open(os.path.join(self.full_dir, f"{image_id}.{extension}"), "wb") as f:
+                    f.write(data)
+
+                if image.mode not in ("RGB", "RGBA"):
+                    image = image.convert("RGBA")
+                image.thumbnail(THUMBNAIL_SIZE)
+                image.save(self._thumb_path(image_id), "WEBP", quality=THUMBNAIL_QUALITY)
+            self._evict(keep=image_id)
+        return image_id
+
+    def fetch(self, url: str) -> str:
+        """Download ``url`` into the cache and return the image id."""
+        response = requests.get(url, timeout=DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        return self.store(response.content)
+
+    def _touch(self, path: str) -> Optional[str]:
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def thumbnail(self, image_id: str) -> Optional[str]:
+        """Path of the thumbnail, or ``None`` once evicted."""
+        return self._touch(self._thumb_path(image_id))
+
+    def full(self, image_id: str) -> Optional[str]:
+        """Path of the full-size image, or ``None`` once evicted."""
+        path = self._full_path(image_id)
+        return self._touch(path) if path else None
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """Drop least recently used images until the cache fits in ``max_bytes``."""
+        entries = {}
+        total = 0
+        for directory in (self.full_dir, self.thumb_dir):
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                stat = os.stat(path)
+                image_id = name.split(".", 1)[0]
+                size, last_used = entries.get(image_id, (0, 0.0))
+                entries[image_id] = (size + stat.st_size, max(last_used, stat.st_mtime))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+
+        for image_id, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+            if image_id == keep:
+                continue
+            full_path = self._full_path(image_id)
+            for path in (full_path, self._thumb_path(image_id)):
+                if path and os.path.exists(path):
+                    os.remove(path)
+            total -= size
+            if total <= self.max_bytes:
+                return
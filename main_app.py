@@ -1,5 +1,5 @@
 import streamlit as st
-from supabase import create_client, Client
+from supabase import Client
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
@@ -8,6 +8,24 @@ import base64
 import os
 import json
 
+from db import get_client, new_client
+from metrics import user_metrics
+from query_cache import cached_query, invalidate, invalidate_all
+from rollup import record_role_changes
+from user_directory import (
+    MIN_SEARCH_LENGTH,
+    SEARCH_LIMIT,
+    count_confirmed_users,
+    fetch_auth_users,
+    fetch_user_directory,
+    merge_profiles,
+    normalize_search,
+    search_profiles,
+)
+
+# Seconds a dashboard search result is reused for the same term and role
+SEARCH_TTL = 15
+
 # -------------------------
 # Sidebar Widget State Management
 # -------------------------
@@ -654,19 +672,23 @@ def display_logo():
 # -------------------------
 # Supabase Setup
 # -------------------------
-@st.cache_resource
 def init_connection():
     """Initialize Supabase connection"""
     try:
-        url = st.secrets["supabase"]["url"]
-        key = st.secrets["supabase"]["key"]
-        return create_client(url, key)
+        return get_client()
     except Exception as e:
         st.error(f"Failed to connect to Supabase: {e}")
         st.stop()
 
+# Shared anon client for reads; nobody signs in on it
 supabase = init_connection()
 
+def auth_client() -> Client:
+    """Per-session client that holds this user's sign-in; never shared between sessions"""
+    if "supabase_client" not in st.session_state:
+        st.session_state.supabase_client = new_client()
+    return st.session_state.supabase_client
+
 # -------------------------
 # Session State
 # -------------------------
@@ -689,14 +711,16 @@ def signup(email, password):
         return False, "⚠️ Password must be at least 6 characters long."
     
     try:
-        res = supabase.auth.sign_up({"email": email, "password": password})
+        client = auth_client()
+        res = client.auth.sign_up({"email": email, "password": password})
         if res.user:
             # Always create as regular user
-            supabase.table("user_profiles").insert({
+            client.table("user_profiles").insert({
                 "id": res.user.id,
                 "email": email,
                 "role": "user"  # Always user, no admin signup
             }).execute()
+            invalidate("user_profiles", "auth_users")
             return True, "✅ Account created! Please check your email to verify your account, then log in."
         return False, "❌ Failed to create account."
     except Exception as e:
@@ -708,9 +732,10 @@ def signup(email, password):
 def login(email, password):
     """Login user"""
     try:
-        res = supabase.auth.sign_in_with_password({"email": email, "password": password})
+        client = auth_client()
+        res = client.auth.sign_in_with_password({"email": email, "password": password})
         if res.user:
-            profile = supabase.table("user_profiles").select("role").eq("id", res.user.id).execute()
+            profile = client.table("user_profiles").select("role").eq("id", res.user.id).execute()
             role = profile.data[0]["role"] if profile.data else "user"
             st.session_state.authenticated = True
             st.session_state.user = res.user
@@ -723,7 +748,7 @@ def login(email, password):
 def reset_password(email):
     """Reset password"""
     try:
-        supabase.auth.reset_password_for_email(email)
+        auth_client().auth.reset_password_for_email(email)
         return True, f"✅ Password reset email sent to {email}"
     except Exception as e:
         return False, f"❌ Reset error: {str(e)}"
@@ -731,7 +756,7 @@ def reset_password(email):
 def logout():
     """Logout user"""
     try:
-        supabase.auth.sign_out()
+        auth_client().auth.sign_out()
     except Exception:
         pass
     st.session_state.authenticated = False
@@ -745,24 +770,8 @@ def logout():
 def get_user_data_as_json():
     """Get user data from Supabase as JSON"""
     try:
-        # Get user profiles
-        users = supabase.table("user_profiles").select("*").execute()
-        
-        # Get auth users for additional info
-        auth_users = supabase.auth.admin.list_users()
-        
-        # Combine data
-        user_data = []
-        for profile in users.data or []:
-            auth_info = next((u for u in auth_users.user if u.id == profile["id"]), None)
-            user_data.append({
-                "id": profile["id"],
-                "email": profile["email"],
-                "role": profile["role"],
-                "created_at": getattr(auth_info, "created_at", None),
-                "last_sign_in": getattr(auth_info, "last_sign_in_at", None),
-                "confirmed": getattr(auth_info, "email_confirmed_at", None) is not None,
-            })
+        # Profiles joined with auth info in a single pass
+        user_data = cached_query(("user_profiles", "auth_users"), "directory", lambda: fetch_user_directory(supabase))
         
         return {
             "export_timestamp": datetime.now().isoformat(),
@@ -776,13 +785,12 @@ def get_user_data_as_json():
 def get_analytics_data_as_json():
     """Get analytics data as JSON"""
     try:
-        users = supabase.table("user_profiles").select("*").execute()
-        auth_users = supabase.auth.admin.list_users()
+        metrics = cached_query("user_profiles", "metrics", lambda: user_metrics(supabase))
         
-        total_users = len(users.data or [])
-        admin_count = len([u for u in users.data or [] if u["role"] == "admin"])
+        total_users = metrics["total_users"]
+        admin_count = metrics["admin_users"]
         user_count = total_users - admin_count
-        confirmed_users = len([u for u in auth_users.user if getattr(u, 'email_confirmed_at', None)])
+        confirmed_users = cached_query("auth_users", "confirmed_count", lambda: count_confirmed_users(supabase))
         
         # Generate sample activity data
         dates = pd.date_range(start='2024-01-01', end=datetime.now(), freq='D')
@@ -979,6 +987,7 @@ def admin_dashboard():
             
             st.markdown("### 🚀 Quick Actions")
             if st.button("🔄 Refresh Data", use_container_width=True, key="admin_refresh"):
+                invalidate_all()
                 st.success("Data refreshed!")
             
             if st.button("📊 Export Reports", use_container_width=True, key="admin_export"):
@@ -1021,11 +1030,10 @@ def show_admin_analytics():
     st.subheader("📊 AI Agent Toolkit Analytics")
     
     try:
-        users = supabase.table("user_profiles").select("*").execute()
-        auth_users = supabase.auth.admin.list_users()
+        metrics = cached_query("user_profiles", "metrics", lambda: user_metrics(supabase))
         
-        total_users = len(users.data or [])
-        admin_count = len([u for u in users.data or [] if u["role"] == "admin"])
+        total_users = metrics["total_users"]
+        admin_count = metrics["admin_users"]
         user_count = total_users - admin_count
         
         col1, col2, col3, col4 = st.columns(4)
@@ -1036,10 +1044,10 @@ def show_admin_analytics():
         with col3:
             st.metric("Administrators", admin_count)
         with col4:
-            confirmed_users = len([u for u in auth_users.user if getattr(u, 'email_confirmed_at', None)])
+            confirmed_users = cached_query("auth_users", "confirmed_count", lambda: count_confirmed_users(supabase))
             st.metric("Confirmed Users", confirmed_users)
         
-        if users.data:
+        if total_users:
             st.subheader("📈 User Registration Trends")
             dates = pd.date_range(start='2024-01-01', end=datetime.now(), freq='D')
             registrations = pd.DataFrame({
@@ -1079,32 +1087,32 @@ def show_user_management():
     st.subheader("👥 User Management")
     
     try:
-        users = supabase.table("user_profiles").select("*").execute()
-        auth_users = supabase.auth.admin.list_users()
-
-        user_data = []
-        for profile in users.data or []:
-            auth_info = next((u for u in auth_users.user if u.id == profile["id"]), None)
-            user_data.append({
-                "id": profile["id"],
-                "email": profile["email"],
-                "role": profile["role"],
-                "created_at": getattr(auth_info, "created_at", None),
-                "last_sign_in": getattr(auth_info, "last_sign_in_at", None),
-                "confirmed": getattr(auth_info, "email_confirmed_at", None) is not None,
-            })
-
         col1, col2 = st.columns([2, 1])
         with col1:
-            search = st.text_input("🔍 Search by email")
+            search = st.text_input("🔍 Search by email", help=f"Type at least {MIN_SEARCH_LENGTH} characters")
         with col2:
             role_filter = st.selectbox("Filter by role", ["All", "user", "admin"])
         
-        filtered = user_data
-        if search:
-            filtered = [u for u in filtered if search.lower() in u["email"].lower()]
-        if role_filter != "All":
-            filtered = [u for u in filtered if u["role"] == role_filter]
+        # Filter in the database; identical searches within the TTL reuse the
+        # cached result, so only a changed term costs a query
+        search = normalize_search(search)
+        role = None if role_filter == "All" else role_filter
+        profiles = cached_query(
+            "user_profiles",
+            ("search", search, role, SEARCH_LIMIT),
+            lambda: search_profiles(supabase, search, role, SEARCH_LIMIT),
+            ttl=SEARCH_TTL,
+        )
+        # Auth details only for the matched profiles, not the whole user list
+        auth_index = cached_query(
+            "auth_users",
+            ("search", search, role, SEARCH_LIMIT),
+            lambda: fetch_auth_users(supabase, [profile["id"] for profile in profiles]),
+            ttl=SEARCH_TTL,
+        )
+        filtered = merge_profiles(profiles, auth_index)
+        if len(filtered) == SEARCH_LIMIT:
+            st.caption(f"Showing the first {SEARCH_LIMIT} matches. Refine your search to narrow the list.")
 
         st.subheader("🎯 Bulk Actions")
         col1, col2 = st.columns(2)
@@ -1135,6 +1143,8 @@ def show_user_management():
                                                 key=f"role_{i}")
                         if st.button("Update Role", key=f"update_{i}"):
                             supabase.table("user_profiles").update({"role": new_role}).eq("id", user["id"]).execute()
+                            invalidate("user_profiles")
+                            record_role_changes(new_role)
                             st.success(f"Updated {user['email']} to {new_role}")
                             st.rerun()
                     
@@ -1151,6 +1161,7 @@ def show_user_management():
                             try:
                                 supabase.table("user_profiles").delete().eq("id", user["id"]).execute()
                                 supabase.auth.admin.delete_user(user["id"])
+                                invalidate("user_profiles", "auth_users")
                                 st.warning(f"Deleted {user['email']}")
                                 st.rerun()
                             except Exception as e:
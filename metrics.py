@@ -0,0 +1,135 @@
+"""
+Dashboard metrics computed by the database.
+
+Counts come from ``count="exact", head=True`` requests, so each number costs a
+response header instead of a table download. Role counts use the grouped
+``user_role_counts`` RPC when it is installed (see ``ROLE_COUNTS_SQL``) and
+fall back to one head count per known role otherwise. Either way, NULL and
+unlisted roles are counted under ``OTHER_ROLE``.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional
+
+from postgrest.exceptions import APIError
+
+logger = logging.getLogger(__name__)
+
+# Roles the admin pages assign to profiles
+ROLES = ("user", "admin", "suspended")
+
+# Statuses the plan management page sets on user_plans
+PLAN_STATUSES = ("active", "expired", "cancelled", "suspended")
+
+# Fallback bucket for profiles whose role is NULL or not in ROLES
+OTHER_ROLE = "other"
+
+ROLE_COUNTS_RPC = "user_role_counts"
+
+# PostgREST and Postgres codes for a function that isn't installed
+MISSING_FUNCTION_CODES = {"PGRST202", "42883"}
+
+# Install once in the Supabase SQL editor to get role counts in one request
+ROLE_COUNTS_SQL = """
+create or replace function user_role_counts()
+returns table (role text, total bigint)
+language sql stable
+as $$
+  select role, count(*) as total
+  from user_profiles
+  group by 1
+$$;
+"""
+
+
+def count_rows(
+    supabase,
+    table: str,
+    eq: Optional[Dict[str, str]] = None,
+    since: Optional[datetime] = None,
+    date_column: str = "created_at",
+) -> int:
+    """Count rows matching ``eq`` (and created at or after ``since``) without fetching them."""
+    query = supabase.table(table).select("*", count="exact", head=True)
+    for column, value in (eq or {}).items():
+        query = query.eq(column, value)
+    if since is not None:
+        query = query.gte(date_column, since.isoformat())
+    return query.execute().count or 0
+
+
+def _role_bucket(role: Optional[str]) -> str:
+    return role if role in ROLES else OTHER_ROLE
+
+
+def role_counts(supabase, total: Optional[int] = None) -> Dict[str, int]:
+    """Return the number of profiles per role; the counts add up to ``total``."""
+    try:
+        rows = supabase.rpc(ROLE_COUNTS_RPC).execute().data or []
+    except APIError as e:
+        if e.code not in MISSING_FUNCTION_CODES:
+            raise
+        logger.warning("%s is not installed; counting roles one request at a time (see ROLE_COUNTS_SQL)", ROLE_COUNTS_RPC)
+    else:
+        counts = dict.fromkeys(ROLES, 0)
+        for row in rows:
+            role = _role_bucket(row["role"])
+            counts[role] = counts.get(role, 0) + row["total"]
+        return counts
+
+    counts = {role: count_rows(supabase, "user_profiles", eq={"role": role}) for role in ROLES}
+    if total is None:
+        total = count_rows(supabase, "user_profiles")
+    other = total - sum(counts.values())
+    if other > 0:
+        counts[OTHER_ROLE] = other
+    return counts
+
+
+def _summary(total: int, roles: Dict[str, int], new_users: int) -> Dict:
+    return {
+        "total_users": total,
+        "role_counts": roles,
+        "admin_users": roles.get("admin", 0),
+        "regular_users": roles.get("user", 0),
+        "suspended_users": roles.get("suspended", 0),
+        "new_users": new_users,
+    }
+
+
+def user_metrics(supabase, days: int = 30) -> Dict:
+    """Total users, per-role counts and signups in the last ``days`` days."""
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    total = count_rows(supabase, "user_profiles")
+    return _summary(
+        total,
+        role_counts(supabase, total),
+        count_rows(supabase, "user_profiles", since=since),
+    )
+
+
+def summarize_users(users: Iterable[Dict], days: int = 30) -> Dict:
+    """Same summary as ``user_metrics`` for rows already in memory, e.g. sample data."""
+    since = datetime.now() - timedelta(days=days)
+    total = 0
+    roles: Dict[str, int] = {}
+    new_users = 0
+    for user in users:
+        total += 1
+        role = _role_bucket(user.get("role"))
+        roles[role] = roles.get(role, 0) + 1
+        created_at = user.get("created_at")
+        if created_at and datetime.fromisoformat(created_at.replace("Z", "+00:00")).replace(tzinfo=None) >= since:
+            new_users += 1
+    return _summary(total, roles, new_users)
+
+
+def active_plan_count(supabase) -> int:
+    """Number of plans with ``status = 'active'``."""
+    return count_rows(supabase, "user_plans", eq={"status": "active"})
+
+
+def plan_status_counts(supabase) -> Dict[str, int]:
+    """Number of plans in each known status."""
+    return {status: count_rows(supabase, "user_plans", eq={"status": status}) for status in PLAN_STATUSES}
@@ -0,0 +1,116 @@
+"""
+Concurrent multi-model comparison on a local Ollama server.
+
+Every model gets the same prompt at the same time on its own worker
+thread, so a comparison takes as long as the slowest model instead of the
+sum of all of them. Workers only produce events; the caller consumes them
+on its own thread, which is what Streamlit needs to update the page. If
+the caller stops consuming early, the workers close their streams.
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from ollama_client import OllamaClient, OllamaError
+
+# Event kinds yielded by ``compare_models``
+TOKEN = "token"
+DONE = "done"
+ERROR = "error"
+
+BENCHMARK_COLUMNS = [
+    "Run At",
+    "Prompt",
+    "Model",
+    "Time to First Token (ms)",
+    "Tokens/s",
+    "Latency (s)",
+    "Load (ms)",
+    "Prompt Tokens",
+    "Output Tokens",
+    "Response Length",
+    "Error",
+]
+
+
+def _run_model(
+    client: OllamaClient,
+    prompt: str,
+    model: str,
+    options: Optional[Dict],
+    events: queue.Queue,
+    stop: threading.Event,
+) -> None:
+    try:
+        if stop.is_set():
+            return
+        stream = client.generate(prompt, model, options=options)
+        tokens = iter(stream)
+        for text in tokens:
+            if stop.is_set():
+                # Closing the generator closes the response and its connection
+                tokens.close()
+                return
+            events.put((TOKEN, model, text))
+        events.put((DONE, model, {**stream.stats, "response": stream.text}))
+    except OllamaError as e:
+        events.put((ERROR, model, str(e)))
+    except Exception as e:
+        events.put((ERROR, model, f"Unexpected error: {e}"))
+
+
+def compare_models(
+    client: OllamaClient,
+    prompt: str,
+    models: List[str],
+    options: Optional[Dict] = None,
+) -> Iterator[Tuple[str, str, object]]:
+    """Run ``prompt`` on every model at once.
+
+    Yields ``(TOKEN, model, text)`` as text streams in, then one
+    ``(DONE, model, stats)`` or ``(ERROR, model, message)`` per model.
+    """
+    events: queue.Queue = queue.Queue()
+    stop = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=max(len(models), 1), thread_name_prefix="compare")
+    try:
+        for model in models:
+            pool.submit(_run_model, client, prompt, model, options, events, stop)
+        remaining = len(models)
+        while remaining:
+            event = events.get()
+            if event[0] != TOKEN:
+                remaining -= 1
+            yield event
+    finally:
+        # Closed early (a rerun, an error in the caller): stop the models still streaming
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def benchmark_row(prompt: str, model: str, stats: Optional[Dict] = None, error: Optional[str] = None) -> Dict:
+    """One row of the benchmark table for a finished or failed model."""
+    stats = stats or {}
+    return {
+        "Run At": datetime.now().isoformat(timespec="seconds"),
+        "Prompt": prompt,
+        "Model": model,
+        "Time to First Token (ms)": stats.get("ttft_ms"),
+        "Tokens/s": stats.get("tokens_per_second"),
+        "Latency (s)": round(stats["latency_ms"] / 1000, 2) if "latency_ms" in stats else None,
+        "Load (ms)": stats.get("load_ms"),
+        "Prompt Tokens": stats.get("prompt_eval_count"),
+        "Output Tokens": stats.get("eval_count"),
+        "Response Length": len(stats.get("response", "")),
+        "Error": error,
+    }
+
+
+def benchmark_frame(rows: List[Dict]) -> pd.DataFrame:
+    """Benchmark rows as a DataFrame with a stable column order."""
+    return pd.DataFrame(rows, columns=BENCHMARK_COLUMNS)
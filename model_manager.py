@@ -0,0 +1,125 @@
+"""
+Warm-up and memory budgeting for Ollama models.
+
+Models the user picks are loaded ahead of their first request, so nobody
+waits for a cold load mid-conversation. Each model can have its own
+``keep_alive``. Before a model is loaded or used, the least recently used
+other models are unloaded until the expected memory fits the RAM budget.
+The manager is shared, so each call can pass its own budget instead of
+changing the default for everyone.
+Sizes come from ``/api/ps`` for loaded models and ``/api/tags`` otherwise.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from ollama_client import OllamaClient, OllamaError
+
+GB = 1024 ** 3
+
+# Memory Ollama may use for loaded models before older ones are unloaded
+DEFAULT_RAM_BUDGET = float(os.environ.get("OLLAMA_RAM_BUDGET_GB", "8")) * GB
+
+# keep_alive for models warmed through the manager
+WARM_KEEP_ALIVE = "30m"
+
+
+class ModelManager:
+    """Keeps selected models loaded within a RAM budget, evicting the least recently used"""
+
+    def __init__(self, client: OllamaClient, ram_budget: float = DEFAULT_RAM_BUDGET):
+        self.client = client
+        self.ram_budget = ram_budget
+        self.last_used: Dict[str, float] = {}
+        # keep_alive each model was last loaded with, to reapply it when changed
+        self._loaded_with: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def set_keep_alive(self, model: str, keep_alive: str) -> None:
+        """Use ``keep_alive`` for every request to ``model`` from now on."""
+        self.client.model_keep_alive[model] = keep_alive
+
+    def loaded(self) -> List[Dict]:
+        """Loaded models with their memory use, most recently used first."""
+        models = [
+            {
+                "name": model["name"],
+                "size": model.get("size", 0),
+                "size_vram": model.get("size_vram", 0),
+                "expires_at": model.get("expires_at"),
+                "keep_alive": self.client.keep_alive_for(model["name"]),
+                "last_used": self.last_used.get(model["name"]),
+            }
+            for model in self.client.running_models()
+        ]
+        return sorted(models, key=lambda model: model["last_used"] or 0, reverse=True)
+
+    def _installed_sizes(self) -> Dict[str, int]:
+        return {model["name"]: model.get("size", 0) for model in self.client.list_models()}
+
+    def _make_room(self, models: List[str], loaded: List[Dict], ram_budget: float) -> List[str]:
+        """Unload other models, least recently used first, until ``models`` fit ``ram_budget``."""
+        loaded_sizes = {model["name"]: model["size"] for model in loaded}
+        installed_sizes = self._installed_sizes()
+        needed = sum(loaded_sizes.get(model, installed_sizes.get(model, 0)) for model in models)
+        used = sum(size for name, size in loaded_sizes.items() if name not in models)
+
+        evicted = []
+        candidates = sorted(
+            (name for name in loaded_sizes if name not in models),
+            key=lambda name: self.last_used.get(name, 0),
+        )
+        for name in candidates:
+            if used + needed <= ram_budget:
+                break
+            self.client.unload(name)
+            self._loaded_with.pop(name, None)
+            used -= loaded_sizes[name]
+            evicted.append(name)
+        return evicted
+
+    def use(self, models: Iterable[str], ram_budget: Optional[float] = None) -> List[str]:
+        """Call before sending requests to ``models``; returns the models evicted for them.
+
+        ``ram_budget`` defaults to the manager's ``ram_budget``.
+        """
+        models = list(dict.fromkeys(models))
+        with self._lock:
+            now = time.time()
+            for model in models:
+                self.last_used[model] = now
+            return self._make_room(models, self.loaded(), ram_budget or self.ram_budget)
+
+    def warm(self, models: Iterable[str], ram_budget: Optional[float] = None) -> Dict[str, Optional[float]]:
+        """Load any of ``models`` that aren't loaded yet, within ``ram_budget``.
+
+        Loaded models are loaded again only when their ``keep_alive`` changed.
+        Returns seconds spent loading each model, ``None`` for models that
+        were already warm.
+        """
+        models = list(dict.fromkeys(models))
+        with self._lock:
+            now = time.time()
+            for model in models:
+                self.last_used.setdefault(model, now)
+            loaded = self.loaded()
+            loaded_names = {model["name"] for model in loaded}
+            self._make_room(models, loaded, ram_budget or self.ram_budget)
+
+            load_times: Dict[str, Optional[float]] = {}
+            for model in models:
+                keep_alive = self.client.keep_alive_for(model)
+                if model in loaded_names and self._loaded_with.get(model) == keep_alive:
+                    load_times[model] = None
+                    continue
+                load_times[model] = self.client.load(model)
+                self._loaded_with[model] = keep_alive
+            return load_times
+
+    def unload(self, model: str) -> None:
+        with self._lock:
+            self.client.unload(model)
+            self._loaded_with.pop(model, None)
+
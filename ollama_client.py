@@ -0,0 +1,254 @@
+"""
+Pooled, streaming client for a local Ollama server.
+
+One ``requests.Session`` keeps connections to the server alive between
+calls. Generation and chat responses are read as NDJSON while the model
+produces them, so callers can show tokens immediately and measure time to
+first token. Every request has separate connect and read timeouts, and
+``keep_alive`` controls how long the model stays loaded afterwards.
+"""
+
+import json
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_PORT = 11434
+
+
+def normalize_host(host: str) -> str:
+    """Base URL for an ``OLLAMA_HOST`` value, read the way Ollama reads it.
+
+    Without a scheme, http and port 11434 are assumed, so ``localhost`` and
+    ``0.0.0.0:11434`` work. Given ``http://`` or ``https://`` without a
+    port, the scheme's standard port is used. An empty value means the
+    local server.
+    """
+    host = host.strip()
+    scheme, separator, rest = host.partition("://")
+    if separator:
+        default_port = {"http": 80, "https": 443}.get(scheme.lower(), DEFAULT_PORT)
+    else:
+        scheme, rest, default_port = "http", host, DEFAULT_PORT
+    hostport, _, path = rest.partition("/")
+    try:
+        parsed = urlsplit(f"//{hostport}")
+        hostname, port = parsed.hostname, parsed.port
+    except ValueError:
+        # A bare IPv6 address such as ::1
+        hostname, port = hostport.strip("[]"), None
+    hostname = hostname or "127.0.0.1"
+    if ":" in hostname:
+        hostname = f"[{hostname}]"
+    base = f"{scheme.lower()}://{hostname}:{port or default_port}"
+    path = path.strip("/")
+    return f"{base}/{path}" if path else base
+
+
+DEFAULT_HOST = normalize_host(os.environ.get("OLLAMA_HOST", ""))
+
+# Seconds to open a connection, and to wait between streamed chunks
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 120.0
+
+# How long Ollama keeps a model in memory after a request
+DEFAULT_KEEP_ALIVE = "5m"
+
+POOL_SIZE = 10
+
+
+class OllamaError(Exception):
+    """Ollama could not be reached or returned an error"""
+
+
+def _stats(final: Dict, ttft_ms: Optional[float], latency_ms: float) -> Dict:
+    """Timing and eval counts from the last chunk of a response (durations are in ns)."""
+    eval_count = final.get("eval_count", 0)
+    eval_duration = final.get("eval_duration", 0)
+    return {
+        "model": final.get("model"),
+        "ttft_ms": round(ttft_ms) if ttft_ms is not None else None,
+        "latency_ms": round(latency_ms),
+        "load_ms": round(final.get("load_duration", 0) / 1e6),
+        "prompt_eval_count": final.get("prompt_eval_count", 0),
+        "eval_count": eval_count,
+        "tokens_per_second": round(eval_count / (eval_duration / 1e9), 1) if eval_duration else 0.0,
+    }
+
+
+def format_stats(stats: Dict, latency: bool = False) -> str:
+    """Timing caption for a response; parts missing from ``stats`` are left out."""
+    parts = []
+    if stats.get("ttft_ms") is not None:
+        parts.append(f"⚡ {stats['ttft_ms']} ms to first token")
+    if stats.get("tokens_per_second"):
+        parts.append(f"{stats['tokens_per_second']} tokens/s")
+    if latency and stats.get("latency_ms") is not None:
+        parts.append(f"{stats['latency_ms'] / 1000:.2f}s")
+    return " · ".join(parts)
+
+
+class OllamaStream:
+    """Iterates over response text as it arrives; ``stats`` is filled in once done"""
+
+    def __init__(self, response: requests.Response, started: float):
+        self.response = response
+        self.started = started
+        self.parts: List[str] = []
+        self.stats: Dict = {}
+
+    def __iter__(self) -> Iterator[str]:
+        ttft_ms = None
+        with self.response:
+            try:
+                for line in self.response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise OllamaError(chunk["error"])
+                    # /api/generate streams "response", /api/chat streams "message"
+                    text = chunk.get("response") or chunk.get("message", {}).get("content", "")
+                    if text:
+                        if ttft_ms is None:
+                            ttft_ms = (time.perf_counter() - self.started) * 1000
+                        self.parts.append(text)
+                        yield text
+                    if chunk.get("done"):
+                        self.stats = _stats(chunk, ttft_ms, (time.perf_counter() - self.started) * 1000)
+            except requests.exceptions.Timeout as e:
+                raise OllamaError("Ollama stopped responding mid-stream (read timed out)") from e
+            except requests.exceptions.RequestException as e:
+                raise OllamaError(f"Lost the connection to Ollama mid-stream: {e}") from e
+            except ValueError as e:
+                raise OllamaError(f"Ollama sent a response that isn't valid JSON: {e}") from e
+        if not self.stats:
+            raise OllamaError("Ollama closed the stream before the response finished")
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+
+class OllamaClient:
+    """Client for one Ollama server over a keep-alive connection pool"""
+
+    def __init__(
+        self,
+        host: str = DEFAULT_HOST,
+        connect_timeout: float = CONNECT_TIMEOUT,
+        read_timeout: float = READ_TIMEOUT,
+        keep_alive: str = DEFAULT_KEEP_ALIVE,
+        pool_size: int = POOL_SIZE,
+    ):
+        self.host = normalize_host(host)
+        self.timeout = (connect_timeout, read_timeout)
+        self.keep_alive = keep_alive
+        # Per-model keep_alive overrides, e.g. set by the model manager
+        self.model_keep_alive: Dict[str, str] = {}
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _request(self, method: str, path: str, payload: Optional[Dict] = None, stream: bool = False) -> requests.Response:
+        try:
+            response = self.session.request(
+                method, f"{self.host}{path}", json=payload, stream=stream, timeout=self.timeout
+            )
+        except requests.exceptions.ConnectionError as e:
+            raise OllamaError(f"Could not connect to Ollama at {self.host}. Is `ollama serve` running?") from e
+        except requests.exceptions.Timeout as e:
+            raise OllamaError(f"Ollama at {self.host} timed out") from e
+        except requests.exceptions.RequestException as e:
+            raise OllamaError(f"Request to Ollama at {self.host} failed: {e}") from e
+        if response.status_code != 200:
+            try:
+                message = response.json().get("error", response.text)
+            except ValueError:
+                message = response.text
+            response.close()
+            raise OllamaError(f"{response.status_code}: {message}")
+        return response
+
+    def keep_alive_for(self, model: str) -> str:
+        return self.model_keep_alive.get(model, self.keep_alive)
+
+    def generate(
+        self,
+        prompt: str,
+        model: str,
+        system: Optional[str] = None,
+        options: Optional[Dict] = None,
+        keep_alive: Optional[str] = None,
+    ) -> OllamaStream:
+        """Stream a completion for ``prompt`` from ``/api/generate``."""
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": True,
+            "keep_alive": keep_alive or self.keep_alive_for(model),
+        }
+        if system:
+            payload["system"] = system
+        if options:
+            payload["options"] = options
+        started = time.perf_counter()
+        return OllamaStream(self._request("POST", "/api/generate", payload, stream=True), started)
+
+    def chat(
+        self,
+        messages: List[Dict],
+        model: str,
+        options: Optional[Dict] = None,
+        keep_alive: Optional[str] = None,
+    ) -> OllamaStream:
+        """Stream the next assistant message for ``messages`` from ``/api/chat``."""
+        payload = {
+            "model": model,
+            "messages": [{"role": m["role"], "content": m["content"]} for m in messages],
+            "stream": True,
+            "keep_alive": keep_alive or self.keep_alive_for(model),
+        }
+        if options:
+            payload["options"] = options
+        started = time.perf_counter()
+        return OllamaStream(self._request("POST", "/api/chat", payload, stream=True), started)
+
+    def complete(self, prompt: str, model: str, **kwargs) -> Tuple[str, Dict]:
+        """Whole response and its stats, for callers that don't stream."""
+        stream = self.generate(prompt, model, **kwargs)
+        for _ in stream:
+            pass
+        return stream.text, stream.stats
+
+    def load(self, model: str, keep_alive: Optional[str] = None) -> float:
+        """Load ``model`` into memory without generating; returns the seconds it took."""
+        started = time.perf_counter()
+        self._request(
+            "POST", "/api/generate", {"model": model, "keep_alive": keep_alive or self.keep_alive_for(model), "stream": False}
+        )
+        return time.perf_counter() - started
+
+    def unload(self, model: str) -> None:
+        """Release ``model`` from memory now."""
+        self._request("POST", "/api/generate", {"model": model, "keep_alive": 0, "stream": False})
+
+    def _get_json(self, path: str) -> Dict:
+        response = self._request("GET", path)
+        try:
+            return response.json()
+        except ValueError as e:
+            raise OllamaError(f"Ollama sent a response that isn't valid JSON: {e}") from e
+
+    def list_models(self) -> List[Dict]:
+        """Models installed on the server (``/api/tags``)."""
+        return self._get_json("/api/tags").get("models", [])
+
+    def running_models(self) -> List[Dict]:
+        """Models currently loaded in memory (``/api/ps``)."""
+        return self._get_json("/api/ps").get("models", [])
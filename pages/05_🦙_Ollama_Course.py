@@ -452,18 +452,31 @@ with tab4:
         **REST API Usage:**
         
         ```python
+        import json
         import requests
         
-        response = requests.post('http://localhost:11434/api/generate',
+        # Reuse one session so connections stay open between requests
+        session = requests.Session()
+        
+        response = session.post('http://localhost:11434/api/generate',
             json={
                 'model': 'llama2',
                 'prompt': 'Why is the sky blue?',
-                'stream': False
-            })
-        
-        print(response.json()['response'])
+                'stream': True,
+                'keep_alive': '10m'
+            },
+            stream=True,
+            timeout=(5, 120))  # (connect, read) seconds
+        
+        # One JSON object per line, as tokens are generated
+        for line in response.iter_lines():
+            chunk = json.loads(line)
+            print(chunk['response'], end='', flush=True)
         ```
         
+        The Streamlit + Ollama course packages this into a reusable
+        `OllamaClient` with streaming and time-to-first-token stats.
+        
         **Python Library:**
         ```python
         import ollama
@@ -489,6 +502,8 @@ with tab4:
         **Memory Management:**
         - Use `OLLAMA_NUM_PARALLEL` for concurrent requests
         - Set `OLLAMA_MAX_LOADED_MODELS` to limit memory
+        - Preload a model with `/api/generate` and no prompt; `keep_alive` sets how long it stays loaded (`0` unloads it)
+        - Check loaded models and their memory with `/api/ps`
         - Use smaller models for better performance
         
         **Custom Modelfiles:**
@@ -4,6 +4,15 @@ from datetime import datetime
 import json
 import os
 import base64
+import inspect
+
+import document_analysis
+import model_comparison
+import ollama_client
+from document_analysis import CHUNK_TOKENS, MAX_CONCURRENCY, count_tokens, map_chunks, reduce_summaries, split_text
+from model_comparison import DONE, ERROR, TOKEN, benchmark_frame, benchmark_row, compare_models
+from model_manager import DEFAULT_RAM_BUDGET, GB, WARM_KEEP_ALIVE, ModelManager
+from ollama_client import DEFAULT_HOST, OllamaClient, OllamaError, format_stats
 
 # -------------------------
 # Hide Streamlit Elements for Cloud Deployment
@@ -242,6 +251,18 @@ def display_logo():
         </div>
         """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_ollama_client() -> OllamaClient:
+    """Pooled client for the configured Ollama host, shared across reruns and sessions"""
+    return OllamaClient(st.secrets.get("OLLAMA_HOST") or DEFAULT_HOST)
+
+@st.cache_resource
+def get_model_manager() -> ModelManager:
+    """Warm-up and eviction for the models on the configured host, shared across sessions"""
+    return ModelManager(get_ollama_client())
+
+KEEP_ALIVE_OPTIONS = ["5m", "30m", "1h", "4h", "-1m"]
+
 # Apply styling and authentication check
 hide_streamlit_style()
 apply_ai_toolkit_theme()
@@ -300,7 +321,7 @@ progress = completed_lessons / total_lessons if total_lessons > 0 else 0
 st.progress(progress, text=f"Course Progress: {completed_lessons}/{total_lessons} lessons completed")
 
 # Course content tabs
-tab1, tab2, tab3, tab4 = st.tabs(["🎯 Course Overview", "💻 Setup & Installation", "🔧 Building Apps", "🚀 Advanced Projects"])
+tab1, tab2, tab3, tab4, tab5 = st.tabs(["🎯 Course Overview", "💻 Setup & Installation", "🔧 Building Apps", "🚀 Advanced Projects", "🧪 Live Lab"])
 
 with tab1:
     st.markdown('<div class="lesson-card">', unsafe_allow_html=True)
@@ -481,14 +502,24 @@ with tab3:
     st.subheader("💬 Lesson 2: Basic Chat Interface")
     
     st.markdown("""
-    Let's build a simple chat application that connects Streamlit with Ollama:
+    Let's build a simple chat application that connects Streamlit with Ollama.
+    
+    First, save this client as `ollama_client.py` next to your app. It keeps one pooled HTTP
+    session to Ollama, streams tokens as they are generated and measures time to first token:
+    """)
+    
+    st.markdown('<div class="code-block">', unsafe_allow_html=True)
+    st.code(inspect.getsource(ollama_client), language="python")
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    st.markdown("""
+    Then build the chat app on top of it:
     """)
     
     st.markdown('<div class="code-block">', unsafe_allow_html=True)
     st.code("""
 import streamlit as st
-import requests
-import json
+from ollama_client import OllamaClient, OllamaError, format_stats
 
 # App configuration
 st.set_page_config(
@@ -499,28 +530,17 @@ st.set_page_config(
 
 st.title("🤖 Ollama Chat Assistant")
 
+# One pooled client for the whole app, reused across reruns
+@st.cache_resource
+def get_client():
+    return OllamaClient("http://localhost:11434", connect_timeout=5, read_timeout=120, keep_alive="10m")
+
+client = get_client()
+
 # Initialize chat history
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
-# Function to call Ollama API
-def call_ollama(prompt, model="llama2:7b"):
-    url = "http://localhost:11434/api/generate"
-    data = {
-        "model": model,
-        "prompt": prompt,
-        "stream": False
-    }
-    
-    try:
-        response = requests.post(url, json=data)
-        if response.status_code == 200:
-            return response.json()["response"]
-        else:
-            return "Error: Could not connect to Ollama"
-    except Exception as e:
-        return f"Error: {str(e)}"
-
 # Display chat messages
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
@@ -535,11 +555,15 @@ if prompt := st.chat_input("What would you like to know?"):
     with st.chat_message("user"):
         st.markdown(prompt)
     
-    # Get AI response
+    # Stream the AI response token by token
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            response = call_ollama(prompt)
-            st.markdown(response)
+        try:
+            stream = client.chat(st.session_state.messages, model="llama2:7b")
+            response = st.write_stream(stream)
+            st.caption(format_stats(stream.stats))
+        except OllamaError as e:
+            response = f"Error: {e}"
+            st.error(response)
     
     # Add assistant response to chat history
     st.session_state.messages.append({"role": "assistant", "content": response})
@@ -550,9 +574,10 @@ if prompt := st.chat_input("What would you like to know?"):
     ### Key Features Explained:
     
     1. **Session State**: Maintains chat history across interactions
-    2. **Ollama API**: Communicates with local Ollama instance
-    3. **Chat Interface**: Uses Streamlit's built-in chat components
-    4. **Error Handling**: Gracefully handles connection issues
+    2. **Pooled Client**: One cached `OllamaClient` reuses its HTTP connections on every rerun
+    3. **Streaming**: Tokens appear as Ollama generates them, with time to first token shown
+    4. **Timeouts & keep_alive**: Separate connect/read timeouts, and the model stays loaded between messages
+    5. **Error Handling**: `OllamaError` covers connection problems and server errors
     """)
     
     if st.button("✅ Mark Lesson 2 Complete", key="lesson2_complete"):
@@ -564,7 +589,20 @@ if prompt := st.chat_input("What would you like to know?"):
     st.subheader("⚡ Lesson 3: Enhanced Features")
     
     st.markdown("""
-    Let's add more advanced features to our chat app:
+    Let's add more advanced features to our chat app, including analysis of documents
+    too long for one prompt.
+    
+    Save this module as `document_analysis.py` next to `ollama_client.py` (it needs
+    `pip install tiktoken`). It splits a document into chunks, summarizes them a few at a
+    time and combines the summaries, with `num_ctx` set so each chunk fits the model's context:
+    """)
+    
+    st.markdown('<div class="code-block">', unsafe_allow_html=True)
+    st.code(inspect.getsource(document_analysis), language="python")
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    st.markdown("""
+    Then add the settings and the document upload to your app:
     """)
     
     st.markdown('<div class="code-block">', unsafe_allow_html=True)
@@ -590,42 +628,35 @@ with st.sidebar:
         st.session_state.messages = []
         st.rerun()
 
-# Enhanced Ollama function
-def call_ollama_enhanced(prompt, model="llama2:7b", temperature=0.7, max_tokens=500):
-    url = "http://localhost:11434/api/generate"
-    data = {
-        "model": model,
-        "prompt": prompt,
-        "stream": False,
-        "options": {
-            "temperature": temperature,
-            "num_predict": max_tokens
-        }
-    }
-    
-    try:
-        response = requests.post(url, json=data, timeout=30)
-        if response.status_code == 200:
-            return response.json()["response"]
-        else:
-            return f"Error: {response.status_code} - {response.text}"
-    except requests.exceptions.Timeout:
-        return "Error: Request timed out"
-    except Exception as e:
-        return f"Error: {str(e)}"
+# Model options for every request
+options = {"temperature": temperature, "num_predict": max_tokens}
 
 # Add file upload capability
+from document_analysis import map_chunks, reduce_summaries, split_text
+
 uploaded_file = st.file_uploader("📁 Upload a text file", type=['txt', 'md'])
 if uploaded_file is not None:
-    content = uploaded_file.read().decode('utf-8')
-    st.text_area("File Content", content, height=200)
+    content = uploaded_file.read().decode('utf-8', errors='replace')
+    st.text_area("File Preview", content[:5000], height=200)
     
     if st.button("📖 Analyze Document"):
-        analysis_prompt = f"Please analyze this document and provide a summary:\\n\\n{content}"
-        with st.spinner("Analyzing document..."):
-            response = call_ollama_enhanced(analysis_prompt, selected_model, temperature, max_tokens)
+        # Split into chunks that fit the model's context window
+        chunks = split_text(content)
+        progress = st.progress(0.0, text=f"Summarizing {len(chunks)} chunks...")
+        
+        try:
+            # Map: summarize the chunks, a few requests at a time
+            summaries = [""] * len(chunks)
+            for done, (index, summary) in enumerate(map_chunks(client, chunks, selected_model, options), 1):
+                summaries[index] = summary
+                progress.progress(done / len(chunks), text=f"Summarized chunk {index + 1} ({done}/{len(chunks)})")
+            
+            # Reduce: combine the summaries into one analysis
             st.markdown("### 📊 Analysis Results")
-            st.markdown(response)
+            stream = reduce_summaries(client, summaries, selected_model, options)
+            st.write_stream(stream)
+        except OllamaError as e:
+            st.error(f"Error: {e}")
     """, language="python")
     st.markdown('</div>', unsafe_allow_html=True)
     
@@ -650,69 +681,76 @@ with tab4:
     st.markdown('<div class="project-card">', unsafe_allow_html=True)
     st.markdown("""
     ### 🎯 Project Features:
-    - Side-by-side model comparison
-    - Response time measurement
+    - Side-by-side comparison of any number of models, run concurrently
+    - Time to first token, tokens/s and latency from Ollama's response stats
     - Quality scoring system
-    - Export comparison results
+    - Export comparison results as a benchmark table
+    """)
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    st.markdown("""
+    Save this module as `model_comparison.py` next to `ollama_client.py` from Lesson 2. It runs
+    every model on its own worker thread and hands their tokens back to the Streamlit thread as events:
     """)
+    
+    st.markdown('<div class="code-block">', unsafe_allow_html=True)
+    st.code(inspect.getsource(model_comparison), language="python")
     st.markdown('</div>', unsafe_allow_html=True)
     
+    st.markdown("""
+    Then build the comparison app on top of it:
+    """)
+    
     st.markdown('<div class="code-block">', unsafe_allow_html=True)
     st.code("""
 import streamlit as st
-import requests
-import time
-import pandas as pd
+from ollama_client import OllamaClient, format_stats
+from model_comparison import DONE, ERROR, TOKEN, benchmark_frame, benchmark_row, compare_models
 
 st.title("🔄 Model Comparison Tool")
 
-# Model selection
-col1, col2 = st.columns(2)
-with col1:
-    model1 = st.selectbox("Model 1", ["llama2:7b", "codellama", "mistral"])
-with col2:
-    model2 = st.selectbox("Model 2", ["llama2:7b", "codellama", "mistral"])
+@st.cache_resource
+def get_client():
+    return OllamaClient()
+
+client = get_client()
+
+# Pick any number of models; they all run at the same time
+models = st.multiselect("Models", ["llama2:7b", "codellama", "mistral"], default=["llama2:7b", "mistral"])
 
 # Prompt input
 prompt = st.text_area("Enter your prompt:", height=100)
 
-if st.button("🚀 Compare Models") and prompt:
-    col1, col2 = st.columns(2)
-    
-    # Model 1 response
-    with col1:
-        st.subheader(f"📊 {model1}")
-        start_time = time.time()
-        
-        with st.spinner(f"Getting response from {model1}..."):
-            response1 = call_ollama(prompt, model1)
-            response_time1 = time.time() - start_time
-        
-        st.markdown(response1)
-        st.caption(f"Response time: {response_time1:.2f} seconds")
-    
-    # Model 2 response
-    with col2:
-        st.subheader(f"📊 {model2}")
-        start_time = time.time()
-        
-        with st.spinner(f"Getting response from {model2}..."):
-            response2 = call_ollama(prompt, model2)
-            response_time2 = time.time() - start_time
-        
-        st.markdown(response2)
-        st.caption(f"Response time: {response_time2:.2f} seconds")
-    
-    # Comparison summary
-    st.subheader("📈 Comparison Summary")
-    comparison_data = {
-        "Model": [model1, model2],
-        "Response Time (s)": [f"{response_time1:.2f}", f"{response_time2:.2f}"],
-        "Response Length": [len(response1), len(response2)]
-    }
-    
-    df = pd.DataFrame(comparison_data)
+if "benchmarks" not in st.session_state:
+    st.session_state.benchmarks = []
+
+if st.button("🚀 Compare Models") and prompt and models:
+    # One column per model, filled as its tokens arrive
+    outputs = {}
+    for column, model in zip(st.columns(len(models)), models):
+        with column:
+            st.subheader(f"📊 {model}")
+            outputs[model] = {"text": "", "box": st.empty(), "caption": st.empty()}
+    
+    for kind, model, payload in compare_models(client, prompt, models):
+        output = outputs[model]
+        if kind == TOKEN:
+            output["text"] += payload
+            output["box"].markdown(output["text"] + "▌")
+        elif kind == DONE:
+            output["box"].markdown(output["text"])
+            output["caption"].caption(format_stats(payload))
+            st.session_state.benchmarks.append(benchmark_row(prompt, model, payload))
+        elif kind == ERROR:
+            output["box"].error(payload)
+            st.session_state.benchmarks.append(benchmark_row(prompt, model, error=payload))
+
+# Benchmark table across runs, exportable
+if st.session_state.benchmarks:
+    st.subheader("📈 Benchmark Results")
+    df = benchmark_frame(st.session_state.benchmarks)
     st.dataframe(df, use_container_width=True)
+    st.download_button("📥 Export CSV", df.to_csv(index=False), "benchmarks.csv", "text/csv")
     """, language="python")
     st.markdown('</div>', unsafe_allow_html=True)
     
@@ -745,6 +783,243 @@ if st.button("🚀 Compare Models") and prompt:
     
     st.markdown('</div>', unsafe_allow_html=True)
 
+with tab5:
+    st.header("🧪 Live Lab")
+    st.markdown("Run the course apps against the Ollama server configured as `OLLAMA_HOST` in secrets or the environment.")
+    
+    lab_client = get_ollama_client()
+    st.caption(f"🦙 Connected to {lab_client.host}")
+    
+    try:
+        installed_models = [model["name"] for model in lab_client.list_models()]
+    except OllamaError as e:
+        installed_models = []
+        st.info(f"🦙 {e}")
+    
+    if installed_models:
+        st.subheader("🔥 Model Warm-up")
+        st.markdown("Selected models are loaded when the page opens, so the first request doesn't wait for a cold load.")
+        lab_manager = get_model_manager()
+        
+        warm_col1, warm_col2 = st.columns([3, 1])
+        with warm_col1:
+            warm_models = st.multiselect("Keep warm", installed_models, default=installed_models[:1], key="lab_warm_models")
+        with warm_col2:
+            ram_budget_gb = st.number_input(
+                "RAM budget (GB)", min_value=1.0, value=DEFAULT_RAM_BUDGET / GB, step=1.0, key="lab_ram_budget"
+            )
+        # Passed per call: the manager is shared with every other session
+        ram_budget = ram_budget_gb * GB
+        
+        if warm_models:
+            keep_alive_cols = st.columns(len(warm_models))
+            for column, model in zip(keep_alive_cols, warm_models):
+                with column:
+                    keep_alive = st.selectbox(
+                        f"keep_alive · {model}",
+                        KEEP_ALIVE_OPTIONS,
+                        index=KEEP_ALIVE_OPTIONS.index(WARM_KEEP_ALIVE),
+                        key=f"lab_keep_alive_{model}",
+                        help="How long the model stays loaded after its last request; a negative duration keeps it loaded",
+                    )
+                    lab_manager.set_keep_alive(model, keep_alive)
+            
+            try:
+                with st.spinner("Warming models..."):
+                    load_times = lab_manager.warm(warm_models, ram_budget)
+                loaded_now = {model: seconds for model, seconds in load_times.items() if seconds is not None}
+                if loaded_now:
+                    st.caption("🔥 Loaded " + ", ".join(f"{model} in {seconds:.1f}s" for model, seconds in loaded_now.items()))
+            except OllamaError as e:
+                st.error(f"❌ {e}")
+        
+        try:
+            loaded_models = lab_manager.loaded()
+        except OllamaError as e:
+            loaded_models = []
+            st.error(f"❌ {e}")
+        
+        if loaded_models:
+            used = sum(model["size"] for model in loaded_models)
+            st.progress(
+                min(used / ram_budget, 1.0),
+                text=f"🧠 {used / GB:.1f} GB of {ram_budget_gb:.0f} GB budget in use",
+            )
+            for model in loaded_models:
+                model_col1, model_col2, model_col3, model_col4 = st.columns([3, 2, 3, 1])
+                with model_col1:
+                    st.markdown(f"**{model['name']}**")
+                with model_col2:
+                    st.caption(f"{model['size'] / GB:.1f} GB · {model['size_vram'] / GB:.1f} GB VRAM")
+                with model_col3:
+                    last_used = datetime.fromtimestamp(model["last_used"]).strftime("%H:%M:%S") if model["last_used"] else "—"
+                    st.caption(f"keep_alive {model['keep_alive']} · last used {last_used}")
+                with model_col4:
+                    if st.button("⏏️", key=f"lab_unload_{model['name']}", help="Unload now"):
+                        try:
+                            lab_manager.unload(model["name"])
+                        except OllamaError as e:
+                            st.error(f"❌ {e}")
+                        st.rerun()
+        else:
+            st.caption("No models loaded.")
+        
+        st.subheader("💬 Chat")
+        lab_model = st.selectbox("Model", installed_models, key="lab_chat_model")
+        
+        if "lab_messages" not in st.session_state:
+            st.session_state.lab_messages = []
+        
+        # History first; a new exchange is written into this container too
+        chat_area = st.container()
+        with chat_area:
+            for message in st.session_state.lab_messages:
+                with st.chat_message(message["role"]):
+                    st.markdown(message["content"])
+                    if message.get("stats"):
+                        st.caption(format_stats(message['stats']))
+        
+        with st.form("lab_chat_form", clear_on_submit=True):
+            lab_prompt = st.text_input("Message", placeholder="Ask the model anything...")
+            sent = st.form_submit_button("Send")
+        
+        if sent and lab_prompt:
+            st.session_state.lab_messages.append({"role": "user", "content": lab_prompt})
+            with chat_area:
+                with st.chat_message("user"):
+                    st.markdown(lab_prompt)
+                with st.chat_message("assistant"):
+                    try:
+                        lab_manager.use([lab_model], ram_budget)
+                        stream = lab_client.chat(st.session_state.lab_messages, lab_model)
+                        response = st.write_stream(stream)
+                        st.caption(format_stats(stream.stats))
+                        st.session_state.lab_messages.append({"role": "assistant", "content": response, "stats": stream.stats})
+                    except OllamaError as e:
+                        st.session_state.lab_messages.pop()
+                        st.error(f"❌ {e}")
+        
+        if st.session_state.lab_messages and st.button("🗑️ Clear Lab Chat", key="lab_clear"):
+            st.session_state.lab_messages = []
+            st.rerun()
+        
+        st.subheader("🔄 Model Comparison")
+        compare_models_selected = st.multiselect(
+            "Models to compare", installed_models, default=installed_models[:2], key="lab_compare_models"
+        )
+        compare_prompt = st.text_area("Prompt", height=100, key="lab_compare_prompt")
+        
+        if "lab_benchmarks" not in st.session_state:
+            st.session_state.lab_benchmarks = []
+        
+        if st.button("🚀 Compare Models", key="lab_compare") and compare_prompt and compare_models_selected:
+            # One column per model, all streaming at once
+            outputs = {}
+            for column, model in zip(st.columns(len(compare_models_selected)), compare_models_selected):
+                with column:
+                    st.markdown(f"**📊 {model}**")
+                    outputs[model] = {"text": "", "box": st.empty(), "caption": st.empty()}
+            
+            try:
+                lab_manager.use(compare_models_selected, ram_budget)
+            except OllamaError as e:
+                st.error(f"❌ {e}")
+            
+            started = time.perf_counter()
+            for kind, model, payload in compare_models(lab_client, compare_prompt, compare_models_selected):
+                output = outputs[model]
+                if kind == TOKEN:
+                    output["text"] += payload
+                    output["box"].markdown(output["text"] + "▌")
+                elif kind == DONE:
+                    output["box"].markdown(output["text"])
+                    output["caption"].caption(format_stats(payload, latency=True))
+                    st.session_state.lab_benchmarks.append(benchmark_row(compare_prompt, model, payload))
+                elif kind == ERROR:
+                    output["box"].error(f"❌ {payload}")
+                    st.session_state.lab_benchmarks.append(benchmark_row(compare_prompt, model, error=payload))
+            st.caption(f"⏱️ All models finished in {time.perf_counter() - started:.2f}s")
+        
+        if st.session_state.lab_benchmarks:
+            st.markdown("**📈 Benchmark Results**")
+            benchmarks = benchmark_frame(st.session_state.lab_benchmarks)
+            st.dataframe(benchmarks, use_container_width=True)
+            
+            export_col1, export_col2, export_col3 = st.columns(3)
+            with export_col1:
+                st.download_button(
+                    "📥 Export CSV",
+                    benchmarks.to_csv(index=False),
+                    file_name=f"ollama_benchmarks_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    mime="text/csv"
+                )
+            with export_col2:
+                st.download_button(
+                    "📥 Export JSON",
+                    benchmarks.to_json(orient="records", indent=2),
+                    file_name=f"ollama_benchmarks_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                    mime="application/json"
+                )
+            with export_col3:
+                if st.button("🗑️ Clear Results", key="lab_clear_benchmarks"):
+                    st.session_state.lab_benchmarks = []
+                    st.rerun()
+        
+        st.subheader("📖 Analyze Document")
+        st.markdown("Large files are split into chunks, summarized a few at a time and combined into one analysis.")
+        
+        doc_col1, doc_col2, doc_col3 = st.columns(3)
+        with doc_col1:
+            doc_model = st.selectbox("Model", installed_models, key="lab_doc_model")
+        with doc_col2:
+            chunk_tokens = st.select_slider(
+                "Chunk size (tokens)",
+                [500, 1000, 2000, 4000, 8000],
+                value=CHUNK_TOKENS,
+                key="lab_chunk_tokens",
+                help="num_ctx is raised to fit a chunk and its summary; larger chunks need more memory",
+            )
+        with doc_col3:
+            concurrency = st.slider("Parallel requests", 1, 8, MAX_CONCURRENCY, key="lab_concurrency")
+        
+        uploaded_doc = st.file_uploader("📁 Upload a text file", type=["txt", "md"], key="lab_doc")
+        if uploaded_doc is not None:
+            content = uploaded_doc.getvalue().decode("utf-8", errors="replace")
+            st.text_area("File Preview", content[:5000], height=200, key="lab_doc_preview")
+            
+            if st.button("📖 Analyze Document", key="lab_analyze"):
+                chunks = split_text(content, chunk_tokens)
+                if not chunks:
+                    st.warning("⚠️ The file has no text to analyze.")
+                    st.stop()
+                st.caption(f"📄 ~{count_tokens(content):,} tokens in {len(chunks)} chunks")
+                progress = st.progress(0.0, text=f"Summarizing {len(chunks)} chunks...")
+                started = time.perf_counter()
+                
+                try:
+                    lab_manager.use([doc_model], ram_budget)
+                    summaries = [""] * len(chunks)
+                    for done, (index, summary) in enumerate(
+                        map_chunks(lab_client, chunks, doc_model, concurrency=concurrency, chunk_tokens=chunk_tokens), 1
+                    ):
+                        summaries[index] = summary
+                        progress.progress(done / len(chunks), text=f"Summarized chunk {index + 1} ({done}/{len(chunks)})")
+                    
+                    progress.progress(1.0, text="Combining summaries...")
+                    st.markdown("### 📊 Analysis Results")
+                    stream = reduce_summaries(
+                        lab_client, summaries, doc_model, chunk_tokens=chunk_tokens, concurrency=concurrency
+                    )
+                    st.write_stream(stream)
+                    progress.empty()
+                    st.caption(f"⏱️ Analyzed in {time.perf_counter() - started:.1f}s")
+                    
+                    with st.expander(f"🧩 Chunk summaries ({len(summaries)})"):
+                        for i, summary in enumerate(summaries, 1):
+                            st.markdown(f"**Part {i}:** {summary}")
+                except OllamaError as e:
+                    st.error(f"❌ {e}")
+
 # Course completion check
 if len(st.session_state.lesson_progress) >= 6:  # Adjust based on total lessons
     if not st.session_state.course_completed:
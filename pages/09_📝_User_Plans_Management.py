@@ -1,9 +1,12 @@
 import streamlit as st
 from datetime import date, datetime
-from supabase import create_client, Client
+from supabase import Client
 import os
 import base64
 
+from db import get_client
+from query_cache import cached_select, invalidate
+
 # -------------------------
 # Hide Streamlit Elements for Cloud Deployment
 # -------------------------
@@ -234,32 +237,9 @@ with menu_col5:
 
 st.markdown("---")
 
-# Load Supabase credentials safely
-def get_supabase_credentials():
-    # Try nested secrets first
-    if "supabase" in st.secrets:
-        url = st.secrets["supabase"].get("url")
-        key = st.secrets["supabase"].get("key")
-        service_key = st.secrets["supabase"].get("service_role_key")
-    else:  # fallback to flat structure
-        url = st.secrets.get("SUPABASE_URL")
-        key = st.secrets.get("SUPABASE_ANON_KEY")
-        service_key = st.secrets.get("SUPABASE_SERVICE_KEY")
-
-    if not url or not key:
-        st.error("❌ Supabase credentials are missing. Check your secrets.toml.")
-        st.stop()
-    return url, key, service_key
-
+# Shared, process-wide Supabase client
 try:
-    SUPABASE_URL, SUPABASE_ANON_KEY, SUPABASE_SERVICE_KEY = get_supabase_credentials()
-    
-    @st.cache_resource
-    def init_supabase_client():
-        return create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
-
-    supabase: Client = init_supabase_client()
-    
+    supabase: Client = get_client()
 except Exception as e:
     st.error(f"Failed to initialize Supabase client: {str(e)}")
     st.stop()
@@ -319,6 +299,7 @@ with tab1:
                     }
                     
                     result = supabase.table("user_plans").insert(plan_data).execute()
+                    invalidate("user_plans")
                     
                     if result.data:
                         st.success(f"✅ Successfully added {plan_name} plan for user {user_id}")
@@ -336,10 +317,10 @@ with tab2:
     
     try:
         # Fetch all user plans
-        plans_result = supabase.table("user_plans").select("*").execute()
+        plans_data = cached_select(supabase, "user_plans")
         
-        if plans_result.data:
-            st.subheader(f"📊 Total Plans: {len(plans_result.data)}")
+        if plans_data:
+            st.subheader(f"📊 Total Plans: {len(plans_data)}")
             
             # Search and filter options
             col1, col2, col3 = st.columns(3)
@@ -352,7 +333,7 @@ with tab2:
                 filter_status = st.selectbox("Filter by Status", ["All", "active", "expired", "cancelled"])
             
             # Filter plans based on search criteria
-            filtered_plans = plans_result.data
+            filtered_plans = plans_data
             
             if search_user:
                 filtered_plans = [p for p in filtered_plans if search_user.lower() in p.get('user_id', '').lower()]
@@ -395,6 +376,7 @@ with tab2:
                         if st.button(f"🚫 Suspend", key=f"suspend_{plan.get('id')}"):
                             try:
                                 supabase.table("user_plans").update({"status": "suspended"}).eq("id", plan.get('id')).execute()
+                                invalidate("user_plans")
                                 st.success("Plan suspended successfully!")
                                 st.rerun()
                             except Exception as e:
@@ -404,6 +386,7 @@ with tab2:
                         if st.button(f"🗑️ Delete", key=f"delete_{plan.get('id')}"):
                             try:
                                 supabase.table("user_plans").delete().eq("id", plan.get('id')).execute()
+                                invalidate("user_plans")
                                 st.success("Plan deleted successfully!")
                                 st.rerun()
                             except Exception as e:
@@ -419,11 +402,9 @@ with tab3:
     
     try:
         # Fetch plan statistics
-        plans_result = supabase.table("user_plans").select("*").execute()
+        plans_data = cached_select(supabase, "user_plans")
         
-        if plans_result.data:
-            plans_data = plans_result.data
-            
+        if plans_data:
             # Summary metrics
             col1, col2, col3, col4 = st.columns(4)
             
@@ -496,10 +477,10 @@ with st.sidebar:
     st.markdown("### 📊 Quick Stats")
     
     try:
-        plans_result = supabase.table("user_plans").select("*").execute()
-        if plans_result.data:
-            total_plans = len(plans_result.data)
-            active_plans = len([p for p in plans_result.data if p.get('status') == 'active'])
+        plans_data = cached_select(supabase, "user_plans")
+        if plans_data:
+            total_plans = len(plans_data)
+            active_plans = len([p for p in plans_data if p.get('status') == 'active'])
             
             st.metric("Total Plans", total_plans)
             st.metric("Active Plans", active_plans)
@@ -1,10 +1,16 @@
 import streamlit as st
 from datetime import datetime
-from supabase import create_client, Client
+from supabase import Client
 import os
 import base64
 import pandas as pd
 
+from db import get_client
+from metrics import user_metrics
+from query_cache import cached_query, invalidate
+from rollup import record_role_changes
+from user_directory import BULK_CHUNK_SIZE, MAX_BULK_CHUNK_SIZE, bulk_update_roles, count_profiles, fetch_profile_page
+
 # -------------------------
 # Hide Streamlit Elements for Cloud Deployment
 # -------------------------
@@ -240,32 +246,9 @@ with menu_col5:
 
 st.markdown("---")
 
-# Load Supabase credentials safely
-def get_supabase_credentials():
-    # Try nested secrets first
-    if "supabase" in st.secrets:
-        url = st.secrets["supabase"].get("url")
-        key = st.secrets["supabase"].get("key")
-        service_key = st.secrets["supabase"].get("service_role_key")
-    else:  # fallback to flat structure
-        url = st.secrets.get("SUPABASE_URL")
-        key = st.secrets.get("SUPABASE_ANON_KEY")
-        service_key = st.secrets.get("SUPABASE_SERVICE_KEY")
-
-    if not url or not key:
-        st.error("❌ Supabase credentials are missing. Check your secrets.toml.")
-        st.stop()
-    return url, key, service_key
-
+# Shared, process-wide Supabase client
 try:
-    SUPABASE_URL, SUPABASE_ANON_KEY, SUPABASE_SERVICE_KEY = get_supabase_credentials()
-    
-    @st.cache_resource
-    def init_supabase_client():
-        return create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
-
-    supabase: Client = init_supabase_client()
-    
+    supabase: Client = get_client()
 except Exception as e:
     st.error(f"Failed to initialize Supabase client: {str(e)}")
     st.stop()
@@ -276,15 +259,48 @@ tab1, tab2, tab3, tab4 = st.tabs(["👥 All Users", "🔍 Search Users", "📊 U
 with tab1:
     st.header("👥 All Users")
     
+    # Keyset cursors for the pages visited so far; the last one is current
+    if "users_page_cursors" not in st.session_state:
+        st.session_state.users_page_cursors = [None]
+    
+    def reset_user_pages():
+        st.session_state.users_page_cursors = [None]
+    
     try:
-        # Fetch all user profiles
-        users_result = supabase.table("user_profiles").select("*").execute()
+        total_users = cached_query("user_profiles", "count", lambda: count_profiles(supabase))
+        
+        page_col1, page_col2 = st.columns([3, 1])
+        with page_col1:
+            st.subheader(f"📊 Total Users: {total_users}")
+        with page_col2:
+            page_size = st.selectbox("Users per page", [10, 25, 50, 100], index=1,
+                                     key="users_page_size", on_change=reset_user_pages)
         
-        if users_result.data:
-            st.subheader(f"📊 Total Users: {len(users_result.data)}")
+        # Fetch only the visible page, newest users first
+        cursor = st.session_state.users_page_cursors[-1]
+        users_data, next_cursor = cached_query(
+            "user_profiles",
+            ("page", cursor, page_size),
+            lambda: fetch_profile_page(supabase, page_size, cursor),
+        )
+        
+        if users_data:
+            page_number = len(st.session_state.users_page_cursors)
+            nav_col1, nav_col2, nav_col3 = st.columns([1, 2, 1])
+            with nav_col1:
+                if st.button("⬅️ Previous", disabled=page_number == 1, use_container_width=True, key="users_prev_page"):
+                    st.session_state.users_page_cursors.pop()
+                    st.rerun()
+            with nav_col2:
+                first = (page_number - 1) * page_size + 1
+                st.markdown(f"Page {page_number} · users {first}–{first + len(users_data) - 1} of {total_users}")
+            with nav_col3:
+                if st.button("Next ➡️", disabled=next_cursor is None, use_container_width=True, key="users_next_page"):
+                    st.session_state.users_page_cursors.append(next_cursor)
+                    st.rerun()
             
             # Display users in a more organized way
-            for i, user in enumerate(users_result.data):
+            for user in users_data:
                 with st.expander(f"👤 {user.get('email', 'No email')} - {user.get('role', 'user').title()}"):
                     col1, col2 = st.columns(2)
                     
@@ -301,27 +317,33 @@ with tab1:
                         action_col1, action_col2, action_col3 = st.columns(3)
                         
                         with action_col1:
-                            if st.button("👑 Make Admin", key=f"admin_{i}"):
+                            if st.button("👑 Make Admin", key=f"admin_{user['id']}"):
                                 try:
                                     supabase.table("user_profiles").update({"role": "admin"}).eq("id", user.get('id')).execute()
+                                    invalidate("user_profiles")
+                                    record_role_changes("admin")
                                     st.success("User promoted to admin!")
                                     st.rerun()
                                 except Exception as e:
                                     st.error(f"Error: {str(e)}")
                         
                         with action_col2:
-                            if st.button("👤 Make User", key=f"user_{i}"):
+                            if st.button("👤 Make User", key=f"user_{user['id']}"):
                                 try:
                                     supabase.table("user_profiles").update({"role": "user"}).eq("id", user.get('id')).execute()
+                                    invalidate("user_profiles")
+                                    record_role_changes("user")
                                     st.success("User role updated!")
                                     st.rerun()
                                 except Exception as e:
                                     st.error(f"Error: {str(e)}")
                         
                         with action_col3:
-                            if st.button("🚫 Suspend", key=f"suspend_{i}"):
+                            if st.button("🚫 Suspend", key=f"suspend_{user['id']}"):
                                 try:
                                     supabase.table("user_profiles").update({"role": "suspended"}).eq("id", user.get('id')).execute()
+                                    invalidate("user_profiles")
+                                    record_role_changes("suspended")
                                     st.success("User suspended!")
                                     st.rerun()
                                 except Exception as e:
@@ -385,38 +407,30 @@ with tab3:
     st.header("📊 User Analytics")
     
     try:
-        # Fetch user data for analytics
-        users_result = supabase.table("user_profiles").select("*").execute()
+        # Counts are computed by the database
+        metrics = cached_query("user_profiles", "metrics", lambda: user_metrics(supabase))
+        total_users = metrics["total_users"]
         
-        if users_result.data:
-            users_data = users_result.data
-            
+        if total_users:
             # Summary metrics
             col1, col2, col3, col4 = st.columns(4)
             
             with col1:
-                total_users = len(users_data)
                 st.metric("Total Users", total_users)
             
             with col2:
-                admin_users = len([u for u in users_data if u.get('role') == 'admin'])
-                st.metric("Admin Users", admin_users)
+                st.metric("Admin Users", metrics["admin_users"])
             
             with col3:
-                regular_users = len([u for u in users_data if u.get('role') == 'user'])
-                st.metric("Regular Users", regular_users)
+                st.metric("Regular Users", metrics["regular_users"])
             
             with col4:
-                suspended_users = len([u for u in users_data if u.get('role') == 'suspended'])
-                st.metric("Suspended Users", suspended_users)
+                st.metric("Suspended Users", metrics["suspended_users"])
             
             # Role distribution
             st.subheader("📈 User Role Distribution")
             
-            role_counts = {}
-            for user in users_data:
-                role = user.get('role', 'unknown')
-                role_counts[role] = role_counts.get(role, 0) + 1
+            role_counts = metrics["role_counts"]
             
             col1, col2 = st.columns(2)
             
@@ -430,7 +444,9 @@ with tab3:
                 # Recent registrations
                 st.markdown("**Recent Activity:**")
                 try:
-                    recent_users = sorted(users_data, key=lambda x: x.get('created_at', ''), reverse=True)[:5]
+                    recent_users, _ = cached_query(
+                        "user_profiles", ("page", None, 5), lambda: fetch_profile_page(supabase, 5)
+                    )
                     for user in recent_users:
                         created_date = user.get('created_at', 'Unknown')
                         if created_date != 'Unknown':
@@ -460,6 +476,8 @@ with tab4:
     with col1:
         bulk_role = st.selectbox("Select Role to Assign", ["user", "admin", "suspended"])
         user_emails = st.text_area("User Emails (one per line)", placeholder="user1@example.com\nuser2@example.com")
+        chunk_size = st.number_input("Emails per request", min_value=1, max_value=MAX_BULK_CHUNK_SIZE, value=BULK_CHUNK_SIZE,
+                                     help="Each request updates this many users with a single statement")
     
     with col2:
         st.markdown("**Preview:**")
@@ -474,36 +492,41 @@ with tab4:
     
     if st.button("🚀 Execute Bulk Action", use_container_width=True):
         if user_emails and bulk_role:
-            email_list = [email.strip() for email in user_emails.split('\n') if email.strip()]
+            # De-duplicate while keeping the order the admin entered
+            email_list = list(dict.fromkeys(email.strip() for email in user_emails.split('\n') if email.strip()))
             
             success_count = 0
-            error_count = 0
+            failed_emails = []
+            chunk_errors = []
+            processed = 0
             
             progress_bar = st.progress(0)
             status_text = st.empty()
             
-            for i, email in enumerate(email_list):
-                try:
-                    result = supabase.table("user_profiles").update({"role": bulk_role}).eq("email", email).execute()
-                    if result.data:
-                        success_count += 1
-                    else:
-                        error_count += 1
-                except Exception as e:
-                    error_count += 1
+            for chunk, missing, error in bulk_update_roles(supabase, email_list, bulk_role, int(chunk_size)):
+                processed += len(chunk)
+                success_count += len(chunk) - len(missing)
+                failed_emails.extend(missing)
+                if error is not None:
+                    chunk_errors.append(f"{chunk[0]} … {chunk[-1]}: {error}")
                 
                 # Update progress
-                progress = (i + 1) / len(email_list)
-                progress_bar.progress(progress)
-                status_text.text(f"Processing {i + 1}/{len(email_list)}: {email}")
+                progress_bar.progress(processed / len(email_list))
+                status_text.text(f"Processed {processed}/{len(email_list)} users ({len(failed_emails)} failed)")
             
+            invalidate("user_profiles")
+            record_role_changes(bulk_role, success_count)
             progress_bar.empty()
             status_text.empty()
             
             if success_count > 0:
                 st.success(f"✅ Successfully updated {success_count} users")
-            if error_count > 0:
-                st.error(f"❌ Failed to update {error_count} users")
+            if failed_emails:
+                st.error(f"❌ Failed to update {len(failed_emails)} users")
+                with st.expander("Show failed emails"):
+                    for message in chunk_errors:
+                        st.markdown(f"- **Request failed:** {message}")
+                    st.text("\n".join(failed_emails))
         else:
             st.warning("Please provide user emails and select a role.")
 
@@ -528,15 +551,11 @@ with st.sidebar:
     st.markdown("### 📊 Quick Stats")
     
     try:
-        users_result = supabase.table("user_profiles").select("*").execute()
-        if users_result.data:
-            total_users = len(users_result.data)
-            admin_users = len([u for u in users_result.data if u.get('role') == 'admin'])
-            regular_users = len([u for u in users_result.data if u.get('role') == 'user'])
-            
-            st.metric("Total Users", total_users)
-            st.metric("Admins", admin_users)
-            st.metric("Regular Users", regular_users)
+        metrics = cached_query("user_profiles", "metrics", lambda: user_metrics(supabase))
+        if metrics["total_users"]:
+            st.metric("Total Users", metrics["total_users"])
+            st.metric("Admins", metrics["admin_users"])
+            st.metric("Regular Users", metrics["regular_users"])
     except:
         st.metric("Total Users", "N/A")
         st.metric("Admins", "N/A")
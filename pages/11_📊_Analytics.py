@@ -1,12 +1,18 @@
 import streamlit as st
-from datetime import datetime, timedelta
-from supabase import create_client, Client
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from supabase import Client
 import os
 import base64
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
+from db import get_client
+from metrics import plan_status_counts, summarize_users, user_metrics
+from query_cache import cached_query
+from rollup import daily_signups, plan_creations, refresh as refresh_rollup, role_changes, signup_total
+
 # -------------------------
 # Hide Streamlit Elements for Cloud Deployment
 # -------------------------
@@ -236,32 +242,9 @@ with menu_col5:
 
 st.markdown("---")
 
-# Load Supabase credentials safely
-def get_supabase_credentials():
-    # Try nested secrets first
-    if "supabase" in st.secrets:
-        url = st.secrets["supabase"].get("url")
-        key = st.secrets["supabase"].get("key")
-        service_key = st.secrets["supabase"].get("service_role_key")
-    else:  # fallback to flat structure
-        url = st.secrets.get("SUPABASE_URL")
-        key = st.secrets.get("SUPABASE_ANON_KEY")
-        service_key = st.secrets.get("SUPABASE_SERVICE_KEY")
-
-    if not url or not key:
-        st.error("❌ Supabase credentials are missing. Check your secrets.toml.")
-        st.stop()
-    return url, key, service_key
-
+# Shared, process-wide Supabase client
 try:
-    SUPABASE_URL, SUPABASE_ANON_KEY, SUPABASE_SERVICE_KEY = get_supabase_credentials()
-    
-    @st.cache_resource
-    def init_supabase_client():
-        return create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
-
-    supabase: Client = init_supabase_client()
-    
+    supabase: Client = get_client()
 except Exception as e:
     st.error(f"Failed to initialize Supabase client: {str(e)}")
     st.stop()
@@ -297,6 +280,42 @@ def generate_sample_data():
     
     return sample_users, sample_plans
 
+def build_registration_trend(users_data, range_days, window_days=30):
+    """Parse created_at once and derive the daily series and growth windows"""
+    created = pd.to_datetime(
+        pd.DataFrame(users_data, columns=['created_at'])['created_at'],
+        utc=True, errors='coerce', format='ISO8601'
+    ).dropna()
+    
+    # Daily counts, including days without signups
+    daily = (
+        pd.Series(1, index=pd.DatetimeIndex(created))
+        .resample('D').sum()
+        .rename_axis('Date')
+        .reset_index(name='Registrations')
+    )
+    
+    now = pd.Timestamp.now(tz='UTC')
+    daily = daily[daily['Date'] > now - pd.Timedelta(days=range_days)]
+    
+    # Signups in the current and previous window
+    window = pd.Timedelta(days=window_days)
+    current = int((created > now - window).sum())
+    previous = int(((created > now - 2 * window) & (created <= now - window)).sum())
+    
+    return {'daily': daily, 'current': current, 'previous': previous}
+
+def build_rollup_trend(range_days, window_days=30):
+    """Read the daily series and growth windows from the local rollup"""
+    today = datetime.now(timezone.utc).date()
+    window = timedelta(days=window_days)
+    
+    return {
+        'daily': daily_signups(today - timedelta(days=range_days - 1), today),
+        'current': signup_total(today - window + timedelta(days=1), today),
+        'previous': signup_total(today - 2 * window + timedelta(days=1), today - window),
+    }
+
 # Main content tabs
 tab1, tab2, tab3, tab4 = st.tabs(["📈 Overview", "👥 User Analytics", "💼 Plan Analytics", "📊 Custom Reports"])
 
@@ -304,65 +323,55 @@ with tab1:
     st.header("📈 Platform Overview")
     
     try:
-        # Try to fetch real data
-        users_result = supabase.table("user_profiles").select("*").execute()
-        plans_result = supabase.table("user_plans").select("*").execute() if "user_plans" in str(supabase) else None
+        # Try to fetch real data; headline numbers are counted by the database
+        metrics = cached_query("user_profiles", "metrics", lambda: user_metrics(supabase))
+        
+        trend_days = st.selectbox("Trend range (days)", [30, 90, 180, 365], index=3)
         
         # Use real data if available, otherwise use sample data
-        if users_result.data:
-            users_data = users_result.data
-            plans_data = plans_result.data if plans_result and plans_result.data else []
+        if metrics["total_users"]:
+            # Fold rows created since the last refresh into the local rollup;
+            # charts then read per-day aggregates for the selected range only
+            cached_query(("user_profiles", "user_plans"), "rollup_refresh", lambda: refresh_rollup(supabase))
+            trend = build_rollup_trend(trend_days)
+            plan_counts = plan_creations("plan_name")
+            status_counts = cached_query("user_plans", "status_counts", lambda: plan_status_counts(supabase))
         else:
             st.info("📊 Using sample data for demonstration. Connect your database to see real analytics.")
             users_data, plans_data = generate_sample_data()
+            metrics = summarize_users(users_data)
+            trend = build_registration_trend(users_data, trend_days)
+            plan_counts = Counter(p.get('plan_name', 'Unknown') for p in plans_data)
+            status_counts = Counter(p.get('status', 'unknown') for p in plans_data)
+        
+        active_plans = status_counts.get('active', 0)
         
         # Key metrics
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            total_users = len(users_data)
+            total_users = metrics["total_users"]
             st.metric("Total Users", total_users, delta="+12 this week")
         
         with col2:
-            active_plans = len([p for p in plans_data if p.get('status') == 'active'])
             st.metric("Active Plans", active_plans, delta="+5 this week")
         
         with col3:
-            admin_users = len([u for u in users_data if u.get('role') == 'admin'])
-            st.metric("Admin Users", admin_users)
+            st.metric("Admin Users", metrics["admin_users"])
         
         with col4:
             # Calculate growth rate
-            thirty_days_ago = datetime.now() - timedelta(days=30)
-            recent_users = len([u for u in users_data if datetime.fromisoformat(u.get('created_at', '2024-01-01T00:00:00').replace('Z', '+00:00')) > thirty_days_ago])
+            recent_users = metrics["new_users"]
             growth_rate = (recent_users / total_users * 100) if total_users > 0 else 0
             st.metric("Growth Rate", f"{growth_rate:.1f}%", delta=f"{recent_users} new users")
         
         # User registration trend
         st.subheader("📈 User Registration Trend")
         
-        # Process user registration data
-        user_dates = []
-        for user in users_data:
-            try:
-                created_date = datetime.fromisoformat(user.get('created_at', '2024-01-01T00:00:00').replace('Z', '+00:00')).date()
-                user_dates.append(created_date)
-            except:
-                continue
-        
-        if user_dates:
-            # Create daily registration counts
-            date_counts = {}
-            for date in user_dates:
-                date_counts[date] = date_counts.get(date, 0) + 1
-            
-            # Convert to DataFrame
-            df_registrations = pd.DataFrame(list(date_counts.items()), columns=['Date', 'Registrations'])
-            df_registrations = df_registrations.sort_values('Date')
-            
+        if not trend['daily'].empty:
             # Create line chart
             fig_registrations = px.line(
-                df_registrations, 
+                trend['daily'], 
                 x='Date', 
                 y='Registrations',
                 title='Daily User Registrations',
@@ -378,10 +387,7 @@ with tab1:
         # Role distribution
         st.subheader("👥 User Role Distribution")
         
-        role_counts = {}
-        for user in users_data:
-            role = user.get('role', 'user')
-            role_counts[role] = role_counts.get(role, 0) + 1
+        role_counts = metrics["role_counts"]
         
         if role_counts:
             fig_roles = px.pie(
@@ -401,6 +407,11 @@ with tab1:
         st.error(f"❌ Error loading overview data: {str(e)}")
         st.info("📊 Using sample data for demonstration.")
         users_data, plans_data = generate_sample_data()
+        metrics = summarize_users(users_data)
+        total_users = metrics["total_users"]
+        trend = build_registration_trend(users_data, 365)
+        plan_counts = Counter(p.get('plan_name', 'Unknown') for p in plans_data)
+        status_counts = Counter(p.get('status', 'unknown') for p in plans_data)
 
 with tab2:
     st.header("👥 User Analytics")
@@ -413,15 +424,21 @@ with tab2:
             st.subheader("📊 User Activity")
             
             # Recent activity (last 30 days)
-            thirty_days_ago = datetime.now() - timedelta(days=30)
-            recent_users = [u for u in users_data if datetime.fromisoformat(u.get('created_at', '2024-01-01T00:00:00').replace('Z', '+00:00')) > thirty_days_ago]
+            recent_users = trend['current']
             
-            st.metric("New Users (30 days)", len(recent_users))
-            st.metric("Average Daily Signups", f"{len(recent_users) / 30:.1f}")
+            st.metric("New Users (30 days)", recent_users, delta=recent_users - trend['previous'])
+            st.metric("Average Daily Signups", f"{recent_users / 30:.1f}")
             
             # User retention (simulated)
             retention_rate = 85.5  # Sample data
             st.metric("User Retention Rate", f"{retention_rate}%")
+            
+            # Role changes recorded by the admin pages
+            recent_role_changes = role_changes(datetime.now(timezone.utc).date() - timedelta(days=29))
+            if recent_role_changes:
+                st.markdown("**Role Changes (30 days):**")
+                for role, count in recent_role_changes.items():
+                    st.markdown(f"- To {role.title()}: {count}")
         
         with col2:
             st.subheader("🌍 User Demographics")
@@ -478,18 +495,13 @@ with tab3:
     st.header("💼 Plan Analytics")
     
     try:
-        if plans_data:
+        if plan_counts:
             # Plan distribution
             col1, col2 = st.columns(2)
             
             with col1:
                 st.subheader("📊 Plan Distribution")
                 
-                plan_counts = {}
-                for plan in plans_data:
-                    plan_name = plan.get('plan_name', 'Unknown')
-                    plan_counts[plan_name] = plan_counts.get(plan_name, 0) + 1
-                
                 fig_plans = px.bar(
                     x=list(plan_counts.keys()),
                     y=list(plan_counts.values()),
@@ -520,7 +532,7 @@ with tab3:
                 monthly_revenue = total_revenue  # Assuming monthly billing
                 
                 st.metric("Monthly Revenue", f"${monthly_revenue:,.2f}")
-                st.metric("Average Revenue Per User", f"${monthly_revenue / len(users_data):.2f}" if users_data else "$0.00")
+                st.metric("Average Revenue Per User", f"${monthly_revenue / total_users:.2f}" if total_users else "$0.00")
                 
                 # Revenue by plan
                 revenue_by_plan = {plan: plan_counts.get(plan, 0) * price for plan, price in plan_revenue.items()}
@@ -541,11 +553,6 @@ with tab3:
             # Plan status overview
             st.subheader("📈 Plan Status Overview")
             
-            status_counts = {}
-            for plan in plans_data:
-                status = plan.get('status', 'unknown')
-                status_counts[status] = status_counts.get(status, 0) + 1
-            
             col1, col2, col3 = st.columns(3)
             
             with col1:
@@ -596,7 +603,7 @@ with tab4:
             # Create sample growth data
             growth_data = {
                 'Metric': ['New Users', 'Total Users', 'Growth Rate', 'Retention Rate'],
-                'Value': [len(recent_users) if 'recent_users' in locals() else 25, len(users_data), '12.5%', '85.5%'],
+                'Value': [recent_users if 'recent_users' in locals() else 25, total_users, '12.5%', '85.5%'],
                 'Change': ['+15%', '+8%', '+2.1%', '-1.2%']
             }
             
@@ -640,8 +647,8 @@ with st.sidebar:
     
     try:
         # Calculate key insights
-        total_users = len(users_data) if 'users_data' in locals() else 0
-        total_plans = len(plans_data) if 'plans_data' in locals() else 0
+        total_users = metrics["total_users"] if 'metrics' in locals() else 0
+        total_plans = sum(plan_counts.values()) if 'plan_counts' in locals() else 0
         
         st.metric("Platform Health", "Excellent")
         st.metric("User Satisfaction", "94%")
@@ -6,14 +6,14 @@ with OpenAI API integration, inline image generation, and seamless chat experien
 """
 
 import streamlit as st
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
+import asyncio
 import tiktoken
 from datetime import datetime, timedelta
 import json
 import time
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterator, List, Tuple, Optional
 import logging
-import hashlib
 import os
 import pandas as pd
 import io
@@ -23,7 +23,14 @@ from PIL import Image
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import uuid
+
+from chat_html import bubble_html, join_html, meta_html
+from config import UI_CONFIG
+from conversation_store import ConversationStore
+from image_cache import ImageCache
+from rate_limiter import ANONYMOUS_USER, RateLimiter
+from response_cache import ResponseCache, make_cache_key
+from retry_policy import CircuitBreaker, RetryPolicy
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -529,23 +536,31 @@ OPENAI_PRICING = {
     "dall-e-2": {"1024x1024": 0.020, "512x512": 0.018, "256x256": 0.016}
 }
 
+@st.cache_resource(show_spinner=False)
+def get_encoding(model: str):
+    """Load the tiktoken encoding for a model once per process"""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        logger.warning(f"Model {model} not found, using cl100k_base encoding")
+        return tiktoken.get_encoding("cl100k_base")
+
 class TokenManager:
     def __init__(self, model="gpt-4-turbo"):
         self.model = model
         self.encoding = None
+        # Token counts of this session's stored messages by message id, and their running total
+        self.message_tokens: Dict[int, int] = {}
+        self.history_tokens = 0
         self.initialize_encoding()
     
     def initialize_encoding(self):
         """Initialize token encoding with error handling"""
         try:
-            self.encoding = tiktoken.encoding_for_model(self.model)
-        except KeyError:
-            try:
-                self.encoding = tiktoken.get_encoding("cl100k_base")
-                logger.warning(f"Model {self.model} not found, using cl100k_base encoding")
-            except Exception as e:
-                logger.error(f"Failed to initialize encoding: {str(e)}")
-                self.encoding = None
+            self.encoding = get_encoding(self.model)
+        except Exception as e:
+            logger.error(f"Failed to initialize encoding: {str(e)}")
+            self.encoding = None
     
     def count_tokens(self, text: str) -> int:
         """Count tokens in text with error handling"""
@@ -558,6 +573,45 @@ class TokenManager:
             logger.error(f"Token counting error: {str(e)}")
             return max(1, len(text) // 4)
     
+    def count_message_tokens(self, message: Dict) -> int:
+        """Count tokens in one message; stored messages are counted once, by id"""
+        message_id = message.get("id")
+        if message_id is None:
+            return self.count_tokens(str(message.get("content", "")))
+        
+        tokens = self.message_tokens.get(message_id)
+        if tokens is None:
+            tokens = self.count_tokens(str(message.get("content", "")))
+            self.message_tokens[message_id] = tokens
+            self.history_tokens += tokens
+        return tokens
+    
+    def forget_messages(self, messages: List[Dict]):
+        """Take messages that left the session out of the running total"""
+        for message in messages:
+            self.history_tokens -= self.message_tokens.pop(message.get("id"), 0)
+    
+    def history_total(self, history: List[Dict]) -> int:
+        """Tokens in the session's messages, from the running total"""
+        # New messages are appended at the end; only those need counting
+        for message in reversed(history):
+            if message.get("id") is None or message["id"] in self.message_tokens:
+                break
+            self.count_message_tokens(message)
+        
+        if len(self.message_tokens) != len(history) or (history and history[0].get("id") not in self.message_tokens):
+            # The history was replaced or trimmed elsewhere: total up the known counts again
+            self.message_tokens = {
+                message["id"]: self.message_tokens.get(message["id"]) or self.count_tokens(str(message.get("content", "")))
+                for message in history if message.get("id") is not None
+            }
+            self.history_tokens = sum(self.message_tokens.values())
+        return self.history_tokens
+    
+    def count_messages_tokens(self, messages: List[Dict]) -> int:
+        """Count tokens in a conversation as a sum of memoized per-message counts"""
+        return sum(self.count_message_tokens(msg) for msg in messages)
+    
     def calculate_cost(self, input_tokens: int, output_tokens: int, model: str) -> float:
         """Calculate cost based on token usage"""
         if model not in OPENAI_PRICING:
@@ -569,6 +623,92 @@ class TokenManager:
         
         return input_cost + output_cost
 
+# Context window per model and the share reserved for the reply
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-3.5-turbo": 16385
+}
+RESPONSE_TOKEN_RESERVE = 2000
+
+class ContextBudgeter:
+    """Fit the system prompt and the most recent turns into a per-model token budget"""
+    
+    def __init__(self, token_manager: TokenManager, max_messages: int = UI_CONFIG["max_chat_history"]):
+        self.token_manager = token_manager
+        self.max_messages = max_messages
+    
+    def budget_for(self, model: str) -> int:
+        """Prompt tokens available for a model after reserving room for the reply"""
+        return MODEL_CONTEXT_WINDOWS.get(model, 8192) - RESPONSE_TOKEN_RESERVE
+    
+    def build(self, system_prompt: str, history: List[Dict], model: str) -> Tuple[List[Dict], Dict]:
+        """Return the messages to send and a report of what was trimmed"""
+        count = self.token_manager.count_message_tokens
+        system = {"role": "system", "content": system_prompt}
+        system_tokens = count(system)
+        full_tokens = system_tokens + self.token_manager.history_total(history)
+        
+        # Walk back from the newest turn; the latest message is always kept.
+        # Only role and content go to the API; metadata and image URLs stay local
+        remaining = self.budget_for(model) - system_tokens
+        kept = []
+        sent_tokens = system_tokens
+        for msg in reversed(history[-self.max_messages:]):
+            tokens = count(msg)
+            if kept and tokens > remaining:
+                break
+            kept.append({"role": msg["role"], "content": msg["content"]})
+            remaining -= tokens
+            sent_tokens += tokens
+        kept.reverse()
+        
+        dropped = len(history) - len(kept)
+        messages = [system]
+        if dropped:
+            note = {
+                "role": "system",
+                "content": f"Note: {dropped} earlier messages of this conversation were omitted to fit the context window."
+            }
+            messages.append(note)
+            sent_tokens += count(note)
+        messages += kept
+        
+        return messages, {
+            "context_tokens": sent_tokens,
+            "context_tokens_saved": max(0, full_tokens - sent_tokens),
+            "context_messages_dropped": dropped
+        }
+
+@st.cache_resource(show_spinner=False)
+def get_response_cache() -> ResponseCache:
+    """Response cache shared by every session in the process"""
+    return ResponseCache()
+
+@st.cache_resource(show_spinner=False)
+def get_image_cache() -> ImageCache:
+    """Local copies of generated images, shared by every session in the process"""
+    return ImageCache()
+
+@st.cache_resource(show_spinner=False)
+def get_rate_limiter() -> RateLimiter:
+    """Rate limiter shared by every session in the process"""
+    return RateLimiter()
+
+# Completion tokens reserved per chat call before the real usage is known
+MAX_COMPLETION_TOKENS = 2000
+
+@st.cache_resource(show_spinner=False)
+def get_circuit_breaker() -> CircuitBreaker:
+    """Circuit breaker for the OpenAI API shared by every session in the process"""
+    return CircuitBreaker()
+
+# Retries for transient OpenAI errors; images take longer per attempt
+CHAT_RETRY_POLICY = RetryPolicy()
+IMAGE_RETRY_POLICY = RetryPolicy(max_attempts=3, deadline=180.0, attempt_timeout=120.0)
+
+RATE_LIMIT_MESSAGE = "You're sending requests faster than the rate limit allows. Please wait a minute and try again."
+
 # ======================================================
 # 🎯 ENHANCED CHAT MANAGER
 # ======================================================
@@ -578,7 +718,12 @@ class EnhancedChatManager:
         self.client = None
         self.api_key = None
         self.token_manager = TokenManager()
+        self.context_budgeter = ContextBudgeter(self.token_manager)
         self.conversation_history = []
+        self.last_metadata = {}
+        self.rate_limit_id = ANONYMOUS_USER
+        self.on_rate_limit_wait = None
+        self.on_retry = None
         self.session_stats = {
             "total_tokens": 0,
             "total_cost": 0.0,
@@ -590,7 +735,8 @@ class EnhancedChatManager:
         """Initialize OpenAI client"""
         try:
             if api_key and api_key != "demo_key":
-                self.client = OpenAI(api_key=api_key)
+                # Retries are handled by the retry policies, not the SDK
+                self.client = OpenAI(api_key=api_key, max_retries=0)
                 self.api_key = api_key
                 return True
             return False
@@ -598,12 +744,26 @@ class EnhancedChatManager:
             logger.error(f"Failed to initialize OpenAI client: {str(e)}")
             return False
     
-    def generate_response(self, messages: List[Dict], model: str = "gpt-4-turbo", temperature: float = 0.7) -> Tuple[str, Dict]:
+    def wait_for_capacity(self, tokens: int = 0, images: int = 0) -> bool:
+        """Wait until the rate limiter admits one more call"""
+        return get_rate_limiter().acquire(
+            self.rate_limit_id,
+            tokens=tokens,
+            images=images,
+            on_wait=self.on_rate_limit_wait
+        )
+    
+    def settle_tokens(self, reserved: int, used: int):
+        """Give back tokens reserved for a call but not used by it"""
+        get_rate_limiter().refund(self.rate_limit_id, reserved - used)
+    
+    def generate_response(self, messages: List[Dict], model: str = "gpt-4-turbo", temperature: float = 0.7,
+                          input_tokens: Optional[int] = None) -> Tuple[str, Dict]:
         """Generate response with enhanced error handling"""
         try:
-            # Count input tokens
-            input_text = "\n".join([msg["content"] for msg in messages])
-            input_tokens = self.token_manager.count_tokens(input_text)
+            # Count input tokens unless the context budgeter already did
+            if input_tokens is None:
+                input_tokens = self.token_manager.count_messages_tokens(messages)
             
             if not self.client or self.api_key == "demo_key":
                 # Demo mode response
@@ -625,36 +785,33 @@ This demo shows the enhanced interface with inline features like image generatio
                 output_tokens = self.token_manager.count_tokens(assistant_message)
                 cost = 0.0
             else:
+                reserved = input_tokens + MAX_COMPLETION_TOKENS
+                if not self.wait_for_capacity(tokens=reserved):
+                    return RATE_LIMIT_MESSAGE, {"error": True, "message": "Rate limit reached"}
+                
                 # Real API call with new syntax
-                response = self.client.chat.completions.create(
-                    model=model,
-                    messages=messages,
-                    temperature=temperature,
-                    max_tokens=2000
-                )
+                try:
+                    response = CHAT_RETRY_POLICY.call(
+                        self.client.chat.completions.create,
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=MAX_COMPLETION_TOKENS,
+                        breaker=get_circuit_breaker(),
+                        on_retry=self.on_retry
+                    )
+                except BaseException:
+                    # Also on a rerun or stop while waiting to retry
+                    self.settle_tokens(reserved, 0)
+                    raise
                 
                 assistant_message = response.choices[0].message.content
                 output_tokens = response.usage.completion_tokens
                 input_tokens = response.usage.prompt_tokens
+                self.settle_tokens(reserved, input_tokens + output_tokens)
                 cost = self.token_manager.calculate_cost(input_tokens, output_tokens, model)
             
-            total_tokens = input_tokens + output_tokens
-            
-            # Update session stats
-            self.session_stats["total_tokens"] += total_tokens
-            self.session_stats["total_cost"] += cost
-            self.session_stats["messages_count"] += 1
-            
-            metadata = {
-                "model": model,
-                "input_tokens": input_tokens,
-                "output_tokens": output_tokens,
-                "total_tokens": total_tokens,
-                "cost": cost,
-                "temperature": temperature,
-                "timestamp": datetime.now().isoformat(),
-                "demo_mode": self.api_key == "demo_key" or not self.client
-            }
+            metadata = self.record_usage(model, temperature, input_tokens, output_tokens, cost)
             
             return assistant_message, metadata
             
@@ -663,6 +820,100 @@ This demo shows the enhanced interface with inline features like image generatio
             error_message = f"I apologize, but I encountered an error: {str(e)}"
             return error_message, {"error": True, "message": str(e)}
     
+    def stream_response(self, messages: List[Dict], model: str = "gpt-4-turbo", temperature: float = 0.7,
+                        input_tokens: Optional[int] = None) -> Iterator[str]:
+        """Yield response text as it arrives; metadata is left in last_metadata"""
+        self.last_metadata = {}
+        
+        if not self.client or self.api_key == "demo_key":
+            assistant_message, self.last_metadata = self.generate_response(messages, model, temperature, input_tokens)
+            yield assistant_message
+            return
+        
+        if input_tokens is None:
+            input_tokens = self.token_manager.count_messages_tokens(messages)
+        reserved = input_tokens + MAX_COMPLETION_TOKENS
+        if not self.wait_for_capacity(tokens=reserved):
+            self.last_metadata = {"error": True, "message": "Rate limit reached"}
+            yield RATE_LIMIT_MESSAGE
+            return
+        
+        started = time.perf_counter()
+        first_token_ms = None
+        parts = []
+        usage = None
+        finished = False
+        
+        try:
+            # Only opening the stream is retried; a reply cut off midway is not resent
+            stream = CHAT_RETRY_POLICY.call(
+                self.client.chat.completions.create,
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=MAX_COMPLETION_TOKENS,
+                stream=True,
+                stream_options={"include_usage": True},
+                breaker=get_circuit_breaker(),
+                on_retry=self.on_retry
+            )
+            
+            for chunk in stream:
+                # The final chunk carries usage and no choices
+                if chunk.usage:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if first_token_ms is None:
+                        first_token_ms = (time.perf_counter() - started) * 1000
+                    parts.append(delta)
+                    yield delta
+            finished = True
+        except Exception as e:
+            logger.error(f"Chat streaming error: {str(e)}")
+            self.last_metadata = {"error": True, "message": str(e)}
+            yield f"I apologize, but I encountered an error: {str(e)}"
+            return
+        finally:
+            # Also runs on a rerun or stop mid-stream, which the except above doesn't catch
+            if not finished:
+                self.settle_tokens(reserved, self.token_manager.count_tokens("".join(parts)))
+        
+        assistant_message = "".join(parts)
+        if usage:
+            input_tokens = usage.prompt_tokens
+            output_tokens = usage.completion_tokens
+        else:
+            output_tokens = self.token_manager.count_tokens(assistant_message)
+        cost = self.token_manager.calculate_cost(input_tokens, output_tokens, model)
+        self.settle_tokens(reserved, input_tokens + output_tokens)
+        
+        self.last_metadata = self.record_usage(model, temperature, input_tokens, output_tokens, cost)
+        self.last_metadata["first_token_ms"] = round(first_token_ms or 0)
+        self.last_metadata["streamed"] = True
+    
+    def record_usage(self, model: str, temperature: float, input_tokens: int, output_tokens: int, cost: float) -> Dict:
+        """Add a completed response to the session stats and build its metadata"""
+        total_tokens = input_tokens + output_tokens
+        
+        # Update session stats
+        self.session_stats["total_tokens"] += total_tokens
+        self.session_stats["total_cost"] += cost
+        self.session_stats["messages_count"] += 1
+        
+        return {
+            "model": model,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": total_tokens,
+            "cost": cost,
+            "temperature": temperature,
+            "timestamp": datetime.now().isoformat(),
+            "demo_mode": self.api_key == "demo_key" or not self.client
+        }
+    
     def generate_image(self, prompt: str, model: str = "dall-e-3", size: str = "1024x1024") -> Tuple[str, Dict]:
         """Generate image with new OpenAI API syntax"""
         try:
@@ -677,18 +928,31 @@ This demo shows the enhanced interface with inline features like image generatio
                     "timestamp": datetime.now().isoformat()
                 }
             
+            if not self.wait_for_capacity(images=1):
+                return None, {"error": True, "message": RATE_LIMIT_MESSAGE}
+            
             # Real API call with new syntax
-            response = self.client.images.generate(
+            response = IMAGE_RETRY_POLICY.call(
+                self.client.images.generate,
                 model=model,
                 prompt=prompt,
                 size=size,
                 quality="standard",
-                n=1
+                n=1,
+                breaker=get_circuit_breaker(),
+                on_retry=self.on_retry
             )
             
             image_url = response.data[0].url
             cost = OPENAI_PRICING.get(model, {}).get(size, 0.0)
             
+            # Keep a local copy; the returned URL expires after an hour
+            try:
+                image_id = get_image_cache().fetch(image_url)
+            except Exception as e:
+                logger.warning(f"Could not cache generated image: {str(e)}")
+                image_id = None
+            
             # Update session stats
             self.session_stats["total_cost"] += cost
             
@@ -696,6 +960,7 @@ This demo shows the enhanced interface with inline features like image generatio
                 "model": model,
                 "size": size,
                 "cost": cost,
+                "image_id": image_id,
                 "timestamp": datetime.now().isoformat(),
                 "demo_mode": False
             }
@@ -706,6 +971,202 @@ This demo shows the enhanced interface with inline features like image generatio
             logger.error(f"Image generation error: {str(e)}")
             return None, {"error": True, "message": str(e)}
 
+# ======================================================
+# 🧑‍🤝‍🧑 PANEL MODE
+# ======================================================
+
+# Assistants preselected for a new panel, and the most that fit side by side
+DEFAULT_PANEL = ["Startup Strategist", "Financial Analyst", "Marketing Strategy Expert"]
+MAX_PANEL_SIZE = 4
+
+# Seconds between repaints of a streaming panel column
+PANEL_REPAINT_INTERVAL = 0.05
+
+def build_system_prompt(bot_name: str) -> str:
+    """System prompt for one of the BOT_PERSONALITIES"""
+    bot_info = BOT_PERSONALITIES[bot_name]
+    return f"""You are a {bot_name}. {bot_info['description']}
+
+Your specialties include: {', '.join(bot_info['specialties'])}
+
+Provide expert, actionable advice with:
+- Specific examples and implementation strategies
+- Industry best practices and case studies
+- Relevant metrics and KPIs to track success
+- Tailored recommendations for the business context
+
+Maintain a professional yet approachable tone."""
+
+class PanelManager:
+    """Ask several assistants the same question concurrently over AsyncOpenAI"""
+    
+    def __init__(self, chat_manager: EnhancedChatManager):
+        self.chat_manager = chat_manager
+    
+    async def _answer(self, client: Optional[AsyncOpenAI], bot_name: str, prompt: str, model: str, placeholder) -> Tuple[str, Dict]:
+        """Stream one assistant's answer into its placeholder"""
+        chat_manager = self.chat_manager
+        token_manager = chat_manager.token_manager
+        bot_info = BOT_PERSONALITIES[bot_name]
+        temperature = bot_info["temperature"]
+        messages = [
+            {"role": "system", "content": build_system_prompt(bot_name)},
+            {"role": "user", "content": prompt}
+        ]
+        input_tokens = token_manager.count_messages_tokens(messages)
+        started = time.perf_counter()
+        
+        if client is None:
+            # Demo mode response
+            assistant_message = f"Demo answer from {bot_info['emoji']} {bot_name}. Add your OpenAI API key to hear from the whole panel."
+            placeholder.markdown(assistant_message)
+            metadata = chat_manager.record_usage(
+                model, temperature, input_tokens, token_manager.count_tokens(assistant_message), 0.0
+            )
+            return assistant_message, metadata
+        
+        reserved = input_tokens + MAX_COMPLETION_TOKENS
+        if not await get_rate_limiter().acquire_async(chat_manager.rate_limit_id, tokens=reserved):
+            placeholder.warning(RATE_LIMIT_MESSAGE)
+            return RATE_LIMIT_MESSAGE, {"error": True, "message": "Rate limit reached"}
+        
+        first_token_ms = None
+        parts = []
+        usage = None
+        last_paint = 0.0
+        finished = False
+        
+        try:
+            stream = await CHAT_RETRY_POLICY.call_async(
+                client.chat.completions.create,
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=MAX_COMPLETION_TOKENS,
+                stream=True,
+                stream_options={"include_usage": True},
+                breaker=get_circuit_breaker()
+            )
+            
+            async for chunk in stream:
+                if chunk.usage:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    now = time.perf_counter()
+                    if first_token_ms is None:
+                        first_token_ms = (now - started) * 1000
+                    parts.append(delta)
+                    if now - last_paint >= PANEL_REPAINT_INTERVAL:
+                        placeholder.markdown("".join(parts) + "▌")
+                        last_paint = now
+            finished = True
+        except Exception as e:
+            logger.error(f"Panel error for {bot_name}: {str(e)}")
+            error_message = f"I apologize, but I encountered an error: {str(e)}"
+            placeholder.markdown(error_message)
+            return error_message, {"error": True, "message": str(e)}
+        finally:
+            # Also runs when the task is cancelled (asyncio.CancelledError)
+            if not finished:
+                chat_manager.settle_tokens(reserved, token_manager.count_tokens("".join(parts)))
+        
+        assistant_message = "".join(parts)
+        placeholder.markdown(assistant_message)
+        
+        if usage:
+            input_tokens = usage.prompt_tokens
+            output_tokens = usage.completion_tokens
+        else:
+            output_tokens = token_manager.count_tokens(assistant_message)
+        cost = token_manager.calculate_cost(input_tokens, output_tokens, model)
+        chat_manager.settle_tokens(reserved, input_tokens + output_tokens)
+        
+        metadata = chat_manager.record_usage(model, temperature, input_tokens, output_tokens, cost)
+        metadata["first_token_ms"] = round(first_token_ms or 0)
+        metadata["latency_ms"] = round((time.perf_counter() - started) * 1000)
+        return assistant_message, metadata
+    
+    async def _ask(self, bots: List[str], prompt: str, model: str, placeholders: List) -> Dict[str, Tuple[str, Dict]]:
+        chat_manager = self.chat_manager
+        if not chat_manager.client or chat_manager.api_key == "demo_key":
+            results = await asyncio.gather(*(
+                self._answer(None, bot, prompt, model, placeholder) for bot, placeholder in zip(bots, placeholders)
+            ))
+        else:
+            async with AsyncOpenAI(api_key=chat_manager.api_key, max_retries=0) as client:
+                results = await asyncio.gather(*(
+                    self._answer(client, bot, prompt, model, placeholder) for bot, placeholder in zip(bots, placeholders)
+                ))
+        return dict(zip(bots, results))
+    
+    def ask(self, bots: List[str], prompt: str, model: str, placeholders: List) -> Dict[str, Tuple[str, Dict]]:
+        """Answer ``prompt`` from every bot at once; takes as long as the slowest one"""
+        return asyncio.run(self._ask(bots, prompt, model, placeholders))
+
+# ======================================================
+# 💾 CONVERSATION STORAGE
+# ======================================================
+
+# Newest messages kept in session memory; older ones are read from the store
+SESSION_MESSAGES = UI_CONFIG["max_chat_history"]
+
+@st.cache_resource(show_spinner=False)
+def get_conversation_store() -> ConversationStore:
+    """Conversation store shared by every session in the process"""
+    return ConversationStore()
+
+def conversation_user_id() -> str:
+    """Owner id for conversations started in this session; signed-out ones resume by link"""
+    user = st.session_state.get("user")
+    return user.id if user else ANONYMOUS_USER
+
+def load_conversation():
+    """Resume the stored conversation for this session, once per session"""
+    if st.session_state.get("conversation_loaded"):
+        return
+    st.session_state.conversation_loaded = True
+    
+    store = get_conversation_store()
+    user_id = conversation_user_id()
+    conversation_id = st.query_params.get("conversation")
+    if not (conversation_id and store.owns(user_id, conversation_id)):
+        conversation_id = store.latest_conversation(user_id) if user_id != ANONYMOUS_USER else None
+    
+    if conversation_id:
+        st.session_state.conversation_id = conversation_id
+        st.session_state.messages = store.load_page(conversation_id, limit=SESSION_MESSAGES)
+        st.query_params["conversation"] = conversation_id
+
+def add_message(message: Dict):
+    """Add a message to the chat and write it to the conversation store"""
+    store = get_conversation_store()
+    user_id = conversation_user_id()
+    if not st.session_state.get("conversation_id"):
+        st.session_state.conversation_id = store.start_conversation(user_id)
+        st.query_params["conversation"] = st.session_state.conversation_id
+    
+    message["bot"] = st.session_state.get("current_bot", "Startup Strategist")
+    message["id"] = store.append(st.session_state.conversation_id, user_id, message["bot"], message)
+    
+    messages = st.session_state.messages
+    messages.append(message)
+    if len(messages) > SESSION_MESSAGES:
+        dropped = messages[:-SESSION_MESSAGES]
+        del messages[:-SESSION_MESSAGES]
+        if "chat_manager" in st.session_state:
+            st.session_state.chat_manager.token_manager.forget_messages(dropped)
+
+def new_conversation():
+    """Start over; the previous conversation stays in the store"""
+    st.session_state.messages = []
+    st.session_state.conversation_id = None
+    st.session_state.render_window = RENDER_WINDOW
+    st.session_state.message_html = {}
+    st.query_params.pop("conversation", None)
+
 # ======================================================
 # 🎨 ENHANCED UI COMPONENTS
 # ======================================================
@@ -759,7 +1220,7 @@ def render_quick_actions(bot_name: str):
                 if st.button(f"⚡ {action}", key=f"action_{idx}"):
                     # Add quick action as user message
                     action_message = f"Help me with: {action}"
-                    st.session_state.messages.append({"role": "user", "content": action_message})
+                    add_message({"role": "user", "content": action_message})
                     st.rerun()
         
         st.markdown('</div>', unsafe_allow_html=True)
@@ -777,19 +1238,19 @@ def render_inline_features():
     with col2:
         if st.button("📊 Create Chart"):
             chart_message = "Create a business chart or visualization for me"
-            st.session_state.messages.append({"role": "user", "content": chart_message})
+            add_message({"role": "user", "content": chart_message})
             st.rerun()
     
     with col3:
         if st.button("📝 Write Document"):
             doc_message = "Help me write a professional business document"
-            st.session_state.messages.append({"role": "user", "content": doc_message})
+            add_message({"role": "user", "content": doc_message})
             st.rerun()
     
     with col4:
         if st.button("🔍 Analyze Data"):
             data_message = "Help me analyze business data and provide insights"
-            st.session_state.messages.append({"role": "user", "content": data_message})
+            add_message({"role": "user", "content": data_message})
             st.rerun()
 
 def render_usage_dashboard():
@@ -810,6 +1271,139 @@ def render_usage_dashboard():
         st.metric("Cost", f"${stats['total_cost']:.4f}")
         duration = datetime.now() - stats["session_start"]
         st.metric("Duration", str(duration).split('.')[0])
+    
+    # Process-wide rate limit usage
+    usage = get_rate_limiter().utilization()
+    st.markdown("### 🚦 Rate Limits")
+    for bucket, label in [("requests", "Requests/min"), ("tokens", "Tokens/hour"), ("images", "Images/hour")]:
+        st.progress(min(max(usage[bucket], 0.0), 1.0), text=f"{label}: {usage[bucket]:.0%} used")
+    st.caption(f"Delayed: {usage['delayed']} · Rejected: {usage['rejected']} · Users: {usage['tracked_users']}")
+
+def rate_limit_notice(placeholder):
+    """Callback that tells the user how long the rate limiter is holding their call"""
+    return lambda seconds: placeholder.info(f"⏳ Rate limit reached - waiting about {seconds:.0f}s for capacity...")
+
+def retry_notice(placeholder):
+    """Callback that tells the user a transient OpenAI error is being retried"""
+    return lambda attempt, delay, error: placeholder.warning(
+        f"🔁 OpenAI is busy ({type(error).__name__}) - retry {attempt} in {delay:.1f}s..."
+    )
+
+def render_panel_answer(bot_name: str, answer: str, metadata: Dict):
+    """One column of a panel round"""
+    bot_info = BOT_PERSONALITIES[bot_name]
+    st.markdown(
+        bubble_html("assistant-message", f"{bot_info['emoji']} {bot_name}:", answer), unsafe_allow_html=True
+    )
+    if metadata and not metadata.get("error"):
+        spans = [
+            f"<span>💰 ${metadata.get('cost', 0):.4f}</span>",
+            f"<span>🔢 {metadata.get('total_tokens', 0)} tokens</span>",
+            f"<span>⚡ {metadata['first_token_ms']} ms to first token</span>" if metadata.get('first_token_ms') else '',
+            f"<span>⏱️ {metadata['latency_ms'] / 1000:.1f}s</span>" if metadata.get('latency_ms') else '',
+        ]
+        st.markdown('<div class="message-meta">' + "".join(spans) + "</div>", unsafe_allow_html=True)
+
+def render_panel(panel_bots: List[str], selected_model: str):
+    """Panel mode: one question answered side by side by several assistants"""
+    st.markdown("### 🧑‍🤝‍🧑 Panel")
+    
+    for panel_round in st.session_state.panel_rounds:
+        st.markdown(bubble_html("user-message", "You:", panel_round["prompt"]), unsafe_allow_html=True)
+        
+        answers = panel_round["answers"]
+        for col, (bot_name, (answer, metadata)) in zip(st.columns(len(answers)), answers.items()):
+            with col:
+                render_panel_answer(bot_name, answer, metadata)
+        st.caption(
+            f"⏱️ Panel answered in {panel_round['elapsed']:.1f}s · "
+            f"💰 ${sum(metadata.get('cost', 0) for _, metadata in answers.values()):.4f} total"
+        )
+    
+    if len(panel_bots) < 2:
+        st.info("👈 Pick at least two panel members in the sidebar.")
+        return
+    
+    if prompt := st.chat_input("Ask the panel anything..."):
+        st.markdown(bubble_html("user-message", "You:", prompt), unsafe_allow_html=True)
+        
+        # One column per assistant; each streams independently
+        placeholders = []
+        for col, bot_name in zip(st.columns(len(panel_bots)), panel_bots):
+            with col:
+                bot_info = BOT_PERSONALITIES[bot_name]
+                st.markdown(f"**{bot_info['emoji']} {bot_name}:**")
+                placeholders.append(st.empty())
+        
+        started = time.perf_counter()
+        answers = PanelManager(st.session_state.chat_manager).ask(panel_bots, prompt, selected_model, placeholders)
+        
+        st.session_state.panel_rounds.append({
+            "prompt": prompt,
+            "answers": answers,
+            "elapsed": time.perf_counter() - started
+        })
+        st.rerun()
+
+# Messages shown before "Load earlier" is used, and how many each click adds
+RENDER_WINDOW = 20
+
+def message_html(message: Dict) -> Tuple[str, str]:
+    """Bubble and metadata HTML for a message, cached per message id for the session"""
+    cache = st.session_state.setdefault("message_html", {})
+    message_id = message.get("id")
+    if message_id is not None and message_id in cache:
+        return cache[message_id]
+    
+    bot_name = message.get("bot") or st.session_state.get("current_bot", "Startup Strategist")
+    bot_info = BOT_PERSONALITIES.get(bot_name, BOT_PERSONALITIES["Startup Strategist"])
+    
+    if message["role"] == "user":
+        bubble = bubble_html("user-message", "You:", message["content"])
+    else:
+        bubble = bubble_html("assistant-message", f"{bot_info['emoji']} {bot_name}:", message["content"])
+    
+    meta = ""
+    metadata = message.get("metadata")
+    if message["role"] != "user" and metadata and not metadata.get("error"):
+        meta = meta_html(metadata)
+    
+    if message_id is not None:
+        cache[message_id] = (bubble, meta)
+    return bubble, meta
+
+def render_image(message: Dict):
+    """Thumbnail from the image cache, with the full image only when asked for"""
+    image_id = (message.get("metadata") or {}).get("image_id")
+    thumbnail = get_image_cache().thumbnail(image_id) if image_id else None
+    if not thumbnail:
+        # Not cached (demo image or evicted): fall back to the original URL
+        st.image(message["image_url"], caption="Generated Image", width=300)
+        return
+    
+    st.image(thumbnail, caption="Generated Image", width=300)
+    if st.toggle("🔍 Full size", key=f"full_image_{message.get('id', image_id)}"):
+        st.image(get_image_cache().full(image_id) or message["image_url"])
+
+def render_messages(messages: List[Dict]):
+    """Render messages as few markdown blocks as possible; images split the blocks"""
+    batch = []
+    for message in messages:
+        bubble, meta = message_html(message)
+        batch.append(bubble)
+        if "image_url" in message:
+            st.markdown(join_html(batch), unsafe_allow_html=True)
+            render_image(message)
+            batch = []
+        batch.append(meta)
+    if batch:
+        st.markdown(join_html(batch), unsafe_allow_html=True)
+    
+    # Only keep HTML for messages still on screen
+    cache = st.session_state.setdefault("message_html", {})
+    visible_ids = {message.get("id") for message in messages}
+    for message_id in [key for key in cache if key not in visible_ids]:
+        del cache[message_id]
 
 # ======================================================
 # 🚀 MAIN CHAT INTERFACE
@@ -845,6 +1439,12 @@ def main_chat_interface():
         st.session_state.chat_manager = EnhancedChatManager()
         st.session_state.chat_manager.initialize_client(api_key)
     
+    # Pick up where this user's stored conversation left off
+    load_conversation()
+    
+    # Signed-in users share one rate limit across sessions; signed-out sessions share the anonymous one
+    st.session_state.chat_manager.rate_limit_id = conversation_user_id()
+    
     # Sidebar
     with st.sidebar:
         st.markdown("### 🤖 AI Assistant")
@@ -855,6 +1455,16 @@ def main_chat_interface():
         # Model selection
         st.markdown("### ⚙️ Settings")
         selected_model = st.selectbox("Model", ["gpt-4-turbo", "gpt-4", "gpt-3.5-turbo"])
+        stream_responses = st.checkbox("Stream responses", value=True, help="Show the reply as it is generated")
+        panel_mode = st.checkbox("🧑‍🤝‍🧑 Panel mode", help="Ask several assistants the same question at once")
+        panel_bots = []
+        if panel_mode:
+            panel_bots = st.multiselect(
+                "Panel members",
+                list(BOT_PERSONALITIES.keys()),
+                default=[bot for bot in DEFAULT_PANEL if bot in BOT_PERSONALITIES],
+                max_selections=MAX_PANEL_SIZE
+            )
         
         # Usage dashboard
         render_usage_dashboard()
@@ -864,27 +1474,31 @@ def main_chat_interface():
         col1, col2 = st.columns(2)
         with col1:
             if st.button("🗑️ Clear Chat"):
-                st.session_state.messages = []
+                new_conversation()
+                st.session_state.panel_rounds = []
                 st.rerun()
         with col2:
             if st.button("💾 Export"):
-                if st.session_state.messages:
-                    export_data = {
-                        "bot": current_bot,
-                        "messages": st.session_state.messages,
-                        "timestamp": datetime.now().isoformat()
-                    }
+                if st.session_state.get("conversation_id"):
+                    # Whole conversation from the store, one JSON object per line
+                    export_file = io.BytesIO()
+                    for line in get_conversation_store().export_ndjson(st.session_state.conversation_id):
+                        export_file.write(line.encode("utf-8"))
                     st.download_button(
                         "📥 Download",
-                        json.dumps(export_data, indent=2),
-                        file_name=f"chat_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-                        mime="application/json"
+                        export_file,
+                        file_name=f"chat_{datetime.now().strftime('%Y%m%d_%H%M%S')}.ndjson",
+                        mime="application/x-ndjson"
                     )
     
     # Main chat area
     st.title("🤖 Enhanced Business AI Assistant")
     st.markdown("*Chat with 110+ specialized AI business consultants with inline features*")
     
+    if panel_mode:
+        render_panel(panel_bots, selected_model)
+        return
+    
     # Current bot info
     bot_info = BOT_PERSONALITIES[current_bot]
     st.success(f"✅ Chatting with **{bot_info['emoji']} {current_bot}** - {bot_info['category']}")
@@ -904,6 +1518,9 @@ def main_chat_interface():
             col1, col2, col3 = st.columns(3)
             with col1:
                 if st.button("🎨 Generate") and image_prompt:
+                    wait_notice = st.empty()
+                    st.session_state.chat_manager.on_rate_limit_wait = rate_limit_notice(wait_notice)
+                    st.session_state.chat_manager.on_retry = retry_notice(wait_notice)
                     with st.spinner("Creating image..."):
                         image_url, metadata = st.session_state.chat_manager.generate_image(image_prompt)
                         
@@ -915,7 +1532,7 @@ def main_chat_interface():
                                 "image_url": image_url,
                                 "metadata": metadata
                             }
-                            st.session_state.messages.append(image_message)
+                            add_message(image_message)
                             st.session_state.show_image_prompt = False
                             st.rerun()
                         else:
@@ -929,73 +1546,96 @@ def main_chat_interface():
     # Chat messages with enhanced display
     st.markdown("### 💬 Conversation")
     
-    for message in st.session_state.messages:
-        if message["role"] == "user":
-            st.markdown(f"""
-            <div class="user-message">
-                <strong>You:</strong> {message["content"]}
-            </div>
-            """, unsafe_allow_html=True)
-        else:
-            st.markdown(f"""
-            <div class="assistant-message">
-                <strong>{bot_info['emoji']} {current_bot}:</strong> {message["content"]}
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # Display inline image if present
-            if "image_url" in message:
-                st.image(message["image_url"], caption="Generated Image", width=300)
-            
-            # Metadata
-            if "metadata" in message and message["metadata"]:
-                metadata = message["metadata"]
-                if not metadata.get("error"):
-                    st.markdown(f"""
-                    <div class="message-meta">
-                        <span>💰 ${metadata.get('cost', 0):.4f}</span>
-                        <span>🔢 {metadata.get('total_tokens', 0)} tokens</span>
-                        <span>🤖 {metadata.get('model', 'N/A')}</span>
-                        <span>{'🎮 Demo' if metadata.get('demo_mode') else '✅ Real'}</span>
-                    </div>
-                    """, unsafe_allow_html=True)
+    # Only the newest messages are rendered; older ones load on request,
+    # from session memory first and then from the store
+    messages = st.session_state.messages
+    window = st.session_state.get("render_window", RENDER_WINDOW)
+    conversation_id = st.session_state.get("conversation_id")
+    stored = bool(conversation_id and messages and "id" in messages[0])
+    
+    earlier_messages = []
+    if stored and window > len(messages):
+        earlier_messages = get_conversation_store().load_page(
+            conversation_id, before_id=messages[0]["id"], limit=window - len(messages)
+        )
+    visible = (earlier_messages + messages)[-window:]
+    
+    hidden = max(len(messages) - window, 0)
+    if stored and visible:
+        hidden += get_conversation_store().count_before(
+            conversation_id, min(visible[0]["id"], messages[0]["id"])
+        )
+    if hidden and st.button(f"⬆️ Load earlier messages ({hidden} more)"):
+        st.session_state.render_window = window + RENDER_WINDOW
+        st.rerun()
+    
+    render_messages(visible)
     
     # Enhanced chat input
     if prompt := st.chat_input("Ask your AI assistant anything..."):
         # Add user message
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        add_message({"role": "user", "content": prompt})
         
-        # Generate response
-        with st.spinner("🤔 Thinking..."):
-            # Create system prompt
-            system_prompt = f"""You are a {current_bot}. {bot_info['description']}
-
-Your specialties include: {', '.join(bot_info['specialties'])}
-
-Provide expert, actionable advice with:
-- Specific examples and implementation strategies
-- Industry best practices and case studies
-- Relevant metrics and KPIs to track success
-- Tailored recommendations for the business context
-
-Maintain a professional yet approachable tone."""
-            
-            messages_for_api = [
-                {"role": "system", "content": system_prompt}
-            ] + st.session_state.messages
-            
-            response, metadata = st.session_state.chat_manager.generate_response(
-                messages_for_api,
-                selected_model,
-                bot_info["temperature"]
+        if stream_responses:
+            # Show the question right away; the reply streams in below it
+            st.markdown(bubble_html("user-message", "You:", prompt), unsafe_allow_html=True)
+    
+    # Answer the newest user message, whether typed or added by a quick action
+    if st.session_state.messages and st.session_state.messages[-1]["role"] == "user":
+        # Create system prompt
+        system_prompt = build_system_prompt(current_bot)
+        
+        chat_manager = st.session_state.chat_manager
+        wait_notice = st.empty()
+        chat_manager.on_rate_limit_wait = rate_limit_notice(wait_notice)
+        chat_manager.on_retry = retry_notice(wait_notice)
+        
+        # Keep the system prompt and the newest turns that fit the model's budget
+        messages_for_api, context_report = chat_manager.context_budgeter.build(
+            system_prompt, st.session_state.messages, selected_model
+        )
+        
+        # Opening messages of fresh conversations are served from the response cache
+        cache_key = None
+        cached = None
+        if len(st.session_state.messages) == 1 and chat_manager.client and chat_manager.api_key != "demo_key":
+            cache_key = make_cache_key(current_bot, selected_model, bot_info["temperature"], messages_for_api)
+            cached = get_response_cache().get(cache_key)
+        
+        if cached:
+            response, metadata = cached
+            metadata.pop("first_token_ms", None)
+            metadata.update({"cache_hit": True, "cost": 0.0, "timestamp": datetime.now().isoformat()})
+        elif stream_responses:
+            # Write the reply as tokens arrive
+            st.markdown(f"**{bot_info['emoji']} {current_bot}:**")
+            response = st.write_stream(
+                chat_manager.stream_response(
+                    messages_for_api, selected_model, bot_info["temperature"], context_report["context_tokens"]
+                )
             )
-            
-            # Add assistant message
-            st.session_state.messages.append({
-                "role": "assistant",
-                "content": response,
-                "metadata": metadata
-            })
+            metadata = chat_manager.last_metadata
+        else:
+            # Generate response
+            with st.spinner("🤔 Thinking..."):
+                response, metadata = chat_manager.generate_response(
+                    messages_for_api,
+                    selected_model,
+                    bot_info["temperature"],
+                    context_report["context_tokens"]
+                )
+        
+        if not metadata.get("error"):
+            metadata.update(context_report)
+            if cache_key and not cached:
+                get_response_cache().put(cache_key, response, metadata)
+        
+        # Add assistant message
+        add_message({
+            "role": "assistant",
+            "content": response,
+            "metadata": metadata
+        })
         
         st.rerun()
 
@@ -1010,6 +1650,9 @@ def main():
     if "messages" not in st.session_state:
         st.session_state.messages = []
     
+    if "panel_rounds" not in st.session_state:
+        st.session_state.panel_rounds = []
+    
     if "current_bot" not in st.session_state:
         st.session_state.current_bot = "Startup Strategist"
     
@@ -0,0 +1,67 @@
+"""
+Process-wide cache for Supabase table reads.
+
+Entries are tagged with the table, or tables, they read and expire after a
+TTL. Write paths call ``invalidate(table)`` so the next read refetches, while
+plain reruns and widget interactions reuse the cached rows.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Tuple, Union
+
+# Seconds a cached read stays fresh when no write invalidates it
+DEFAULT_TTL = 60
+
+_lock = threading.Lock()
+_store: Dict[Tuple[Tuple[str, ...], Hashable], Tuple[float, Any]] = {}
+
+
+def _tags(table: Union[str, Tuple[str, ...]]) -> Tuple[str, ...]:
+    return (table,) if isinstance(table, str) else tuple(table)
+
+
+def cached_query(
+    table: Union[str, Tuple[str, ...]],
+    key: Hashable,
+    loader: Callable[[], Any],
+    ttl: float = DEFAULT_TTL,
+) -> Any:
+    """Return the cached result for ``(table, key)``, calling ``loader`` on a miss.
+
+    ``table`` may be a tuple when the result joins several tables; the entry
+    is then dropped when any of them is invalidated.
+    """
+    now = time.monotonic()
+    with _lock:
+        entry = _store.get((_tags(table), key))
+    if entry is not None and entry[0] > now:
+        return entry[1]
+
+    value = loader()
+    with _lock:
+        _store[(_tags(table), key)] = (now + ttl, value)
+    return value
+
+
+def cached_select(supabase, table: str, columns: str = "*", ttl: float = DEFAULT_TTL) -> List[Dict]:
+    """Cached ``select(columns)`` over a whole table, returning the rows."""
+    return cached_query(
+        table,
+        ("select", columns),
+        lambda: supabase.table(table).select(columns).execute().data or [],
+        ttl,
+    )
+
+
+def invalidate(*tables: str) -> None:
+    """Drop every cached entry read from any of ``tables``."""
+    with _lock:
+        for cache_key in [k for k in _store if set(k[0]) & set(tables)]:
+            del _store[cache_key]
+
+
+def invalidate_all() -> None:
+    """Drop every cached entry."""
+    with _lock:
+        _store.clear()
@@ -0,0 +1,194 @@
+"""
+Client-side rate limiting for OpenAI calls.
+
+Token buckets for requests, tokens and images are kept per user and for the
+whole process, so one busy session cannot push every other session into
+429 responses. Signed-out sessions have no stable id, so they share one
+stricter ``ANONYMOUS_USER`` bucket; a new tab does not get a fresh limit.
+A call is admitted only when all of its buckets have room; otherwise
+callers get the estimated wait and can retry after it.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from config import ANONYMOUS_RATE_LIMITS, GLOBAL_RATE_LIMITS, RATE_LIMITS
+
+# Longest a caller waits for capacity before giving up
+DEFAULT_MAX_WAIT = 60.0
+
+# Per-user buckets kept before idle (full) ones are pruned
+MAX_TRACKED_USERS = 1000
+
+# User id shared by every signed-out session
+ANONYMOUS_USER = "anonymous"
+
+
+class TokenBucket:
+    """Bucket of ``capacity`` units refilled at ``rate`` units per second"""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        # A clock read before the bucket was created must not drain it
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = max(self.updated, now)
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` units are available; assumes a fresh refill."""
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    @property
+    def utilization(self) -> float:
+        return 1 - self.tokens / self.capacity
+
+
+def _buckets(limits: Dict[str, float]) -> Dict[str, TokenBucket]:
+    return {
+        "requests": TokenBucket(limits["requests_per_minute"], limits["requests_per_minute"] / 60),
+        "tokens": TokenBucket(limits["tokens_per_hour"], limits["tokens_per_hour"] / 3600),
+        "images": TokenBucket(limits["images_per_hour"], limits["images_per_hour"] / 3600),
+    }
+
+
+class RateLimiter:
+    """Per-user and global token buckets built from the config limits"""
+
+    def __init__(
+        self,
+        user_limits: Dict = RATE_LIMITS,
+        global_limits: Dict = GLOBAL_RATE_LIMITS,
+        anonymous_limits: Dict = ANONYMOUS_RATE_LIMITS,
+    ):
+        self.user_limits = user_limits
+        self.anonymous_limits = anonymous_limits
+        self.global_buckets = _buckets(global_limits)
+        self.user_buckets: Dict[str, Dict[str, TokenBucket]] = {}
+        self.stats = {"admitted": 0, "delayed": 0, "rejected": 0, "total_wait": 0.0}
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        for user_id in list(self.user_buckets):
+            buckets = self.user_buckets[user_id]
+            for bucket in buckets.values():
+                bucket.refill(now)
+            if all(bucket.tokens >= bucket.capacity for bucket in buckets.values()):
+                del self.user_buckets[user_id]
+
+    def reserve(self, user_id: str, requests: int = 1, tokens: int = 0, images: int = 0) -> float:
+        """Take capacity for one call if every bucket has room.
+
+        Returns 0 when the call is admitted, otherwise the seconds to wait
+        before trying again. Nothing is taken unless the call is admitted.
+        """
+        amounts = {"requests": requests, "tokens": tokens, "images": images}
+        with self._lock:
+            now = time.monotonic()
+            if user_id not in self.user_buckets:
+                if len(self.user_buckets) >= MAX_TRACKED_USERS:
+                    self._prune(now)
+                limits = self.anonymous_limits if user_id == ANONYMOUS_USER else self.user_limits
+                self.user_buckets[user_id] = _buckets(limits)
+            user_buckets = self.user_buckets[user_id]
+
+            wait = 0.0
+            for name, amount in amounts.items():
+                if not amount:
+                    continue
+                for bucket in (self.global_buckets[name], user_buckets[name]):
+                    bucket.refill(now)
+                    wait = max(wait, bucket.wait_time(amount))
+            if wait:
+                return wait
+
+            for name, amount in amounts.items():
+                self.global_buckets[name].tokens -= amount
+                user_buckets[name].tokens -= amount
+            return 0.0
+
+    def refund(self, user_id: str, tokens: int) -> None:
+        """Return unused estimated tokens after the real usage is known."""
+        if tokens <= 0:
+            return
+        with self._lock:
+            buckets = [self.global_buckets["tokens"]]
+            if user_id in self.user_buckets:
+                buckets.append(self.user_buckets[user_id]["tokens"])
+            for bucket in buckets:
+                bucket.tokens = min(bucket.capacity, bucket.tokens + tokens)
+
+    def acquire(
+        self,
+        user_id: str,
+        requests: int = 1,
+        tokens: int = 0,
+        images: int = 0,
+        max_wait: float = DEFAULT_MAX_WAIT,
+        on_wait: Optional[Callable[[float], None]] = None,
+    ) -> bool:
+        """Block until the call is admitted; False if it would exceed ``max_wait``."""
+        started = time.monotonic()
+        delayed = False
+        while True:
+            wait = self.reserve(user_id, requests, tokens, images)
+            elapsed = time.monotonic() - started
+            if not wait:
+                self._record(admitted=True, delayed=delayed, waited=elapsed)
+                return True
+            if elapsed + wait > max_wait:
+                self._record(admitted=False, delayed=delayed, waited=elapsed)
+                return False
+            delayed = True
+            if on_wait:
+                on_wait(wait)
+            time.sleep(min(wait, 1.0))
+
+    async def acquire_async(
+        self,
+        user_id: str,
+        requests: int = 1,
+        tokens: int = 0,
+        images: int = 0,
+        max_wait: float = DEFAULT_MAX_WAIT,
+    ) -> bool:
+        """Same as ``acquire`` without blocking the event loop."""
+        started = time.monotonic()
+        delayed = False
+        while True:
+            wait = self.reserve(user_id, requests, tokens, images)
+            elapsed = time.monotonic() - started
+            if not wait:
+                self._record(admitted=True, delayed=delayed, waited=elapsed)
+                return True
+            if elapsed + wait > max_wait:
+                self._record(admitted=False, delayed=delayed, waited=elapsed)
+                return False
+            delayed = True
+            await asyncio.sleep(min(wait, 1.0))
+
+    def _record(self, admitted: bool, delayed: bool, waited: float) -> None:
+        with self._lock:
+            self.stats["admitted" if admitted else "rejected"] += 1
+            if delayed:
+                self.stats["delayed"] += 1
+                self.stats["total_wait"] += waited
+
+    def utilization(self) -> Dict[str, float]:
+        """Share of each global bucket in use, plus call counters."""
+        now = time.monotonic()
+        with self._lock:
+            usage = {}
+            for name, bucket in self.global_buckets.items():
+                bucket.refill(now)
+                usage[name] = bucket.utilization
+            return {**usage, **self.stats, "tracked_users": len(self.user_buckets)}
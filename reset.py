@@ -1,9 +1,10 @@
 import streamlit as st
-from supabase import create_client, Client
-import requests
+from supabase import Client
 import re
 import hashlib
 
+from db import get_client, get_http_client
+
 # Page configuration
 st.set_page_config(
     page_title="Password Reset - Loy",
@@ -13,13 +14,10 @@ st.set_page_config(
 )
 
 # Initialize Supabase connection
-@st.cache_resource
 def init_connection():
     """Initialize Supabase connection"""
     try:
-        url = st.secrets["supabase"]["url"]
-        key = st.secrets["supabase"]["key"]
-        return create_client(url, key)
+        return get_client()
     except Exception as e:
         st.error(f"Failed to connect to Supabase: {e}")
         st.stop()
@@ -220,7 +218,7 @@ def send_password_reset_email(email):
         }
         payload = {"email": email}
         
-        response = requests.post(reset_url, headers=headers, json=payload)
+        response = get_http_client().post(reset_url, headers=headers, json=payload)
         
         if response.status_code == 200:
             return True, "Password reset email sent successfully"
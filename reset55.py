@@ -1,14 +1,15 @@
 # complete_password_reset.py
 import streamlit as st
 import re
-from supabase import create_client, Client
+from supabase import Client
 
-# Load Supabase credentials from Streamlit secrets
-SUPABASE_URL = st.secrets["SUPABASE_URL"]
-SUPABASE_KEY = st.secrets["SUPABASE_ANON_KEY"]
+from db import new_client
 
-# Initialize Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Each browser session gets its own client, with its own connection pool,
+# because set_session stores the user's tokens on it
+if "supabase_client" not in st.session_state:
+    st.session_state.supabase_client = new_client()
+supabase: Client = st.session_state.supabase_client
 
 def validate_email(email):
     """Validate email format"""
@@ -0,0 +1,120 @@
+"""
+Two-tier cache for assistant responses.
+
+Keys combine the bot, model, a temperature bucket and a hash of the
+normalized message list. Hits are served from an in-memory LRU first and a
+SQLite file second; both tiers expire entries after a TTL and are capped in
+size, oldest entries evicted first.
+"""
+
+import copy
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_DB_PATH = "response_cache.db"
+
+# Seconds a cached response may be served
+DEFAULT_TTL = 24 * 60 * 60
+
+# Entries kept in the memory tier and in the SQLite tier
+MEMORY_ITEMS = 256
+DISK_ITEMS = 5000
+
+
+def make_cache_key(bot: str, model: str, temperature: float, messages: List[Dict]) -> str:
+    """Build the cache key for a request.
+
+    Message content is stripped and its whitespace collapsed, so prompts that
+    differ only in spacing share an entry. Temperatures are bucketed to one
+    decimal place.
+    """
+    normalized = [
+        {"role": msg["role"], "content": re.sub(r"\s+", " ", str(msg["content"])).strip()}
+        for msg in messages
+    ]
+    messages_hash = hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"{bot}|{model}|{round(temperature, 1)}|{messages_hash}"
+
+
+class ResponseCache:
+    """LRU memory tier in front of a size-capped SQLite tier"""
+
+    def __init__(
+        self,
+        db_path: str = DEFAULT_DB_PATH,
+        ttl: float = DEFAULT_TTL,
+        memory_items: int = MEMORY_ITEMS,
+        disk_items: int = DISK_ITEMS,
+    ):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.memory_items = memory_items
+        self.disk_items = disk_items
+        self._memory: "OrderedDict[str, Tuple[float, str, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "create table if not exists responses ("
+                "key text primary key, created_at real not null, "
+                "response text not null, metadata text not null)"
+            )
+            conn.execute("create index if not exists responses_created_at on responses (created_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path)
+
+    def _remember(self, key: str, created_at: float, response: str, metadata: Dict) -> None:
+        self._memory[key] = (created_at, response, metadata)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Tuple[str, Dict]]:
+        """Return ``(response, metadata)`` for a fresh entry, or ``None``."""
+        oldest_valid = time.time() - self.ttl
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and entry[0] >= oldest_valid:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[1], copy.deepcopy(entry[2])
+            self._memory.pop(key, None)
+
+            with closing(self._connect()) as conn:
+                row = conn.execute(
+                    "select created_at, response, metadata from responses where key = ? and created_at >= ?",
+                    (key, oldest_valid),
+                ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            created_at, response, metadata = row[0], row[1], json.loads(row[2])
+            self._remember(key, created_at, response, metadata)
+            self.stats["disk_hits"] += 1
+            return response, copy.deepcopy(metadata)
+
+    def put(self, key: str, response: str, metadata: Dict) -> None:
+        """Store a response in both tiers and evict expired or excess entries."""
+        now = time.time()
+        with self._lock:
+            # Keep a private copy, as the SQLite tier does; callers go on to mutate theirs
+            self._remember(key, now, response, copy.deepcopy(metadata))
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "insert or replace into responses (key, created_at, response, metadata) values (?, ?, ?, ?)",
+                    (key, now, response, json.dumps(metadata, default=str)),
+                )
+                conn.execute("delete from responses where created_at < ?", (now - self.ttl,))
+                conn.execute(
+                    "delete from responses where key in ("
+                    "select key from responses order by created_at desc limit -1 offset ?)",
+                    (self.disk_items,),
+                )
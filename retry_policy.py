@@ -0,0 +1,224 @@
+"""
+Retries for OpenAI calls.
+
+Transient failures (429, 408/409, 5xx, timeouts and dropped connections) are
+retried with capped exponential backoff and full jitter, waiting at least as
+long as the server's ``Retry-After`` asks. Every call has an overall deadline
+that also bounds each attempt's timeout. A circuit breaker shared by the
+process stops sending requests for a while after repeated failures, so an
+outage fails fast instead of stalling every session.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+
+import openai
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the API while the circuit breaker is open"""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"OpenAI is unavailable after repeated failures; retrying in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether ``error`` is worth retrying."""
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        # An exhausted quota also comes back as 429 but will not clear by waiting
+        if getattr(error, "code", None) == "insufficient_quota":
+            return False
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds the server asked us to wait, from ``retry-after-ms`` or ``Retry-After``."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        if value.strip().isdigit():
+            return float(value)
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures for ``reset_timeout`` seconds.
+
+    Once the timeout passes a single trial call is let through; its outcome
+    closes the circuit again or re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half-open"
+
+    def before_call(self) -> bool:
+        """Raise CircuitOpenError if calls are blocked; returns True if this call is the trial."""
+        with self._lock:
+            if self.opened_at is None:
+                return False
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            if remaining > 0 or self.trial_running:
+                raise CircuitOpenError(max(remaining, 0.0))
+            self.trial_running = True
+            return True
+
+    def release_trial(self) -> None:
+        """Let a new trial through after one ended without an outcome, e.g. when it was cancelled."""
+        with self._lock:
+            self.trial_running = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+
+class RetryPolicy:
+    """Backoff, jitter and deadline settings for one kind of call"""
+
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        deadline: float = 90.0,
+        attempt_timeout: float = 60.0,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        """Full-jitter delay before retry number ``attempt``, never shorter than Retry-After."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        server_delay = retry_after(error)
+        if server_delay is not None:
+            delay = max(delay, server_delay)
+        return delay
+
+    def _attempt_timeout(self, started: float) -> float:
+        remaining = self.deadline - (time.monotonic() - started)
+        return max(1.0, min(self.attempt_timeout, remaining))
+
+    def _failed(self, error: Exception, attempt: int, started: float, breaker: Optional[CircuitBreaker]) -> float:
+        """Record a failed attempt; return the delay before the next one or re-raise ``error``."""
+        transient = is_transient(error)
+        if breaker and transient:
+            breaker.record_failure()
+        elif breaker:
+            # The API answered; the request itself was bad
+            breaker.record_success()
+        if not transient or attempt >= self.max_attempts:
+            raise error
+        delay = self.backoff(attempt, error)
+        if time.monotonic() - started + delay >= self.deadline:
+            raise error
+        return delay
+
+    def call(
+        self,
+        fn: Callable,
+        *args,
+        breaker: Optional[CircuitBreaker] = None,
+        on_retry: Optional[Callable[[int, float, Exception], None]] = None,
+        **kwargs,
+    ):
+        """Call ``fn(*args, timeout=..., **kwargs)`` until it succeeds or the policy gives up.
+
+        ``on_retry(attempt, delay, error)`` runs before each wait. The last
+        error is re-raised when attempts or the deadline run out.
+        """
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            trial = breaker.before_call() if breaker else False
+            try:
+                result = fn(*args, timeout=self._attempt_timeout(started), **kwargs)
+            except Exception as e:
+                attempt += 1
+                delay = self._failed(e, attempt, started, breaker)
+                if on_retry:
+                    on_retry(attempt, delay, e)
+                time.sleep(delay)
+                continue
+            except BaseException:
+                # Interrupted (a Streamlit rerun or stop): no verdict on the API, so don't hold the trial
+                if trial:
+                    breaker.release_trial()
+                raise
+            if breaker:
+                breaker.record_success()
+            return result
+
+    async def call_async(
+        self,
+        fn: Callable,
+        *args,
+        breaker: Optional[CircuitBreaker] = None,
+        on_retry: Optional[Callable[[int, float, Exception], None]] = None,
+        **kwargs,
+    ):
+        """Same as ``call`` for coroutine functions such as ``AsyncOpenAI`` methods."""
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            trial = breaker.before_call() if breaker else False
+            try:
+                result = await fn(*args, timeout=self._attempt_timeout(started), **kwargs)
+            except Exception as e:
+                attempt += 1
+                delay = self._failed(e, attempt, started, breaker)
+                if on_retry:
+                    on_retry(attempt, delay, e)
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelled (asyncio.CancelledError) or interrupted
+                if trial:
+                    breaker.release_trial()
+                raise
+            if breaker:
+                breaker.record_success()
+            return result
@@ -0,0 +1,241 @@
+"""
+Local daily rollups for the analytics dashboard.
+
+Per-day signups, plan creations (by plan name and status) and role changes
+are kept in a SQLite file. ``refresh`` only reads rows created at or after
+the stored high-water mark, so chart queries cost depends on the date range
+shown rather than on the size of the Supabase tables. Rows are paged by
+``(created_at, id)`` and rows sharing the high-water timestamp are
+deduplicated by id, so none is skipped or counted twice.
+"""
+
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import closing
+from datetime import date, datetime, timezone
+from typing import Callable, Dict, Hashable, Iterator, List, Optional, Set, Tuple
+
+import pandas as pd
+
+DEFAULT_DB_PATH = "analytics_rollup.db"
+
+# Rows fetched per request while catching up from the high-water mark
+REFRESH_PAGE_SIZE = 1000
+
+_lock = threading.Lock()
+
+_SCHEMA = """
+create table if not exists watermarks (
+    source text primary key,
+    high_water text not null
+);
+create table if not exists watermark_ids (
+    source text not null,
+    id text not null,
+    primary key (source, id)
+);
+create table if not exists daily_signups (
+    day text primary key,
+    signups integer not null
+);
+create table if not exists daily_plans (
+    day text not null,
+    plan_name text not null,
+    status text not null,
+    created integer not null,
+    primary key (day, plan_name, status)
+);
+create table if not exists daily_role_changes (
+    day text not null,
+    role text not null,
+    changes integer not null,
+    primary key (day, role)
+);
+"""
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _instant(timestamp: str) -> datetime:
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+
+
+def _watermark(conn: sqlite3.Connection, source: str) -> Tuple[Optional[str], Set[str]]:
+    """High-water timestamp and the ids of the rows at it that are already counted."""
+    row = conn.execute("select high_water from watermarks where source = ?", (source,)).fetchone()
+    ids = {r[0] for r in conn.execute("select id from watermark_ids where source = ?", (source,))}
+    return (row[0] if row else None), ids
+
+
+def _set_watermark(conn: sqlite3.Connection, source: str, high_water: str, ids: Set[str]) -> None:
+    conn.execute(
+        "insert into watermarks (source, high_water) values (?, ?) "
+        "on conflict(source) do update set high_water = excluded.high_water",
+        (source, high_water),
+    )
+    conn.execute("delete from watermark_ids where source = ?", (source,))
+    conn.executemany("insert into watermark_ids (source, id) values (?, ?)", [(source, i) for i in ids])
+
+
+def _new_rows(supabase, table: str, columns: str, since: Optional[str]) -> Iterator[Dict]:
+    """Yield rows created at or after ``since``, oldest first, keyset-paged by ``(created_at, id)``."""
+    cursor = None
+    while True:
+        query = supabase.table(table).select(f"id, {columns}").order("created_at").order("id")
+        if cursor:
+            created_at, row_id = cursor
+            query = query.or_(f'created_at.gt."{created_at}",and(created_at.eq."{created_at}",id.gt.{row_id})')
+        elif since:
+            query = query.gte("created_at", since)
+        rows = query.limit(REFRESH_PAGE_SIZE).execute().data or []
+        yield from rows
+        if len(rows) < REFRESH_PAGE_SIZE:
+            return
+        cursor = (rows[-1]["created_at"], rows[-1]["id"])
+
+
+def _fetch_source(supabase, table: str, columns: str, key: Callable[[Dict], Hashable], since: Optional[str]) -> List[Tuple]:
+    """``(created_at, id, key)`` for every row from ``since`` on; runs outside the lock."""
+    return [
+        (row["created_at"], str(row["id"]), key(row))
+        for row in _new_rows(supabase, table, columns, since)
+        if row.get("created_at")
+    ]
+
+
+def _fold_source(conn: sqlite3.Connection, table: str, rows: List[Tuple]) -> Counter:
+    """Count the rows not counted yet and advance the watermark past them.
+
+    Checked against the watermark as it is now, so rows another refresh
+    folded in meanwhile are skipped.
+    """
+    high_water, seen = _watermark(conn, table)
+    counts: Counter = Counter()
+    new_high, new_seen = high_water, set(seen)
+    for created_at, row_id, key in rows:
+        if high_water:
+            instant, mark = _instant(created_at), _instant(high_water)
+            if instant < mark or (instant == mark and row_id in seen):
+                continue
+        counts[key] += 1
+        if new_high is None or _instant(created_at) > _instant(new_high):
+            new_high, new_seen = created_at, {row_id}
+        elif _instant(created_at) == _instant(new_high):
+            new_seen.add(row_id)
+    if counts:
+        _set_watermark(conn, table, new_high, new_seen)
+    return counts
+
+
+def refresh(supabase, db_path: str = DEFAULT_DB_PATH) -> Dict[str, int]:
+    """Fold rows created since the last refresh into the rollup tables.
+
+    Returns the number of new signups and plans that were added.
+    """
+    with _lock, closing(_connect(db_path)) as conn:
+        signups_since, _ = _watermark(conn, "user_profiles")
+        plans_since, _ = _watermark(conn, "user_plans")
+
+    # Network reads happen without the lock so chart readers aren't blocked
+    signup_rows = _fetch_source(
+        supabase, "user_profiles", "created_at", lambda r: r["created_at"][:10], signups_since
+    )
+    plan_rows = _fetch_source(
+        supabase,
+        "user_plans",
+        "created_at, plan_name, status",
+        lambda r: (r["created_at"][:10], r.get("plan_name") or "Unknown", r.get("status") or "unknown"),
+        plans_since,
+    )
+
+    with _lock, closing(_connect(db_path)) as conn, conn:
+        signups = _fold_source(conn, "user_profiles", signup_rows)
+        conn.executemany(
+            "insert into daily_signups (day, signups) values (?, ?) "
+            "on conflict(day) do update set signups = signups + excluded.signups",
+            list(signups.items()),
+        )
+
+        plans = _fold_source(conn, "user_plans", plan_rows)
+        conn.executemany(
+            "insert into daily_plans (day, plan_name, status, created) values (?, ?, ?, ?) "
+            "on conflict(day, plan_name, status) do update set created = created + excluded.created",
+            [(day, plan_name, status, n) for (day, plan_name, status), n in plans.items()],
+        )
+    return {"signups": sum(signups.values()), "plans": sum(plans.values())}
+
+
+def record_role_changes(role: str, count: int = 1, db_path: str = DEFAULT_DB_PATH) -> None:
+    """Add ``count`` role changes to ``role`` for today. Called by the write paths."""
+    if count <= 0:
+        return
+    with _lock, closing(_connect(db_path)) as conn, conn:
+        conn.execute(
+            "insert into daily_role_changes (day, role, changes) values (?, ?, ?) "
+            "on conflict(day, role) do update set changes = changes + excluded.changes",
+            (datetime.now(timezone.utc).date().isoformat(), role, count),
+        )
+
+
+def _range_args(start: Optional[date], end: Optional[date]) -> Tuple[str, str]:
+    return (start.isoformat() if start else "0000-00-00", end.isoformat() if end else "9999-99-99")
+
+
+def daily_signups(start: date, end: date, db_path: str = DEFAULT_DB_PATH) -> pd.DataFrame:
+    """Daily registrations between ``start`` and ``end`` inclusive, zero-filled."""
+    with _lock, closing(_connect(db_path)) as conn:
+        rows = conn.execute(
+            "select day, signups from daily_signups where day between ? and ? order by day",
+            _range_args(start, end),
+        ).fetchall()
+    series = pd.Series(
+        [n for _, n in rows],
+        index=pd.to_datetime([day for day, _ in rows]),
+        dtype="int64",
+    )
+    series = series.reindex(pd.date_range(start, end, freq="D"), fill_value=0)
+    return series.rename_axis("Date").reset_index(name="Registrations")
+
+
+def signup_total(start: Optional[date] = None, end: Optional[date] = None, db_path: str = DEFAULT_DB_PATH) -> int:
+    """Total registrations between ``start`` and ``end`` inclusive."""
+    with _lock, closing(_connect(db_path)) as conn:
+        row = conn.execute(
+            "select coalesce(sum(signups), 0) from daily_signups where day between ? and ?",
+            _range_args(start, end),
+        ).fetchone()
+    return row[0]
+
+
+def plan_creations(
+    group_by: str = "plan_name",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db_path: str = DEFAULT_DB_PATH,
+) -> Dict[str, int]:
+    """Plans created in the range, grouped by ``plan_name`` or ``status``."""
+    if group_by not in ("plan_name", "status"):
+        raise ValueError(f"Cannot group plan creations by {group_by!r}")
+    with _lock, closing(_connect(db_path)) as conn:
+        rows = conn.execute(
+            f"select {group_by}, sum(created) from daily_plans "
+            f"where day between ? and ? group by {group_by} order by {group_by}",
+            _range_args(start, end),
+        ).fetchall()
+    return dict(rows)
+
+
+def role_changes(start: Optional[date] = None, end: Optional[date] = None, db_path: str = DEFAULT_DB_PATH) -> Dict[str, int]:
+    """Role changes recorded in the range, per target role."""
+    with _lock, closing(_connect(db_path)) as conn:
+        rows = conn.execute(
+            "select role, sum(changes) from daily_role_changes "
+            "where day between ? and ? group by role order by role",
+            _range_args(start, end),
+        ).fetchall()
+    return dict(rows)
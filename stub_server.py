@@ -0,0 +1,490 @@
+"""
+Stand-in for Ollama and the OpenAI API, for offline load and latency tests.
+
+Serves the Ollama endpoints the course apps use (``/api/generate``,
+``/api/chat``, ``/api/tags``, ``/api/ps``) and OpenAI-compatible
+``/v1/chat/completions`` and ``/v1/images/generations`` from one port.
+Replies are made-up text streamed at a fixed token rate after a set
+latency, and a share of requests can be failed with 429/5xx and
+``Retry-After`` to exercise retries. Given a seed, runs are reproducible.
+
+    python stub_server.py --tokens-per-second 30 --latency 0.5 --error-rate 0.1
+
+then point the apps at it:
+
+    OLLAMA_HOST=http://localhost:11434
+    OPENAI_BASE_URL=http://localhost:11434/v1 OPENAI_API_KEY=stub
+"""
+
+import argparse
+import base64
+import json
+import random
+import re
+import struct
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_PORT = 11434
+
+# Reply speed: seconds before the first token, then tokens per second
+LATENCY = 0.2
+TOKENS_PER_SECOND = 50.0
+
+# Reply length when the request doesn't set max_tokens / num_predict
+REPLY_TOKENS = 64
+
+# Installed models reported by /api/tags, with their size in bytes
+STUB_MODELS = {
+    "llama3.2:3b": 2_000_000_000,
+    "mistral:7b": 4_100_000_000,
+    "codellama:7b": 3_800_000_000,
+}
+
+WORDS = (
+    "the model reads your prompt and answers with a short stub reply that streams "
+    "at a steady pace so latency throughput and retries can be measured offline"
+).split()
+
+
+class StubConfig:
+    """How the stub replies: speed, length, models and injected errors"""
+
+    def __init__(
+        self,
+        latency: float = LATENCY,
+        jitter: float = 0.0,
+        tokens_per_second: float = TOKENS_PER_SECOND,
+        reply_tokens: int = REPLY_TOKENS,
+        load_time: float = 0.0,
+        error_rate: float = 0.0,
+        error_statuses: Tuple[int, ...] = (429,),
+        retry_after: float = 1.0,
+        models: Optional[Dict[str, int]] = None,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.load_time = load_time
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.retry_after = retry_after
+        self.models = models or dict(STUB_MODELS)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        # Ollama models "in memory": name -> expiry time
+        self.loaded: Dict[str, datetime] = {}
+
+    def roll(self) -> Tuple[Optional[int], float]:
+        """Injected error status for this request, if any, and its latency."""
+        with self.lock:
+            status = None
+            if self.random.random() < self.error_rate:
+                status = self.random.choice(self.error_statuses)
+            return status, self.latency + self.random.uniform(0, self.jitter)
+
+
+_DURATION_UNITS = {"ns": 1e-9, "us": 1e-6, "µs": 1e-6, "ms": 1e-3, "s": 1, "m": 60, "h": 3600}
+_DURATION_PART = re.compile(r"(\d+(?:\.\d*)?|\.\d+)(ns|us|µs|ms|s|m|h)")
+
+
+def _keep_alive_seconds(value) -> float:
+    """Ollama keep_alive in seconds; negative keeps the model loaded forever.
+
+    Numbers are seconds. Strings are Go durations (``"5m"``, ``"1h30m"``,
+    ``"-1m"``) and, as in Ollama, need a unit: ``"-1"`` raises ValueError.
+    """
+    if value is None:
+        return 300.0
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if not isinstance(value, str):
+        raise ValueError(f"invalid keep_alive {value!r}")
+    sign, rest = (-1, value[1:]) if value[:1] == "-" else (1, value.lstrip("+"))
+    if rest == "0":
+        return 0.0
+    parts = _DURATION_PART.findall(rest)
+    if not parts or "".join(number + unit for number, unit in parts) != rest:
+        raise ValueError(f'time: missing unit in duration "{value}"')
+    return sign * sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def count_tokens(text: str) -> int:
+    # Same rough measure as document_analysis uses offline
+    return max(1, len(text) // 4)
+
+
+def reply_tokens(prompt: str, limit: int) -> List[str]:
+    """Deterministic reply for ``prompt``: it echoes the prompt's start, then filler."""
+    echo = prompt.split()[:8]
+    words = ["Stub", "reply", "to:"] + echo
+    while len(words) < limit:
+        words.append(WORDS[len(words) % len(WORDS)])
+    words = words[:limit]
+    return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+
+def solid_png(width: int, height: int, rgb: Tuple[int, int, int]) -> bytes:
+    """A one-colour PNG, built with zlib so no imaging library is needed."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    row = b"\x00" + bytes(rgb) * width
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(row * height))
+        + chunk(b"IEND", b"")
+    )
+
+
+def _image_params(prompt: str, size: str) -> Tuple[int, int, str]:
+    width, _, height = size.partition("x")
+    color = zlib.crc32(prompt.encode()) & 0xFFFFFF
+    return int(width), int(height or width), f"{color:06x}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Routes Ollama and OpenAI requests to made-up, paced replies"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "StubServer/1.0"
+    config: StubConfig
+    quiet = False
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    # ---- Responses -------------------------------------------------------
+
+    def _send_json(self, status: int, body: Dict, headers: Optional[Dict] = None) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _start_stream(self, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _end_stream(self) -> None:
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _paced(self, tokens: List[str]) -> Iterator[str]:
+        delay = 1 / self.config.tokens_per_second if self.config.tokens_per_second > 0 else 0
+        for i, token in enumerate(tokens):
+            if i and delay:
+                time.sleep(delay)
+            yield token
+
+    def _inject_error(self, openai: bool) -> bool:
+        """Fail this request if the dice say so; otherwise wait out its latency."""
+        status, latency = self.config.roll()
+        if status is None:
+            time.sleep(latency)
+            return False
+        retry_after = self.config.retry_after
+        headers = {"Retry-After": f"{retry_after:g}", "retry-after-ms": str(int(retry_after * 1000))}
+        message = "Rate limit reached (injected by stub server)" if status == 429 else "Injected stub server error"
+        if openai:
+            body = {"error": {"message": message, "type": "rate_limit_error" if status == 429 else "server_error", "code": None}}
+        else:
+            body = {"error": message}
+        self._send_json(status, body, headers)
+        return True
+
+    # ---- Routing ---------------------------------------------------------
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json(200, {"models": [
+                {"name": name, "model": name, "size": size} for name, size in self.config.models.items()
+            ]})
+        elif self.path == "/api/ps":
+            self._send_json(200, {"models": self._running()})
+        elif self.path == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [
+                {"id": name, "object": "model", "owned_by": "stub"} for name in self.config.models
+            ]})
+        elif self.path.startswith("/images/"):
+            self._image_file()
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": "Request body is not valid JSON"})
+            return
+
+        routes = {
+            "/api/generate": self._ollama_generate,
+            "/api/chat": self._ollama_chat,
+            "/v1/chat/completions": self._openai_chat,
+            "/v1/images/generations": self._openai_image,
+        }
+        route = routes.get(self.path)
+        if route is None:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            route(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # Client gave up mid-stream, e.g. a timeout under test
+            self.close_connection = True
+
+    # ---- Ollama ----------------------------------------------------------
+
+    def _running(self) -> List[Dict]:
+        now = datetime.now(timezone.utc)
+        with self.config.lock:
+            for name in [name for name, expires in self.config.loaded.items() if expires <= now]:
+                del self.config.loaded[name]
+            return [
+                {
+                    "name": name,
+                    "model": name,
+                    "size": self.config.models.get(name, 0),
+                    "size_vram": 0,
+                    "expires_at": expires.isoformat(),
+                }
+                for name, expires in self.config.loaded.items()
+            ]
+
+    def _ollama_load(self, model: str, seconds: float) -> float:
+        """Mark ``model`` loaded for ``seconds`` of keep_alive; returns the load time spent."""
+        with self.config.lock:
+            cold = model not in self.config.loaded
+            if seconds == 0:
+                self.config.loaded.pop(model, None)
+                return 0.0
+            # A negative keep_alive keeps the model loaded indefinitely
+            expires = timedelta(days=3650) if seconds < 0 else timedelta(seconds=seconds)
+            self.config.loaded[model] = datetime.now(timezone.utc) + expires
+        if cold and self.config.load_time:
+            time.sleep(self.config.load_time)
+            return self.config.load_time
+        return 0.0
+
+    def _ollama_reply(self, body: Dict, prompt: str, chat: bool) -> None:
+        model = body.get("model", "")
+        if model not in self.config.models:
+            self._send_json(404, {"error": f"model '{model}' not found, try pulling it first"})
+            return
+        if self._inject_error(openai=False):
+            return
+
+        try:
+            keep_alive = _keep_alive_seconds(body.get("keep_alive"))
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        started = time.perf_counter()
+        load_time = self._ollama_load(model, keep_alive)
+        created_at = datetime.now(timezone.utc).isoformat()
+        if not prompt and not chat:
+            # No prompt: only load or unload the model
+            self._send_json(200, {"model": model, "created_at": created_at, "response": "", "done": True,
+                                  "done_reason": "unload" if keep_alive == 0 else "load"})
+            return
+
+        limit = (body.get("options") or {}).get("num_predict") or self.config.reply_tokens
+        tokens = reply_tokens(prompt, limit)
+
+        def chunk(text: str, done: bool) -> Dict:
+            if chat:
+                return {"model": model, "created_at": created_at, "message": {"role": "assistant", "content": text}, "done": done}
+            return {"model": model, "created_at": created_at, "response": text, "done": done}
+
+        eval_started = time.perf_counter()
+        if body.get("stream", True):
+            self._start_stream("application/x-ndjson")
+            for token in self._paced(tokens):
+                self._write_chunk((json.dumps(chunk(token, False)) + "\n").encode())
+            final = chunk("", True)
+        else:
+            for _ in self._paced(tokens):
+                pass
+            final = chunk("".join(tokens), True)
+
+        final.update({
+            "done_reason": "stop",
+            "total_duration": int((time.perf_counter() - started) * 1e9),
+            "load_duration": int(load_time * 1e9),
+            "prompt_eval_count": count_tokens(prompt),
+            "eval_count": len(tokens),
+            "eval_duration": int((time.perf_counter() - eval_started) * 1e9),
+        })
+        if body.get("stream", True):
+            self._write_chunk((json.dumps(final) + "\n").encode())
+            self._end_stream()
+        else:
+            self._send_json(200, final)
+
+    def _ollama_generate(self, body: Dict) -> None:
+        self._ollama_reply(body, body.get("prompt", ""), chat=False)
+
+    def _ollama_chat(self, body: Dict) -> None:
+        messages = body.get("messages") or []
+        self._ollama_reply(body, messages[-1].get("content", "") if messages else "", chat=True)
+
+    # ---- OpenAI ----------------------------------------------------------
+
+    def _openai_chat(self, body: Dict) -> None:
+        if self._inject_error(openai=True):
+            return
+
+        messages = body.get("messages") or []
+        prompt = messages[-1].get("content", "") if messages else ""
+        prompt_tokens = sum(count_tokens(str(m.get("content", ""))) for m in messages)
+        limit = body.get("max_completion_tokens") or body.get("max_tokens") or self.config.reply_tokens
+        tokens = reply_tokens(prompt if isinstance(prompt, str) else "", limit)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens), "total_tokens": prompt_tokens + len(tokens)}
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex[:24]}", "created": int(time.time()), "model": body.get("model", "stub")}
+
+        if not body.get("stream"):
+            for _ in self._paced(tokens):
+                pass
+            self._send_json(200, {
+                **base,
+                "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        def event(choices: List[Dict], **extra) -> bytes:
+            return f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': choices, **extra})}\n\n".encode()
+
+        self._start_stream("text/event-stream")
+        self._write_chunk(event([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]))
+        for token in self._paced(tokens):
+            self._write_chunk(event([{"index": 0, "delta": {"content": token}, "finish_reason": None}]))
+        self._write_chunk(event([{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            self._write_chunk(event([], usage=usage))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._end_stream()
+
+    def _openai_image(self, body: Dict) -> None:
+        if self._inject_error(openai=True):
+            return
+
+        try:
+            width, height, color = _image_params(body.get("prompt", ""), body.get("size", "1024x1024"))
+        except ValueError:
+            self._send_json(400, {"error": {"message": f"Invalid size {body.get('size')!r}", "type": "invalid_request_error", "code": None}})
+            return
+        images = []
+        for _ in range(body.get("n") or 1):
+            if body.get("response_format") == "b64_json":
+                data = solid_png(width, height, tuple(bytes.fromhex(color)))
+                images.append({"b64_json": base64.b64encode(data).decode()})
+            else:
+                host = self.headers.get("Host", f"localhost:{self.server.server_port}")
+                images.append({"url": f"http://{host}/images/{width}x{height}/{color}.png"})
+        self._send_json(200, {"created": int(time.time()), "data": images})
+
+    def _image_file(self) -> None:
+        # /images/<width>x<height>/<rrggbb>.png
+        try:
+            size, name = self.path[len("/images/"):].split("/")
+            width, height = (int(n) for n in size.split("x"))
+            rgb = tuple(bytes.fromhex(name[:-len(".png")]))
+            if len(rgb) != 3 or not (0 < width <= 4096 and 0 < height <= 4096):
+                raise ValueError
+        except ValueError:
+            self._send_json(404, {"error": f"Unknown image {self.path}"})
+            return
+        data = solid_png(width, height, rgb)
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_server(config: StubConfig, host: str = "127.0.0.1", port: int = DEFAULT_PORT, quiet: bool = False) -> ThreadingHTTPServer:
+    """An HTTP server answering with ``config``; port 0 picks a free port."""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": config, "quiet": quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start(config: Optional[StubConfig] = None, port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Serve on a background thread, for benchmarks and scripts; returns the server and its URL."""
+    server = make_server(config or StubConfig(), port=port, quiet=True)
+    threading.Thread(target=server.serve_forever, name="stub-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stand-in Ollama and OpenAI server for offline testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=float, default=LATENCY, help="seconds before the first token")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra latency, up to this many seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=TOKENS_PER_SECOND, help="0 streams as fast as possible")
+    parser.add_argument("--reply-tokens", type=int, default=REPLY_TOKENS, help="reply length when the request sets none")
+    parser.add_argument("--load-time", type=float, default=0.0, help="seconds to 'load' an Ollama model that isn't loaded")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests to fail, 0 to 1")
+    parser.add_argument("--error-status", default="429", help="comma-separated statuses to fail with, e.g. 429,500,503")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with injected errors")
+    parser.add_argument("--models", help="comma-separated Ollama model names to report as installed")
+    parser.add_argument("--seed", type=int, help="seed for reproducible latency jitter and errors")
+    parser.add_argument("--quiet", action="store_true", help="don't log each request")
+    args = parser.parse_args()
+
+    models = None
+    if args.models:
+        models = {name.strip(): STUB_MODELS.get(name.strip(), 4_000_000_000) for name in args.models.split(",")}
+    config = StubConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        tokens_per_second=args.tokens_per_second,
+        reply_tokens=args.reply_tokens,
+        load_time=args.load_time,
+        error_rate=args.error_rate,
+        error_statuses=tuple(int(status) for status in args.error_status.split(",")),
+        retry_after=args.retry_after,
+        models=models,
+        seed=args.seed,
+    )
+    server = make_server(config, args.host, args.port, args.quiet)
+    print(f"🧪 Stub Ollama/OpenAI server on http://{args.host}:{server.server_port}")
+    print(f"   OLLAMA_HOST=http://{args.host}:{server.server_port}")
+    print(f"   OPENAI_BASE_URL=http://{args.host}:{server.server_port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+# The app modules live at the repository root, next to this directory
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def aivas():
+    """The AI assistants page as a module; outside ``streamlit run`` Streamlit calls are no-ops."""
+    for name in ("streamlit", "openai", "plotly", "PIL"):
+        pytest.importorskip(name)
+    path = os.path.join(ROOT, "pages", "AIVAs.py")
+    spec = importlib.util.spec_from_file_location("aivas", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
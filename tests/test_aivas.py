@@ -0,0 +1,199 @@
+from types import SimpleNamespace
+
+import pytest
+
+from rate_limiter import ANONYMOUS_USER, RateLimiter
+from retry_policy import CircuitBreaker
+
+LIMITS = {"requests_per_minute": 100, "tokens_per_hour": 100000, "images_per_hour": 10}
+
+
+def chunk(text=None, usage=None):
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=text))] if text is not None else []
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class FakeOpenAI:
+    """Streams ``chunks`` from chat.completions.create"""
+
+    def __init__(self, chunks):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=lambda **kwargs: iter(chunks)))
+
+
+@pytest.fixture
+def chat_manager(aivas, monkeypatch):
+    limiter = RateLimiter(LIMITS, LIMITS, LIMITS)
+    monkeypatch.setattr(aivas, "get_rate_limiter", lambda: limiter)
+    monkeypatch.setattr(aivas, "get_circuit_breaker", CircuitBreaker)
+    manager = aivas.EnhancedChatManager()
+    manager.api_key = "sk-test"
+    manager.limiter = limiter
+    return manager
+
+
+def tokens_left(manager):
+    return manager.limiter.user_buckets[ANONYMOUS_USER]["tokens"].tokens
+
+
+def test_finished_stream_is_charged_its_real_usage(chat_manager):
+    usage = SimpleNamespace(prompt_tokens=12, completion_tokens=3)
+    chat_manager.client = FakeOpenAI([chunk("Hello"), chunk(" there"), chunk(usage=usage)])
+
+    reply = "".join(chat_manager.stream_response([{"role": "user", "content": "hi"}], input_tokens=10))
+
+    assert reply == "Hello there"
+    assert tokens_left(chat_manager) == pytest.approx(100000 - 15, abs=1)
+    assert chat_manager.last_metadata["total_tokens"] == 15
+
+
+def test_stream_stopped_midway_gives_back_its_reservation(chat_manager):
+    chat_manager.client = FakeOpenAI([chunk("Hello"), chunk(" there")])
+    stream = chat_manager.stream_response([{"role": "user", "content": "hi"}], input_tokens=10)
+
+    assert next(stream) == "Hello"
+    # A Streamlit rerun or stop closes the generator with a BaseException
+    stream.close()
+
+    used = chat_manager.token_manager.count_tokens("Hello")
+    assert tokens_left(chat_manager) == pytest.approx(100000 - used, abs=1)
+
+
+def message(message_id, words=10, role="user"):
+    return {"id": message_id, "role": role, "content": "word " * words, "timestamp": "12:00", "bot": "Strategist"}
+
+
+@pytest.fixture
+def token_manager(aivas):
+    manager = aivas.TokenManager()
+    manager.encoded = []
+    count_tokens = manager.count_tokens
+
+    def counting(text):
+        manager.encoded.append(text)
+        return count_tokens(text)
+
+    manager.count_tokens = counting
+    return manager
+
+
+def test_stored_messages_are_counted_once_by_id(token_manager):
+    history = [message(1), message(2, 30)]
+
+    first = token_manager.history_total(history)
+    assert first == token_manager.count_tokens("word " * 10) + token_manager.count_tokens("word " * 30)
+    encoded = len(token_manager.encoded)
+
+    assert token_manager.history_total(history) == first
+    assert token_manager.count_messages_tokens(history) == first
+    assert len(token_manager.encoded) == encoded
+
+
+def test_history_total_counts_only_appended_messages(token_manager):
+    history = [message(i) for i in range(1, 6)]
+    expected = token_manager.history_total(history) + token_manager.count_tokens("word " * 20)
+    token_manager.encoded.clear()
+
+    history.append(message(6, 20))
+
+    assert token_manager.history_total(history) == expected
+    assert token_manager.encoded == ["word " * 20]
+
+
+def test_forget_messages_takes_trimmed_messages_out_of_the_total(token_manager):
+    history = [message(i, 10 * i) for i in range(1, 5)]
+    token_manager.history_total(history)
+
+    dropped, history = history[:2], history[2:]
+    token_manager.forget_messages(dropped)
+
+    assert token_manager.history_tokens == sum(token_manager.message_tokens.values())
+    assert set(token_manager.message_tokens) == {3, 4}
+    assert token_manager.history_total(history) == token_manager.count_messages_tokens(history)
+
+
+def test_history_replaced_elsewhere_is_totalled_again(token_manager):
+    token_manager.history_total([message(1), message(2)])
+
+    other = [message(10, 40), message(11, 5)]
+
+    assert token_manager.history_total(other) == token_manager.count_tokens("word " * 40) + token_manager.count_tokens("word " * 5)
+    assert set(token_manager.message_tokens) == {10, 11}
+
+
+def test_messages_without_an_id_are_not_memoized(token_manager):
+    assert token_manager.count_message_tokens({"role": "system", "content": "word " * 8}) > 0
+    assert token_manager.message_tokens == {} and token_manager.history_tokens == 0
+
+
+@pytest.fixture
+def budgeter(aivas, token_manager):
+    return aivas.ContextBudgeter(token_manager, max_messages=50)
+
+
+def test_budget_is_the_model_window_minus_the_reply_reserve(aivas, budgeter):
+    assert budgeter.budget_for("gpt-4") == 8192 - aivas.RESPONSE_TOKEN_RESERVE
+    assert budgeter.budget_for("gpt-4-turbo") == 128000 - aivas.RESPONSE_TOKEN_RESERVE
+    assert budgeter.budget_for("unknown-model") == 8192 - aivas.RESPONSE_TOKEN_RESERVE
+
+
+def test_history_within_the_budget_is_sent_as_is(budgeter):
+    history = [message(1), message(2, role="assistant"), message(3)]
+
+    messages, report = budgeter.build("Be brief", history, "gpt-4")
+
+    assert messages == [{"role": "system", "content": "Be brief"}] + [
+        {"role": msg["role"], "content": msg["content"]} for msg in history
+    ]
+    assert report["context_messages_dropped"] == 0
+    assert report["context_tokens_saved"] == 0
+
+
+def test_long_history_is_trimmed_to_the_gpt_4_budget(budgeter, token_manager):
+    history = [message(i, 1500, "user" if i % 2 else "assistant") for i in range(1, 11)]
+    budget = budgeter.budget_for("gpt-4")
+
+    messages, report = budgeter.build("Be brief", history, "gpt-4")
+
+    system, note, kept = messages[0], messages[1], messages[2:]
+    dropped = report["context_messages_dropped"]
+    assert dropped == len(history) - len(kept) > 0
+    assert note == {
+        "role": "system",
+        "content": f"Note: {dropped} earlier messages of this conversation were omitted to fit the context window."
+    }
+    # The newest turns are kept, and one more would not have fitted
+    assert kept == [{"role": msg["role"], "content": msg["content"]} for msg in history[dropped:]]
+    prompt_tokens = token_manager.count_message_tokens(system) + token_manager.count_messages_tokens(history[dropped:])
+    assert prompt_tokens <= budget
+    assert prompt_tokens + token_manager.count_message_tokens(history[dropped - 1]) > budget
+    assert report["context_tokens"] == prompt_tokens + token_manager.count_message_tokens(note)
+    assert report["context_tokens_saved"] > 0
+
+
+def test_larger_window_keeps_more_of_the_same_history(budgeter):
+    history = [message(i, 1500) for i in range(1, 11)]
+
+    _, gpt_4 = budgeter.build("Be brief", history, "gpt-4")
+    _, turbo = budgeter.build("Be brief", history, "gpt-4-turbo")
+
+    assert gpt_4["context_messages_dropped"] > 0
+    assert turbo["context_messages_dropped"] == 0
+
+
+def test_latest_message_is_kept_even_when_it_alone_is_over_budget(budgeter):
+    history = [message(1), message(2, 40000)]
+
+    messages, report = budgeter.build("Be brief", history, "gpt-4")
+
+    assert messages[-1] == {"role": "user", "content": "word " * 40000}
+    assert report["context_messages_dropped"] == 1
+
+
+def test_only_the_newest_max_messages_are_considered(aivas, token_manager):
+    budgeter = aivas.ContextBudgeter(token_manager, max_messages=3)
+    history = [message(i) for i in range(1, 8)]
+
+    messages, report = budgeter.build("Be brief", history, "gpt-4-turbo")
+
+    assert [msg["content"] for msg in messages[2:]] == [msg["content"] for msg in history[-3:]]
+    assert report["context_messages_dropped"] == 4
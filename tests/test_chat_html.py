@@ -0,0 +1,68 @@
+import re
+import textwrap
+
+import pytest
+
+from chat_html import bubble_html, join_html, meta_html
+
+MULTILINE_REPLY = """Here is a plan:
+
+1. Validate the idea
+
+2. Build the MVP
+
+```python
+def main():
+    return 42
+```
+
+That's it."""
+
+
+def markdown_body(fragments):
+    """The text st.markdown hands to the Markdown renderer."""
+    return textwrap.dedent(join_html(fragments)).strip()
+
+
+def test_markup_lines_start_at_column_zero_after_a_multiline_message():
+    body = markdown_body([
+        bubble_html("user-message", "You:", "How do I start?"),
+        bubble_html("assistant-message", "🚀 Startup Strategist:", MULTILINE_REPLY),
+        meta_html({"cost": 0.0123, "total_tokens": 321, "model": "gpt-4-turbo", "cache_hit": True}),
+        bubble_html("user-message", "You:", "Thanks!"),
+    ])
+
+    markup = [line for line in body.splitlines() if re.match(r"\s*</?(div|strong|span)", line)]
+    assert len(markup) == 10
+    # Indented by four or more spaces after a blank line, Markdown shows these as code
+    assert all(not line.startswith(" ") for line in markup)
+
+
+def test_message_content_is_kept_verbatim():
+    body = markdown_body([bubble_html("assistant-message", "Bot:", MULTILINE_REPLY)])
+
+    assert "    return 42" in body
+    assert body.endswith("</div>")
+
+
+def test_meta_html_shows_optional_details_only_when_set():
+    plain = meta_html({"cost": 0, "total_tokens": 5, "model": "gpt-4"})
+    detailed = meta_html({"cost": 0, "total_tokens": 5, "model": "gpt-4", "first_token_ms": 250, "context_tokens_saved": 40})
+
+    assert "Cached" not in plain and "first token" not in plain
+    assert "250 ms to first token" in detailed and "40 tokens trimmed" in detailed
+    assert "\n" not in detailed
+
+
+def test_multiline_message_renders_no_code_block():
+    markdown_it = pytest.importorskip("markdown_it")
+    body = markdown_body([
+        bubble_html("assistant-message", "Bot:", MULTILINE_REPLY),
+        meta_html({"cost": 0, "total_tokens": 5, "model": "gpt-4"}),
+        bubble_html("user-message", "You:", "Next question"),
+    ])
+
+    html = markdown_it.MarkdownIt("commonmark").render(body)
+
+    assert "&lt;div" not in html
+    assert html.count('<div class="') == 3
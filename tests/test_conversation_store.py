@@ -0,0 +1,89 @@
+import json
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from conversation_store import ConversationStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ConversationStore(str(tmp_path / "conversations.db"))
+
+
+def test_database_runs_in_wal_mode(store):
+    with closing(sqlite3.connect(store.db_path)) as conn:
+        assert conn.execute("pragma journal_mode").fetchone()[0] == "wal"
+    with closing(store._connect()) as conn:
+        # 1 is NORMAL, which is safe with WAL and avoids an fsync per commit
+        assert conn.execute("pragma synchronous").fetchone()[0] == 1
+
+
+def test_messages_round_trip_in_order(store):
+    conversation = store.start_conversation("alice")
+    store.append(conversation, "alice", "Strategist", {"role": "user", "content": "Plan my week"})
+    store.append(conversation, "alice", "Strategist", {
+        "role": "assistant", "content": "Here is a plan", "metadata": {"model": "gpt-4", "tokens": 42},
+    })
+    store.append(conversation, "alice", "Artist", {"role": "assistant", "content": "", "image_url": "https://img/1.png"})
+
+    messages = store.load_page(conversation)
+
+    assert [(m["role"], m["content"], m["bot"]) for m in messages] == [
+        ("user", "Plan my week", "Strategist"),
+        ("assistant", "Here is a plan", "Strategist"),
+        ("assistant", "", "Artist"),
+    ]
+    assert "metadata" not in messages[0] and "image_url" not in messages[0]
+    assert messages[1]["metadata"] == {"model": "gpt-4", "tokens": 42}
+    assert messages[2]["image_url"] == "https://img/1.png"
+
+
+def test_a_new_store_reads_what_an_earlier_one_wrote(store):
+    conversation = store.start_conversation("alice")
+    message_id = store.append(conversation, "alice", "Strategist", {"role": "user", "content": "hi"})
+
+    reopened = ConversationStore(store.db_path)
+
+    assert reopened.latest_conversation("alice") == conversation
+    assert reopened.owns("alice", conversation)
+    assert not reopened.owns("bob", conversation)
+    assert reopened.load_page(conversation) == [{"id": message_id, "role": "user", "content": "hi", "bot": "Strategist"}]
+
+
+def test_latest_conversation_is_the_one_written_to_last(store):
+    first = store.start_conversation("alice")
+    store.start_conversation("alice")
+    store.append(first, "alice", "Strategist", {"role": "user", "content": "back to the first"})
+
+    assert store.latest_conversation("alice") == first
+    assert store.latest_conversation("bob") is None
+
+
+def test_older_messages_are_read_a_page_at_a_time(store):
+    conversation = store.start_conversation("alice")
+    ids = [store.append(conversation, "alice", "Strategist", {"role": "user", "content": str(i)}) for i in range(7)]
+
+    newest = store.load_page(conversation, limit=3)
+    older = store.load_page(conversation, before_id=newest[0]["id"], limit=3)
+
+    assert [m["content"] for m in newest] == ["4", "5", "6"]
+    assert [m["content"] for m in older] == ["1", "2", "3"]
+    assert store.count_before(conversation, older[0]["id"]) == 1
+    assert store.count_before(conversation, ids[0]) == 0
+
+
+def test_export_streams_one_json_line_per_message(store):
+    conversation = store.start_conversation("alice")
+    other = store.start_conversation("bob")
+    store.append(conversation, "alice", "Strategist", {"role": "user", "content": "hi\nthere"})
+    store.append(other, "bob", "Strategist", {"role": "user", "content": "not alice's"})
+    store.append(conversation, "alice", "Strategist", {"role": "assistant", "content": "hello"})
+
+    lines = list(store.export_ndjson(conversation))
+
+    assert all(line.endswith("\n") and line.count("\n") == 1 for line in lines)
+    exported = [json.loads(line) for line in lines]
+    assert [m["content"] for m in exported] == ["hi\nthere", "hello"]
+    assert exported[0]["created_at"] <= exported[1]["created_at"]
@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+from document_analysis import (
+    ANALYSIS_TOKENS,
+    CHUNK_TOKENS,
+    SUMMARY_TOKENS,
+    context_size,
+    count_tokens,
+    map_chunks,
+    reduce_summaries,
+    split_text,
+)
+from ollama_client import OllamaError
+
+
+class FailingSummarizer:
+    """``complete`` fails on the first chunk and is slow on every other one"""
+
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def complete(self, prompt, model, options=None):
+        with self.lock:
+            self.calls += 1
+        if "part 1 of" in prompt:
+            raise OllamaError("model crashed")
+        time.sleep(0.5)
+        return "summary", {}
+
+
+def test_map_chunks_stops_queued_chunks_after_a_failure():
+    client = FailingSummarizer()
+    started = time.perf_counter()
+
+    with pytest.raises(OllamaError):
+        list(map_chunks(client, ["a", "b", "c", "d", "e"], "m", concurrency=1))
+
+    assert client.calls == 1
+    assert time.perf_counter() - started < 0.5
+
+
+class RecordingClient:
+    """Records the options of every request"""
+
+    def __init__(self):
+        self.options = []
+
+    def complete(self, prompt, model, options=None):
+        self.options.append(options)
+        return "summary " * 50, {}
+
+    def generate(self, prompt, model, options=None):
+        self.options.append(options)
+        return prompt
+
+
+@pytest.mark.parametrize("chunk_tokens", [500, CHUNK_TOKENS, 8000])
+def test_every_request_of_an_analysis_sets_one_num_ctx_that_fits_a_chunk(chunk_tokens):
+    client = RecordingClient()
+    text = "\n\n".join(f"Paragraph {i}. " + "word " * 200 for i in range(60))
+    chunks = split_text(text, chunk_tokens)
+
+    summaries = [summary for _, summary in map_chunks(client, chunks, "m", chunk_tokens=chunk_tokens)]
+    reduce_summaries(client, summaries, "m", chunk_tokens=chunk_tokens)
+
+    num_ctx = {options["num_ctx"] for options in client.options}
+    assert len(num_ctx) == 1
+    assert num_ctx.pop() >= max(count_tokens(chunk) for chunk in chunks) + SUMMARY_TOKENS
+    # Map and collapse requests, then the final analysis
+    assert {options["num_predict"] for options in client.options[:-1]} == {SUMMARY_TOKENS}
+    assert client.options[-1]["num_predict"] == ANALYSIS_TOKENS
+
+
+def test_context_size_keeps_room_for_the_reply_and_a_larger_num_ctx():
+    assert context_size(CHUNK_TOKENS, ANALYSIS_TOKENS) == 4096
+    client = RecordingClient()
+    list(map_chunks(client, ["text"], "m", options={"num_ctx": 16384, "num_predict": 2000}))
+    assert client.options[0]["num_ctx"] == 16384
+    assert client.options[0]["num_predict"] == SUMMARY_TOKENS
@@ -0,0 +1,91 @@
+import io
+import os
+
+import pytest
+
+pytest.importorskip("PIL")
+from PIL import Image
+
+from image_cache import THUMBNAIL_SIZE, ImageCache
+
+
+def png(width=512, height=512):
+    """Random pixels, so the PNG does not compress to almost nothing"""
+    image = Image.frombytes("RGB", (width, height), os.urandom(width * height * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def used_at(cache, image_id, when):
+    for path in (cache.full(image_id), cache.thumbnail(image_id)):
+        os.utime(path, (when, when))
+
+
+def test_store_keeps_the_original_and_a_webp_thumbnail(tmp_path):
+    cache = ImageCache(str(tmp_path))
+    data = png(1024, 512)
+
+    image_id = cache.store(data)
+
+    with open(cache.full(image_id), "rb") as f:
+        assert f.read() == data
+    assert cache.full(image_id).endswith(".png")
+    with Image.open(cache.thumbnail(image_id)) as thumbnail:
+        assert thumbnail.format == "WEBP"
+        assert thumbnail.size == (THUMBNAIL_SIZE[0], THUMBNAIL_SIZE[1] // 2)
+
+
+def test_same_bytes_are_stored_once(tmp_path):
+    cache = ImageCache(str(tmp_path))
+    data = png(64, 64)
+
+    assert cache.store(data) == cache.store(data)
+    assert len(os.listdir(cache.full_dir)) == len(os.listdir(cache.thumb_dir)) == 1
+
+
+def test_palette_images_get_a_thumbnail(tmp_path):
+    cache = ImageCache(str(tmp_path))
+    buffer = io.BytesIO()
+    Image.new("P", (32, 32)).save(buffer, "GIF")
+
+    image_id = cache.store(buffer.getvalue())
+
+    assert cache.full(image_id).endswith(".gif")
+    assert cache.thumbnail(image_id)
+
+
+def test_unsupported_formats_are_rejected(tmp_path):
+    cache = ImageCache(str(tmp_path))
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8)).save(buffer, "BMP")
+
+    with pytest.raises(ValueError, match="Unsupported image format"):
+        cache.store(buffer.getvalue())
+    assert not os.listdir(cache.full_dir)
+
+
+def test_least_recently_used_images_are_evicted_past_max_bytes(tmp_path):
+    images = [png(256, 256) for _ in range(3)]
+    cache = ImageCache(str(tmp_path), max_bytes=len(images[0]) * 2 + 100000)
+    first = cache.store(images[0])
+    second = cache.store(images[1])
+    used_at(cache, first, 2000)
+    used_at(cache, second, 1000)
+
+    third = cache.store(images[2])
+
+    # The second image was used longer ago than the first, so it goes
+    assert cache.full(second) is None and cache.thumbnail(second) is None
+    assert cache.full(first) and cache.thumbnail(first)
+    assert cache.full(third) and cache.thumbnail(third)
+
+
+def test_the_image_just_stored_is_kept_even_if_it_alone_is_too_big(tmp_path):
+    cache = ImageCache(str(tmp_path), max_bytes=1000)
+    older = cache.store(png(64, 64))
+
+    newest = cache.store(png(256, 256))
+
+    assert cache.full(older) is None
+    assert cache.full(newest) and cache.thumbnail(newest)
@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+
+import pytest
+from postgrest.exceptions import APIError
+
+from metrics import OTHER_ROLE, role_counts, summarize_users, user_metrics
+
+PROFILES = [{"role": "user"}] * 4 + [{"role": "admin"}, {"role": None}, {"role": "editor"}]
+
+
+class FakeSupabase:
+    """Head counts over ``PROFILES``; the role counts RPC returns ``rpc_rows`` or raises ``rpc_error``"""
+
+    def __init__(self, rpc_rows=None, rpc_error=None):
+        self.rpc_rows = rpc_rows
+        self.rpc_error = rpc_error
+        self.calling_rpc = False
+        self.filters = {}
+
+    def rpc(self, name):
+        self.calling_rpc = True
+        return self
+
+    def table(self, name):
+        self.calling_rpc = False
+        self.filters = {}
+        return self
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def eq(self, column, value):
+        self.filters[column] = value
+        return self
+
+    def gte(self, column, value):
+        return self
+
+    def execute(self):
+        if self.calling_rpc:
+            if self.rpc_error:
+                raise self.rpc_error
+            return SimpleNamespace(data=self.rpc_rows)
+        matches = [p for p in PROFILES if all(p.get(c) == v for c, v in self.filters.items())]
+        return SimpleNamespace(count=len(matches))
+
+
+EXPECTED = {"user": 4, "admin": 1, "suspended": 0, OTHER_ROLE: 2}
+
+
+def test_rpc_counts_fold_null_and_unlisted_roles_into_other():
+    rows = [{"role": "user", "total": 4}, {"role": "admin", "total": 1}, {"role": None, "total": 1}, {"role": "editor", "total": 1}]
+    assert role_counts(FakeSupabase(rpc_rows=rows)) == EXPECTED
+
+
+def test_missing_rpc_falls_back_to_head_counts_with_the_same_labels(caplog):
+    missing = APIError({"code": "PGRST202", "message": "Could not find the function public.user_role_counts"})
+
+    assert role_counts(FakeSupabase(rpc_error=missing)) == EXPECTED
+    assert "user_role_counts is not installed" in caplog.text
+
+
+def test_other_rpc_errors_are_raised():
+    denied = APIError({"code": "42501", "message": "permission denied for function user_role_counts"})
+    with pytest.raises(APIError):
+        role_counts(FakeSupabase(rpc_error=denied))
+
+
+def test_user_metrics_and_in_memory_summary_agree():
+    missing = APIError({"code": "PGRST202", "message": "missing"})
+    metrics = user_metrics(FakeSupabase(rpc_error=missing))
+    summary = summarize_users(PROFILES)
+
+    assert metrics["total_users"] == summary["total_users"] == 7
+    assert {role: n for role, n in metrics["role_counts"].items() if n} == summary["role_counts"]
@@ -0,0 +1,40 @@
+import time
+
+from model_comparison import TOKEN, compare_models
+
+
+class EndlessStream:
+    def __init__(self, closed):
+        self.closed = closed
+        self.stats, self.text = {}, ""
+
+    def __iter__(self):
+        try:
+            while True:
+                time.sleep(0.01)
+                yield "token "
+        finally:
+            self.closed.append(True)
+
+
+class EndlessGenerator:
+    """``generate`` streams tokens until the stream is closed"""
+
+    def __init__(self):
+        self.closed = []
+
+    def generate(self, prompt, model, options=None):
+        return EndlessStream(self.closed)
+
+
+def test_compare_models_closed_early_stops_the_streams():
+    client = EndlessGenerator()
+    events = compare_models(client, "hi", ["a", "b"])
+
+    assert next(events)[0] == TOKEN
+    events.close()
+
+    deadline = time.perf_counter() + 2
+    while len(client.closed) < 2 and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    assert len(client.closed) == 2
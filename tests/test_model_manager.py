@@ -0,0 +1,55 @@
+import pytest
+
+from model_manager import GB, ModelManager
+from ollama_client import OllamaClient, OllamaError
+from stub_server import StubConfig, _keep_alive_seconds, start
+
+MODELS = {"small:1b": 2 * GB, "medium:3b": 3 * GB, "large:7b": 5 * GB}
+
+
+@pytest.fixture
+def manager():
+    server, url = start(StubConfig(latency=0, tokens_per_second=0, models=MODELS))
+    yield ModelManager(OllamaClient(url), ram_budget=100 * GB)
+    server.shutdown()
+    server.server_close()
+
+
+def loaded_names(manager):
+    return {model["name"] for model in manager.loaded()}
+
+
+@pytest.mark.parametrize("value, seconds", [
+    (None, 300), (-1, -1), (0, 0), ("0", 0), ("5m", 300), ("1h30m", 5400), ("-1m", -60), ("1.5s", 1.5), ("250ms", 0.25),
+])
+def test_keep_alive_seconds_parses_numbers_and_go_durations(value, seconds):
+    assert _keep_alive_seconds(value) == pytest.approx(seconds)
+
+
+@pytest.mark.parametrize("value", ["-1", "300", "5 m", "m", ""])
+def test_keep_alive_seconds_rejects_strings_without_a_unit(value):
+    with pytest.raises(ValueError):
+        _keep_alive_seconds(value)
+
+
+def test_unitless_keep_alive_is_rejected_like_ollama(manager):
+    manager.set_keep_alive("small:1b", "-1")
+    with pytest.raises(OllamaError, match="missing unit"):
+        manager.warm(["small:1b"])
+
+
+def test_negative_keep_alive_keeps_model_loaded(manager):
+    manager.set_keep_alive("small:1b", "-1m")
+    manager.warm(["small:1b"])
+    assert loaded_names(manager) == {"small:1b"}
+
+
+def test_budget_passed_per_call_evicts_without_changing_the_default(manager):
+    manager.warm(["small:1b", "medium:3b"])
+
+    evicted = manager.use(["large:7b"], ram_budget=6 * GB)
+
+    assert set(evicted) == {"small:1b", "medium:3b"}
+    assert manager.ram_budget == 100 * GB
+    manager.warm(["small:1b", "medium:3b"])
+    assert manager.use(["large:7b"]) == []
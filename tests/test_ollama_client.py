@@ -0,0 +1,116 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ollama_client import OllamaClient, OllamaError, format_stats, normalize_host
+from stub_server import StubConfig, start
+
+MODEL = "llama3.2:3b"
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def serve(**config):
+        server, url = start(StubConfig(**{"latency": 0, "tokens_per_second": 0, **config}))
+        servers.append(server)
+        return url
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def raw_server(body: bytes) -> str:
+    """A server that answers every POST with ``body`` as its NDJSON stream."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def test_generate_streams_text_and_stats(stub):
+    client = OllamaClient(stub())
+
+    stream = client.generate("hello there", MODEL, options={"num_predict": 5})
+    text = "".join(stream)
+
+    assert text == stream.text == "Stub reply to: hello there"
+    assert stream.stats["eval_count"] == 5
+    assert stream.stats["ttft_ms"] is not None
+
+
+def test_read_timeout_mid_stream_raises_ollama_error(stub):
+    client = OllamaClient(stub(tokens_per_second=2), read_timeout=0.2)
+
+    stream = client.chat([{"role": "user", "content": "hi"}], MODEL)
+    with pytest.raises(OllamaError, match="mid-stream"):
+        for _ in stream:
+            pass
+    assert stream.parts  # the first tokens arrived before the stall
+
+
+def test_stream_without_done_chunk_raises_ollama_error():
+    client = OllamaClient(raw_server(b'{"response": "Hel", "done": false}\n'))
+
+    with pytest.raises(OllamaError, match="before the response finished"):
+        list(client.generate("hi", MODEL))
+
+
+def test_invalid_json_raises_ollama_error():
+    client = OllamaClient(raw_server(b"not json\n"))
+
+    with pytest.raises(OllamaError, match="valid JSON"):
+        list(client.generate("hi", MODEL))
+
+
+def test_unknown_model_and_unreachable_server_raise_ollama_error(stub):
+    with pytest.raises(OllamaError, match="not found"):
+        OllamaClient(stub()).generate("hi", "missing:1b")
+    with pytest.raises(OllamaError, match="Could not connect"):
+        OllamaClient("http://127.0.0.1:9", connect_timeout=0.5).list_models()
+
+
+def test_format_stats_leaves_out_missing_parts():
+    assert format_stats({}) == ""
+    assert format_stats({"ttft_ms": None, "tokens_per_second": 12.5}) == "12.5 tokens/s"
+    assert format_stats({"ttft_ms": 80, "tokens_per_second": 0, "latency_ms": 1500}, latency=True) == (
+        "⚡ 80 ms to first token · 1.50s"
+    )
+
+
+@pytest.mark.parametrize("host, url", [
+    ("", "http://127.0.0.1:11434"),
+    ("localhost", "http://localhost:11434"),
+    ("0.0.0.0:11434", "http://0.0.0.0:11434"),
+    ("ollama.internal:8080", "http://ollama.internal:8080"),
+    ("http://localhost:11434/", "http://localhost:11434"),
+    ("http://example.com", "http://example.com:80"),
+    ("https://example.com/ollama", "https://example.com:443/ollama"),
+    ("[::1]:11434", "http://[::1]:11434"),
+    ("::1", "http://[::1]:11434"),
+])
+def test_normalize_host_reads_ollama_host_like_ollama(host, url):
+    assert normalize_host(host) == url
+
+
+def test_client_accepts_a_host_without_scheme(stub):
+    port = stub().rsplit(":", 1)[1]
+    assert OllamaClient(f"127.0.0.1:{port}").list_models()
@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+import query_cache
+from query_cache import cached_query, cached_select, invalidate, invalidate_all
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    invalidate_all()
+    yield
+    invalidate_all()
+
+
+class Loader:
+    """Counts calls and returns a new value each time"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.calls
+
+
+def test_hits_until_the_ttl_runs_out():
+    load = Loader()
+    assert cached_query("user_profiles", "count", load, ttl=0.05) == 1
+    assert cached_query("user_profiles", "count", load, ttl=0.05) == 1
+
+    time.sleep(0.06)
+    assert cached_query("user_profiles", "count", load, ttl=0.05) == 2
+
+
+def test_keys_and_tables_are_cached_separately():
+    load = Loader()
+    assert cached_query("user_profiles", "count", load) == 1
+    assert cached_query("user_profiles", "metrics", load) == 2
+    assert cached_query("user_plans", "count", load) == 3
+
+
+def test_invalidate_drops_only_entries_read_from_that_table():
+    profiles, plans = Loader(), Loader()
+    cached_query("user_profiles", "count", profiles)
+    cached_query("user_plans", "count", plans)
+
+    invalidate("user_profiles")
+
+    assert cached_query("user_profiles", "count", profiles) == 2
+    assert cached_query("user_plans", "count", plans) == 1
+
+
+def test_entry_tagged_with_several_tables_is_dropped_by_any_of_them():
+    load = Loader()
+    cached_query(("user_profiles", "auth_users"), "directory", load)
+
+    invalidate("auth_users")
+    assert cached_query(("user_profiles", "auth_users"), "directory", load) == 2
+
+    invalidate("user_profiles")
+    assert cached_query(("user_profiles", "auth_users"), "directory", load) == 3
+
+    invalidate("user_plans")
+    assert cached_query(("user_profiles", "auth_users"), "directory", load) == 3
+
+
+def test_invalidate_all_drops_everything():
+    load = Loader()
+    cached_query("user_profiles", "count", load)
+    cached_query(("user_plans", "user_profiles"), "joined", load)
+
+    invalidate_all()
+
+    assert not query_cache._store
+
+
+def test_cached_select_reads_the_table_once():
+    class FakeSupabase:
+        requests = 0
+
+        def table(self, name):
+            self.name = name
+            return self
+
+        def select(self, columns):
+            self.columns = columns
+            return self
+
+        def execute(self):
+            self.requests += 1
+            return type("Response", (), {"data": [{"table": self.name, "columns": self.columns}]})
+
+    supabase = FakeSupabase()
+    rows = cached_select(supabase, "user_plans", "id, status")
+
+    assert rows == [{"table": "user_plans", "columns": "id, status"}]
+    assert cached_select(supabase, "user_plans", "id, status") is rows
+    assert supabase.requests == 1
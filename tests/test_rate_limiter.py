@@ -0,0 +1,92 @@
+import time
+
+import pytest
+
+from rate_limiter import ANONYMOUS_USER, RateLimiter, TokenBucket
+
+USER_LIMITS = {"requests_per_minute": 2, "tokens_per_hour": 1000, "images_per_hour": 1}
+GLOBAL_LIMITS = {"requests_per_minute": 100, "tokens_per_hour": 100000, "images_per_hour": 10}
+ANONYMOUS_LIMITS = {"requests_per_minute": 1, "tokens_per_hour": 500, "images_per_hour": 1}
+
+
+@pytest.fixture
+def limiter():
+    return RateLimiter(USER_LIMITS, GLOBAL_LIMITS, ANONYMOUS_LIMITS)
+
+
+def test_reserve_admits_calls_within_every_bucket(limiter):
+    assert limiter.reserve("alice", tokens=400) == 0
+    assert limiter.reserve("alice", tokens=400) == 0
+    assert limiter.user_buckets["alice"]["tokens"].tokens == pytest.approx(200, abs=1)
+    assert limiter.global_buckets["requests"].tokens == pytest.approx(98, abs=0.1)
+
+
+def test_first_reserve_for_a_new_user_has_no_spurious_wait(limiter):
+    for i in range(50):
+        assert limiter.reserve(f"user-{i}", requests=2, tokens=1000) == 0
+
+
+def test_reserve_returns_the_wait_and_takes_nothing_when_full(limiter):
+    limiter.reserve("alice")
+    limiter.reserve("alice")
+
+    wait = limiter.reserve("alice", tokens=10)
+
+    # Two requests per minute refill one every 30 seconds
+    assert 29 < wait <= 30
+    assert limiter.user_buckets["alice"]["tokens"].tokens == pytest.approx(1000, abs=1)
+    assert limiter.reserve("bob") == 0
+
+
+def test_global_bucket_limits_every_user_together():
+    limiter = RateLimiter(USER_LIMITS, {**GLOBAL_LIMITS, "requests_per_minute": 3}, ANONYMOUS_LIMITS)
+    assert [limiter.reserve(user) for user in ("a", "b", "c")] == [0, 0, 0]
+    assert limiter.reserve("d") > 0
+
+
+def test_acquire_rejects_calls_that_would_wait_too_long(limiter):
+    assert limiter.acquire("alice", tokens=1000)
+    assert not limiter.acquire("alice", tokens=1, max_wait=1.0)
+    assert limiter.stats["admitted"] == 1 and limiter.stats["rejected"] == 1
+
+
+def test_acquire_waits_for_capacity():
+    limiter = RateLimiter(
+        {**USER_LIMITS, "requests_per_minute": 600}, {**GLOBAL_LIMITS, "requests_per_minute": 6000}, ANONYMOUS_LIMITS
+    )
+    for _ in range(600):
+        limiter.reserve("alice")
+    waits = []
+
+    assert limiter.acquire("alice", max_wait=2.0, on_wait=waits.append)
+    assert waits and all(0 < wait <= 0.1 for wait in waits)
+    assert limiter.stats["delayed"] == 1
+
+
+def test_refund_returns_unused_tokens_up_to_capacity(limiter):
+    limiter.reserve("alice", tokens=900)
+
+    limiter.refund("alice", 600)
+    assert limiter.user_buckets["alice"]["tokens"].tokens == pytest.approx(700, abs=1)
+    assert limiter.reserve("alice", tokens=700) == 0
+
+    limiter.refund("alice", 5000)
+    assert limiter.user_buckets["alice"]["tokens"].tokens == 1000
+    assert limiter.global_buckets["tokens"].tokens <= 100000
+
+
+def test_anonymous_sessions_share_one_stricter_bucket(limiter):
+    assert limiter.reserve(ANONYMOUS_USER) == 0
+    # Another tab or a refresh is still the anonymous user
+    assert limiter.reserve(ANONYMOUS_USER) > 0
+    assert limiter.reserve("alice") == 0
+
+
+def test_refill_ignores_a_clock_read_before_the_bucket_existed():
+    bucket = TokenBucket(capacity=10, rate=1)
+    bucket.tokens = 5
+    bucket.refill(bucket.updated - 3)
+    assert bucket.tokens == 5
+    assert bucket.wait_time(5) == 0
+    bucket.refill(time.monotonic() + 2)
+    assert bucket.tokens == pytest.approx(7, abs=0.1)
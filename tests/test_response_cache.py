@@ -0,0 +1,79 @@
+import pytest
+
+from response_cache import ResponseCache, make_cache_key
+
+MESSAGES = [{"role": "system", "content": "Be brief"}, {"role": "user", "content": "Plan my week"}]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / "responses.db"))
+
+
+def test_key_differs_per_bot_model_and_temperature_bucket():
+    key = make_cache_key("Strategist", "gpt-4", 0.7, MESSAGES)
+
+    assert make_cache_key("Coach", "gpt-4", 0.7, MESSAGES) != key
+    assert make_cache_key("Strategist", "gpt-4-turbo", 0.7, MESSAGES) != key
+    assert make_cache_key("Strategist", "gpt-4", 0.9, MESSAGES) != key
+    assert make_cache_key("Strategist", "gpt-4", 0.71, MESSAGES) == key
+
+
+def test_key_ignores_whitespace_and_extra_message_fields():
+    spaced = [
+        {"role": "system", "content": "  Be\n brief "},
+        {"role": "user", "content": "Plan my   week", "id": 3, "timestamp": "12:00"},
+    ]
+
+    assert make_cache_key("Strategist", "gpt-4", 0.7, spaced) == make_cache_key("Strategist", "gpt-4", 0.7, MESSAGES)
+    assert make_cache_key("Strategist", "gpt-4", 0.7, MESSAGES[1:]) != make_cache_key("Strategist", "gpt-4", 0.7, MESSAGES)
+
+
+def test_one_bot_does_not_get_another_bots_response(cache):
+    cache.put(make_cache_key("Strategist", "gpt-4", 0.7, MESSAGES), "Strategist reply", {"bot": "Strategist"})
+
+    assert cache.get(make_cache_key("Coach", "gpt-4", 0.7, MESSAGES)) is None
+    assert cache.get(make_cache_key("Strategist", "gpt-3.5-turbo", 0.7, MESSAGES)) is None
+    assert cache.get(make_cache_key("Strategist", "gpt-4", 0.7, MESSAGES)) == ("Strategist reply", {"bot": "Strategist"})
+
+
+def test_callers_cannot_change_cached_metadata(cache):
+    metadata = {"tokens": {"total": 10}}
+    cache.put("key", "reply", metadata)
+    metadata["tokens"]["total"] = 99
+
+    _, first = cache.get("key")
+    first["tokens"]["total"] = 50
+    first["cache_hit"] = True
+
+    assert cache.get("key") == ("reply", {"tokens": {"total": 10}})
+
+
+def test_disk_tier_serves_a_new_process_and_copies_on_read(tmp_path):
+    path = str(tmp_path / "responses.db")
+    ResponseCache(path).put("key", "reply", {"tokens": {"total": 10}})
+
+    cache = ResponseCache(path)
+    _, metadata = cache.get("key")
+    metadata["tokens"]["total"] = 50
+
+    assert cache.get("key") == ("reply", {"tokens": {"total": 10}})
+    assert cache.stats == {"memory_hits": 1, "disk_hits": 1, "misses": 0}
+
+
+def test_expired_entries_are_not_served(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.db"), ttl=-1)
+    cache.put("key", "reply", {})
+
+    assert cache.get("key") is None
+    assert cache.stats["misses"] == 1
+
+
+def test_memory_and_disk_tiers_are_capped(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.db"), memory_items=2, disk_items=3)
+    for i in range(5):
+        cache.put(f"key-{i}", f"reply {i}", {})
+
+    assert list(cache._memory) == ["key-3", "key-4"]
+    assert cache.get("key-0") is None
+    assert cache.get("key-2") == ("reply 2", {})
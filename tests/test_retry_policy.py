@@ -0,0 +1,161 @@
+import asyncio
+import time
+from email.utils import formatdate
+
+import httpx
+import openai
+import pytest
+
+from retry_policy import CircuitBreaker, CircuitOpenError, RetryPolicy, is_transient, retry_after
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def status_error(status: int, headers=None, code=None) -> openai.APIStatusError:
+    response = httpx.Response(status, headers=headers or {}, request=REQUEST)
+    return openai.APIStatusError("failed", response=response, body={"code": code} if code else None)
+
+
+class Flaky:
+    """Raises each of ``errors`` in turn, then returns "ok"; records the timeouts it was given"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.timeouts = []
+
+    def __call__(self, timeout):
+        self.timeouts.append(timeout)
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def test_transient_errors_are_told_apart_from_permanent_ones():
+    assert is_transient(status_error(429))
+    assert is_transient(status_error(503))
+    assert is_transient(openai.APITimeoutError(request=REQUEST))
+    assert not is_transient(status_error(400))
+    assert not is_transient(status_error(429, code="insufficient_quota"))
+    assert not is_transient(ValueError("bug"))
+
+
+def test_retry_after_reads_milliseconds_seconds_and_dates():
+    assert retry_after(status_error(429, {"retry-after-ms": "1500"})) == 1.5
+    assert retry_after(status_error(429, {"retry-after": "7"})) == 7
+    assert 25 < retry_after(status_error(429, {"retry-after": formatdate(time.time() + 30, usegmt=True)})) <= 30
+    assert retry_after(status_error(429, {"retry-after": "soon"})) is None
+    assert retry_after(status_error(429)) is None
+
+
+def test_backoff_is_capped_and_never_shorter_than_retry_after():
+    policy = RetryPolicy(base_delay=1.0, max_delay=4.0)
+    delays = [policy.backoff(10, status_error(503)) for _ in range(200)]
+    assert all(0 <= delay <= 4.0 for delay in delays)
+    assert all(policy.backoff(1, status_error(429, {"retry-after": "6"})) >= 6 for _ in range(20))
+
+
+def test_call_retries_transient_errors_until_success():
+    fn = Flaky(status_error(503), openai.APIConnectionError(request=REQUEST))
+    retries = []
+
+    result = RetryPolicy(base_delay=0.001).call(fn, on_retry=lambda attempt, delay, e: retries.append(attempt))
+
+    assert result == "ok"
+    assert retries == [1, 2]
+
+
+def test_call_gives_up_after_max_attempts_and_on_permanent_errors():
+    with pytest.raises(openai.APIStatusError):
+        RetryPolicy(max_attempts=2, base_delay=0.001).call(Flaky(*[status_error(503)] * 3))
+    permanent = Flaky(status_error(400))
+    with pytest.raises(openai.APIStatusError):
+        RetryPolicy(base_delay=0.001).call(permanent)
+    assert len(permanent.timeouts) == 1
+
+
+def test_deadline_bounds_attempt_timeouts_and_stops_long_waits():
+    policy = RetryPolicy(deadline=5.0, attempt_timeout=60.0)
+    fn = Flaky(status_error(429, {"retry-after": "10"}))
+
+    started = time.monotonic()
+    with pytest.raises(openai.APIStatusError):
+        policy.call(fn)
+
+    # Waiting 10s would pass the 5s deadline, so the error is raised at once
+    assert time.monotonic() - started < 1
+    assert fn.timeouts == [pytest.approx(5.0, abs=0.1)]
+
+
+def test_breaker_opens_after_repeated_failures_then_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    policy = RetryPolicy(max_attempts=1)
+    for _ in range(2):
+        with pytest.raises(openai.APIStatusError):
+            policy.call(Flaky(status_error(503)), breaker=breaker)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        policy.call(Flaky(), breaker=breaker)
+
+    time.sleep(0.06)
+    assert breaker.state == "half-open"
+    assert breaker.before_call() is True
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # only one trial at a time
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_failed_trial_reopens_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=0.05)
+    breaker.opened_at = time.monotonic() - 1
+
+    with pytest.raises(openai.APIStatusError):
+        RetryPolicy(max_attempts=1).call(Flaky(status_error(503)), breaker=breaker)
+
+    assert breaker.state == "open"
+
+
+def test_bad_request_does_not_count_against_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1)
+    with pytest.raises(openai.APIStatusError):
+        RetryPolicy().call(Flaky(status_error(400)), breaker=breaker)
+    assert breaker.state == "closed"
+
+
+class Interrupted(BaseException):
+    """Stands in for Streamlit's rerun and stop exceptions"""
+
+
+def test_interrupted_trial_is_released():
+    breaker = CircuitBreaker(reset_timeout=0.05)
+    breaker.opened_at = time.monotonic() - 1
+
+    def interrupted(timeout):
+        raise Interrupted()
+
+    with pytest.raises(Interrupted):
+        RetryPolicy().call(interrupted, breaker=breaker)
+
+    assert RetryPolicy().call(Flaky(), breaker=breaker) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_cancelled_async_trial_is_released():
+    breaker = CircuitBreaker(reset_timeout=0.05)
+    breaker.opened_at = time.monotonic() - 1
+
+    async def slow(timeout):
+        await asyncio.sleep(10)
+
+    async def ok(timeout):
+        return "ok"
+
+    async def run():
+        task = asyncio.ensure_future(RetryPolicy().call_async(slow, breaker=breaker))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return await RetryPolicy().call_async(ok, breaker=breaker)
+
+    assert asyncio.run(run()) == "ok"
@@ -0,0 +1,131 @@
+import re
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+import rollup
+
+
+class FakeTable:
+    """Enough of a PostgREST query for ``rollup._new_rows``: ordered keyset paging over ``rows``"""
+
+    def __init__(self, client, rows):
+        self.client = client
+        self.rows = rows
+        self.filters = []
+        self.count = None
+
+    def select(self, columns):
+        return self
+
+    def order(self, column):
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: rollup._instant(row[column]) >= rollup._instant(value))
+        return self
+
+    def or_(self, condition):
+        created_at, row_id = re.fullmatch(
+            r'created_at\.gt\."(.+)",and\(created_at\.eq\."(.+)",id\.gt\.(.+)\)', condition
+        ).group(1, 3)
+        mark = rollup._instant(created_at)
+        self.filters.append(
+            lambda row: rollup._instant(row["created_at"]) > mark
+            or (rollup._instant(row["created_at"]) == mark and row["id"] > int(row_id))
+        )
+        return self
+
+    def limit(self, count):
+        self.count = count
+        return self
+
+    def execute(self):
+        self.client.requests += 1
+        rows = sorted(
+            (row for row in self.rows if all(f(row) for f in self.filters)),
+            key=lambda row: (rollup._instant(row["created_at"]), row["id"]),
+        )
+        return SimpleNamespace(data=rows[: self.count])
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.tables = {"user_profiles": [], "user_plans": []}
+        self.requests = 0
+
+    def table(self, name):
+        return FakeTable(self, self.tables[name])
+
+    def add(self, table, created_at, **columns):
+        rows = self.tables[table]
+        rows.append({"id": len(rows) + 1, "created_at": created_at, **columns})
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(rollup, "REFRESH_PAGE_SIZE", 2)
+    return str(tmp_path / "rollup.db")
+
+
+def test_refresh_pages_through_rows_sharing_a_timestamp(db_path):
+    supabase = FakeSupabase()
+    for _ in range(5):
+        supabase.add("user_profiles", "2024-03-01T10:00:00+00:00")
+    supabase.add("user_profiles", "2024-03-02T09:00:00Z")
+
+    assert rollup.refresh(supabase, db_path) == {"signups": 6, "plans": 0}
+    assert rollup.signup_total(db_path=db_path) == 6
+    # Profiles: three full pages of two rows, then an empty one; plans: one empty page
+    assert supabase.requests == 4 + 1
+
+
+def test_refresh_counts_only_new_rows_including_late_ones_at_the_watermark(db_path):
+    supabase = FakeSupabase()
+    supabase.add("user_profiles", "2024-03-01T10:00:00+00:00")
+    supabase.add("user_profiles", "2024-03-01T12:00:00+00:00")
+    rollup.refresh(supabase, db_path)
+
+    assert rollup.refresh(supabase, db_path) == {"signups": 0, "plans": 0}
+
+    # Committed late with the same timestamp as the high-water row
+    supabase.add("user_profiles", "2024-03-01T12:00:00+00:00")
+    supabase.add("user_profiles", "2024-03-03T08:00:00+00:00")
+    assert rollup.refresh(supabase, db_path)["signups"] == 2
+    assert rollup.refresh(supabase, db_path)["signups"] == 0
+    assert rollup.signup_total(db_path=db_path) == 4
+
+
+def test_daily_signups_are_zero_filled_over_the_range(db_path):
+    supabase = FakeSupabase()
+    supabase.add("user_profiles", "2024-03-01T10:00:00+00:00")
+    supabase.add("user_profiles", "2024-03-01T11:00:00+00:00")
+    supabase.add("user_profiles", "2024-03-03T11:00:00+00:00")
+    rollup.refresh(supabase, db_path)
+
+    frame = rollup.daily_signups(date(2024, 2, 29), date(2024, 3, 3), db_path)
+
+    assert frame["Registrations"].tolist() == [0, 2, 0, 1]
+    assert rollup.signup_total(date(2024, 3, 2), date(2024, 3, 3), db_path) == 1
+
+
+def test_plan_creations_are_grouped_by_name_or_status(db_path):
+    supabase = FakeSupabase()
+    supabase.add("user_plans", "2024-03-01T10:00:00+00:00", plan_name="Pro", status="active")
+    supabase.add("user_plans", "2024-03-01T10:00:00+00:00", plan_name="Pro", status="suspended")
+    supabase.add("user_plans", "2024-03-02T10:00:00+00:00", plan_name=None, status="active")
+
+    assert rollup.refresh(supabase, db_path) == {"signups": 0, "plans": 3}
+    assert rollup.plan_creations("plan_name", db_path=db_path) == {"Pro": 2, "Unknown": 1}
+    assert rollup.plan_creations("status", db_path=db_path) == {"active": 2, "suspended": 1}
+    with pytest.raises(ValueError):
+        rollup.plan_creations("email", db_path=db_path)
+
+
+def test_role_changes_are_summed_per_role(db_path):
+    rollup.record_role_changes("admin", 2, db_path)
+    rollup.record_role_changes("admin", 1, db_path)
+    rollup.record_role_changes("user", 0, db_path)
+
+    assert rollup.role_changes(db_path=db_path) == {"admin": 3}
@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+
+from user_directory import MAX_BULK_CHUNK_SIZE, bulk_update_roles, chunked
+
+
+class FakeProfiles:
+    """Records each ``update().in_()`` request made against user_profiles"""
+
+    def __init__(self, existing, fail_on=None):
+        self.existing = set(existing)
+        self.fail_on = fail_on
+        self.requests = []
+
+    def table(self, name):
+        assert name == "user_profiles"
+        return self
+
+    def update(self, values):
+        self.values = values
+        return self
+
+    def in_(self, column, values):
+        assert column == "email"
+        self.requests.append(list(values))
+        return self
+
+    def execute(self):
+        emails = self.requests[-1]
+        if self.fail_on in emails:
+            raise RuntimeError("request failed")
+        return SimpleNamespace(data=[{"email": e, **self.values} for e in emails if e in self.existing])
+
+
+def test_chunked_covers_every_item_in_order():
+    items = list(range(7))
+    assert list(chunked(items, 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(chunked([], 3)) == []
+
+
+def test_bulk_update_roles_sends_one_request_per_chunk():
+    emails = [f"user{i}@example.com" for i in range(25)]
+    supabase = FakeProfiles(existing=emails[:-2])
+
+    results = list(bulk_update_roles(supabase, emails, "admin", chunk_size=10))
+
+    assert [len(chunk) for chunk in supabase.requests] == [10, 10, 5]
+    assert [chunk for chunk, _, _ in results] == supabase.requests
+    assert results[-1][1] == emails[-2:]
+    assert all(error is None for _, _, error in results)
+
+
+def test_bulk_update_roles_caps_chunk_size():
+    emails = [f"user{i}@example.com" for i in range(MAX_BULK_CHUNK_SIZE * 2 + 1)]
+    supabase = FakeProfiles(existing=emails)
+
+    list(bulk_update_roles(supabase, emails, "user", chunk_size=1000))
+
+    assert max(len(chunk) for chunk in supabase.requests) == MAX_BULK_CHUNK_SIZE
+    assert sum(supabase.requests, []) == emails
+
+
+def test_bulk_update_roles_reports_failed_chunk_and_continues():
+    emails = [f"user{i}@example.com" for i in range(6)]
+    supabase = FakeProfiles(existing=emails, fail_on=emails[0])
+
+    results = list(bulk_update_roles(supabase, emails, "admin", chunk_size=3))
+
+    chunk, missing, error = results[0]
+    assert missing == chunk and isinstance(error, RuntimeError)
+    assert results[1][1] == [] and results[1][2] is None
@@ -0,0 +1,266 @@
+"""
+User directory helpers shared by the admin views.
+
+Joins ``user_profiles`` rows with Supabase auth records through an
+id-indexed dict, so each fetch merges in a single pass over the profiles.
+
+``list_users()`` only returns one page, so auth users and profiles are read
+through generators that walk every page; the aggregate helpers consume them
+as a stream and never hold more than one page in memory.
+"""
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Users requested per page from the auth admin API and PostgREST
+DEFAULT_PAGE_SIZE = 500
+
+# Columns the paged management list needs from user_profiles
+PROFILE_COLUMNS = "id, email, role, created_at"
+
+# Maximum rows a dashboard search returns
+SEARCH_LIMIT = 100
+
+# Shorter search terms are not sent to the database as an email filter
+MIN_SEARCH_LENGTH = 2
+
+# Auth records fetched at once when looking up search results by id
+AUTH_LOOKUP_CONCURRENCY = 8
+
+# Emails per UPDATE ... WHERE email IN (...) request in bulk role changes.
+# The list travels in the URL, so keep chunks small enough to avoid HTTP 414.
+BULK_CHUNK_SIZE = 50
+MAX_BULK_CHUNK_SIZE = 100
+
+
+def _auth_user_list(response) -> List:
+    """Return the auth users from a ``list_users()`` response.
+
+    The response shape differs between supabase-py versions: a plain list,
+    an object with ``users``/``user``, or a dict with a ``users`` key.
+    """
+    if response is None:
+        return []
+    if isinstance(response, list):
+        return response
+    if isinstance(response, dict):
+        return response.get("users") or []
+    for attr in ("users", "user"):
+        users = getattr(response, attr, None)
+        if users is not None:
+            return users if isinstance(users, list) else [users]
+    return list(response)
+
+
+def _get(record, field: str, default=None):
+    """Read a field from an auth record that may be an object or a dict."""
+    if isinstance(record, dict):
+        return record.get(field, default)
+    return getattr(record, field, default)
+
+
+def iter_auth_user_pages(supabase, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[List]:
+    """Yield auth users one page at a time until a short page is returned."""
+    page = 1
+    while True:
+        batch = _auth_user_list(supabase.auth.admin.list_users(page=page, per_page=page_size))
+        if batch:
+            yield batch
+        if len(batch) < page_size:
+            return
+        page += 1
+
+
+def iter_auth_users(supabase, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator:
+    """Yield every auth user across all pages."""
+    for batch in iter_auth_user_pages(supabase, page_size):
+        yield from batch
+
+
+def iter_profiles(supabase, columns: str = "*", page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[Dict]:
+    """Yield every ``user_profiles`` row, fetched in ``range()`` pages."""
+    start = 0
+    while True:
+        result = (
+            supabase.table("user_profiles")
+            .select(columns)
+            .order("id")
+            .range(start, start + page_size - 1)
+            .execute()
+        )
+        rows = result.data or []
+        yield from rows
+        if len(rows) < page_size:
+            return
+        start += page_size
+
+
+def count_profiles(supabase) -> int:
+    """Return the number of profiles without downloading any rows."""
+    result = supabase.table("user_profiles").select("id", count="exact", head=True).execute()
+    return result.count or 0
+
+
+def fetch_profile_page(
+    supabase,
+    page_size: int,
+    cursor: Optional[Tuple[str, str]] = None,
+    columns: str = PROFILE_COLUMNS,
+) -> Tuple[List[Dict], Optional[Tuple[str, str]]]:
+    """Fetch one page of profiles, newest first, using keyset pagination.
+
+    ``cursor`` is the ``(created_at, id)`` of the last row on the previous
+    page. Returns the rows and the cursor for the next page, or ``None`` when
+    this is the last page.
+    """
+    query = (
+        supabase.table("user_profiles")
+        .select(columns)
+        .order("created_at", desc=True)
+        .order("id", desc=True)
+    )
+    if cursor:
+        created_at, user_id = cursor
+        query = query.or_(
+            f'created_at.lt."{created_at}",'
+            f'and(created_at.eq."{created_at}",id.lt.{user_id})'
+        )
+    # One extra row tells us whether another page follows
+    rows = query.range(0, page_size).execute().data or []
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, (rows[-1]["created_at"], rows[-1]["id"])
+
+
+def escape_like(term: str) -> str:
+    """Escape LIKE wildcards so ``term`` matches literally inside a pattern."""
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_profiles(
+    supabase,
+    search: str = "",
+    role: Optional[str] = None,
+    limit: int = SEARCH_LIMIT,
+    columns: str = "id, email, role",
+) -> List[Dict]:
+    """Filter profiles in the database by email substring and role."""
+    query = supabase.table("user_profiles").select(columns)
+    if search:
+        query = query.ilike("email", f"%{escape_like(search)}%")
+    if role:
+        query = query.eq("role", role)
+    return query.order("email").limit(limit).execute().data or []
+
+
+def find_auth_user_by_email(supabase, email: str, page_size: int = DEFAULT_PAGE_SIZE) -> Optional[object]:
+    """Return the first auth user with ``email``, stopping at the page that has it."""
+    return next((u for u in iter_auth_users(supabase, page_size) if _get(u, "email") == email), None)
+
+
+def count_confirmed_users(supabase, page_size: int = DEFAULT_PAGE_SIZE) -> int:
+    """Count auth users with a confirmed email across all pages."""
+    return sum(1 for u in iter_auth_users(supabase, page_size) if _get(u, "email_confirmed_at"))
+
+
+def count_roles(supabase, page_size: int = DEFAULT_PAGE_SIZE) -> Counter:
+    """Count profiles per role across all pages."""
+    return Counter(
+        row.get("role") or "unknown"
+        for row in iter_profiles(supabase, columns="role", page_size=page_size)
+    )
+
+
+def index_auth_users(auth_users: Iterable) -> Dict[str, object]:
+    """Build an id -> auth record lookup table."""
+    return {_get(u, "id"): u for u in auth_users}
+
+
+def fetch_auth_users(
+    supabase,
+    user_ids: Iterable[str],
+    concurrency: int = AUTH_LOOKUP_CONCURRENCY,
+) -> Dict[str, object]:
+    """Look up the auth records for ``user_ids`` only, a few requests at a time.
+
+    Ids with no auth user (a 404) map to ``None``; other errors are raised.
+    """
+    def lookup(user_id: str) -> Tuple[str, Optional[object]]:
+        try:
+            response = supabase.auth.admin.get_user_by_id(user_id)
+        except Exception as e:
+            if getattr(e, "status", None) == 404:
+                return user_id, None
+            raise
+        return user_id, _get(response, "user", response)
+
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(user_ids))) as pool:
+        return dict(pool.map(lookup, user_ids))
+
+
+def merge_user(profile: Dict, auth_info: Optional[object]) -> Dict:
+    """Combine a profile row with its auth record into one user dict."""
+    return {
+        "id": profile["id"],
+        "email": profile["email"],
+        "role": profile["role"],
+        "created_at": _get(auth_info, "created_at"),
+        "last_sign_in": _get(auth_info, "last_sign_in_at"),
+        "confirmed": _get(auth_info, "email_confirmed_at") is not None,
+    }
+
+
+def merge_profiles(profiles: Iterable[Dict], auth_index: Dict[str, object]) -> List[Dict]:
+    """Merge profile rows with the indexed auth records in one pass."""
+    return [merge_user(profile, auth_index.get(profile["id"])) for profile in profiles]
+
+
+def chunked(items: List, size: int) -> Iterator[List]:
+    """Yield consecutive slices of ``items`` with at most ``size`` elements."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def bulk_update_roles(
+    supabase,
+    emails: List[str],
+    role: str,
+    chunk_size: int = BULK_CHUNK_SIZE,
+) -> Iterator[Tuple[List[str], List[str], Optional[Exception]]]:
+    """Set ``role`` on every profile in ``emails``, one request per chunk.
+
+    Yields ``(chunk, missing, error)`` after each request: ``missing`` lists
+    the emails in the chunk that matched no profile, and ``error`` is the
+    exception raised for the whole chunk, if any. ``chunk_size`` is capped
+    at ``MAX_BULK_CHUNK_SIZE``.
+    """
+    for chunk in chunked(emails, max(1, min(chunk_size, MAX_BULK_CHUNK_SIZE))):
+        try:
+            result = (
+                supabase.table("user_profiles")
+                .update({"role": role})
+                .in_("email", chunk)
+                .execute()
+            )
+        except Exception as e:
+            yield chunk, chunk, e
+            continue
+        updated = {row.get("email") for row in result.data or []}
+        yield chunk, [email for email in chunk if email not in updated], None
+
+
+def normalize_search(search: str) -> str:
+    """Trim and lowercase a search term, dropping terms too short to filter on."""
+    search = (search or "").strip().lower()
+    return search if len(search) >= MIN_SEARCH_LENGTH else ""
+
+
+def fetch_user_directory(supabase, page_size: int = DEFAULT_PAGE_SIZE) -> List[Dict]:
+    """Fetch profiles and auth users and return the merged user list."""
+    auth_index = index_auth_users(iter_auth_users(supabase, page_size))
+    return merge_profiles(iter_profiles(supabase, page_size=page_size), auth_index)